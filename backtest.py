@@ -0,0 +1,396 @@
+"""
+Enhanced RSI Alert System - バックテストエンジン
+check_enhanced_signal() と同じ判定ルール（日足クロス＋週足フィルター＋指標フィルター）を
+キャッシュ済みの日足データ全期間でベクトル化して再現し、銘柄別の成績を算出する
+（各日のRSI・指標は実行時と同じく、その日までの直近6ヶ月分の日足のみから計算する）
+
+使い方:
+    python backtest.py [--config C:\\rsi_alert\\config.json] [--years 10]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import period_to_days
+from indicators import IndicatorEngine, check_indicator_filters, compile_filters
+from market_data import DEFAULT_DAILY_PERIOD
+from rsi_engine import latest_rsi_matrix
+
+logger = logging.getLogger(__name__)
+
+# check_enhanced_signal() のデフォルト値
+DEFAULT_SETTINGS = {
+    'daily_buy_threshold': 33,
+    'daily_sell_threshold': 67,
+    'weekly_buy_threshold': 50,
+    'weekly_sell_threshold': 50,
+    'use_weekly_filter': False
+}
+
+DEFAULT_YEARS = 10
+
+
+def effective_settings(settings):
+    """銘柄別設定にデフォルト値を補完（判定に使う項目のみ、指標フィルターを含む）"""
+    effective = {key: settings.get(key, default) for key, default in DEFAULT_SETTINGS.items()}
+    effective['indicator_filters'] = settings.get('indicator_filters', [])
+    return effective
+
+
+def settings_hash(settings, rsi_period, smoothing='sma', years=DEFAULT_YEARS, indicators=None):
+    """バックテスト結果のキャッシュキー（判定ルールに影響する設定のハッシュ）
+
+    indicators: 設定の indicators（指標フィルターが参照する指標の定義のみハッシュに含める）
+    """
+    effective = effective_settings(settings)
+    referenced = sorted({entry['indicator'] for entry in effective['indicator_filters']})
+    payload = {
+        'settings': effective,
+        'indicators': {name: (indicators or {}).get(name) for name in referenced},
+        'rsi_period': rsi_period,
+        'smoothing': smoothing,
+        'years': years
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def window_starts(index, max_bars=None):
+    """各営業日に run() が取得する日足（直近6ヶ月分、省メモリ設定時はさらに末尾 max_bars 本）の先頭位置"""
+    first = index.searchsorted(index - pd.Timedelta(days=period_to_days(DEFAULT_DAILY_PERIOD)), side='right')
+    if max_bars:
+        first = np.maximum(first, np.arange(len(index)) - max_bars + 1)
+    return first
+
+
+def _week_codes(index):
+    """日足の日付を月曜日始まりの週の通し番号に変換（resample_bars() の週足と同じ区切り）"""
+    week_start = (index.normalize() - pd.to_timedelta(index.dayofweek, unit='D'))
+    week_codes, _ = pd.factorize(week_start)
+    return week_codes
+
+
+def _window_matrix(values, first, stop):
+    """列 j に values[first[j]:stop[j]] を末尾に揃えて並べた行列（窓より前の行は NaN）"""
+    width = int((stop - first).max()) if len(stop) else 0
+    positions = stop[np.newaxis, :] - np.arange(width, 0, -1)[:, np.newaxis]
+    return np.where(positions >= first, values[np.clip(positions, 0, max(len(values) - 1, 0))], np.nan)
+
+
+def trailing_rsi(close, period=14, smoothing='sma', max_bars=None, since=None):
+    """各営業日に run() が算出する日足RSI・週足RSI（(日足RSI, 週足RSI) の Series）
+
+    run() は直近6ヶ月分の日足のみからRSIを計算する。Wilder平滑化の値は初期値の位置に依存するため、
+    系列全体で計算した値は実行時と一致しない。各日について実行時と同じ範囲の日足・週足
+    （前週までの確定終値＋当日終値）を列に並べ、latest_rsi_matrix() で全営業日分を一括計算する。
+    since: この位置以降の営業日のみ計算する（それより前は NaN）
+    """
+    index = close.index
+    values = close.to_numpy(dtype=np.float64)
+    first = window_starts(index, max_bars)
+    week_codes = _week_codes(index)
+    weekly_close = close.groupby(week_codes).last().to_numpy(dtype=np.float64)
+
+    columns = np.arange(since or 0, len(values))
+    daily = _window_matrix(values, first[columns], columns + 1)
+    weekly = np.vstack([
+        _window_matrix(weekly_close, week_codes[first[columns]], week_codes[columns]),
+        values[columns]
+    ])
+
+    daily_rsi = np.full(len(values), np.nan)
+    weekly_rsi = np.full(len(values), np.nan)
+    if len(columns):
+        daily_rsi[columns] = latest_rsi_matrix(pd.DataFrame(daily), period, smoothing).to_numpy()
+        weekly_rsi[columns] = latest_rsi_matrix(pd.DataFrame(weekly), period, smoothing).to_numpy()
+    return pd.Series(daily_rsi, index=index), pd.Series(weekly_rsi, index=index)
+
+
+def signal_codes(daily_rsi, weekly_rsi, settings, prev_daily=None):
+    """check_enhanced_signal() の判定を配列でまとめて再現（1: BUY, -1: SELL, 0: なし）
+
+    前回日足RSIは履歴と同じく小数第1位に丸めた値を使う（prev_daily で直接指定も可）。
+    週足フィルター有効時、週足RSIが NaN の日はフィルターで除外される（従来の判定と同じ）。
+    """
+    settings = effective_settings(settings)
+    if prev_daily is None:
+        prev_daily = previous_daily_rsi(daily_rsi)
+
+    with np.errstate(invalid='ignore'):
+        buy = (prev_daily > settings['daily_buy_threshold']) & (daily_rsi <= settings['daily_buy_threshold'])
+        sell = (prev_daily < settings['daily_sell_threshold']) & (daily_rsi >= settings['daily_sell_threshold'])
+        sell &= ~buy
+        if settings['use_weekly_filter']:
+            buy &= weekly_rsi <= settings['weekly_buy_threshold']
+            sell &= weekly_rsi >= settings['weekly_sell_threshold']
+
+    return buy.astype(np.int8) - sell.astype(np.int8)
+
+
+def previous_daily_rsi(daily_rsi):
+    """各日の前回日足RSI（履歴に保存される小数第1位に丸めた前日の値、先頭は NaN）"""
+    prev_daily = np.empty_like(daily_rsi)
+    prev_daily[0] = np.nan
+    prev_daily[1:] = np.round(daily_rsi[:-1], 1)
+    return prev_daily
+
+
+def replay_signals(daily_rsi, weekly_rsi, settings):
+    """check_enhanced_signal() の判定を全営業日分まとめて再現
+
+    戻り値は 'BUY' / 'SELL' / None の Series（フィルター除外は None）。
+    """
+    codes = signal_codes(daily_rsi.to_numpy(dtype=float), weekly_rsi.to_numpy(dtype=float), settings)
+    signals = pd.Series(None, index=daily_rsi.index, dtype=object)
+    signals[codes == 1] = 'BUY'
+    signals[codes == -1] = 'SELL'
+    return signals
+
+
+def apply_indicator_filters(close, codes, filters, engine, max_bars=None):
+    """シグナル候補の日のみ指標を計算して指標フィルターを適用（除外した日の判定を 0 にした配列を返す）
+
+    指標は run() と同じく各日までの直近6ヶ月分（max_bars: 省メモリ設定時の保持本数）の日足から計算する。
+    """
+    needed = engine.needs([filters])
+    first = window_starts(close.index, max_bars)
+    codes = codes.copy()
+    for position in np.flatnonzero(codes):
+        daily_hist = close.iloc[first[position]:position + 1].to_frame('Close')
+        row = {'indicators': engine.evaluate(daily_hist, needed)}
+        passed, _ = check_indicator_filters(filters, row, 'BUY' if codes[position] == 1 else 'SELL')
+        if not passed:
+            codes[position] = 0
+    return codes
+
+
+def performance_from_codes(close, codes, years):
+    """買いシグナルで買い・売りシグナルで手仕舞う（終値約定）場合の成績（配列版）"""
+    target = np.where(codes == 1, 1.0, np.where(codes == -1, 0.0, np.nan))
+    # 直前のシグナルを引き継いでポジションを決定（前方補完）
+    last_signal = np.maximum.accumulate(np.where(np.isnan(target), 0, np.arange(len(target))))
+    position = np.nan_to_num(target[last_signal], nan=0.0)
+
+    daily_return = np.zeros(len(close))
+    daily_return[1:] = close[1:] / close[:-1] - 1
+    held = np.zeros(len(close))
+    held[1:] = position[:-1]
+    equity = np.cumprod(1 + held * daily_return)
+
+    cagr = equity[-1] ** (1 / max(years, 1e-9)) - 1
+    max_drawdown = (equity / np.maximum.accumulate(equity) - 1).min()
+
+    change = np.diff(position, prepend=0.0)
+    entries = close[change > 0]
+    exits = close[change < 0]
+    trade_returns = exits / entries[:len(exits)] - 1
+
+    return {
+        'trades': int(len(trade_returns)),
+        'win_rate': float((trade_returns > 0).mean() * 100) if len(trade_returns) else None,
+        'cagr': float(cagr * 100),
+        'max_drawdown': float(abs(max_drawdown) * 100),
+        'open_position': bool(position[-1] > 0)
+    }
+
+
+def evaluate_performance(close, signals):
+    """買いシグナルで買い・売りシグナルで手仕舞う（終値約定）場合の成績"""
+    codes = np.where(signals == 'BUY', 1, np.where(signals == 'SELL', -1, 0))
+    return evaluate_codes(close, codes)
+
+
+def evaluate_codes(close, codes):
+    """判定の配列（1: BUY, -1: SELL, 0: なし）から成績を算出（期間の開始日・終了日を付加）"""
+    years = (close.index[-1] - close.index[0]).days / 365.25
+    stats = performance_from_codes(close.to_numpy(dtype=float), codes, years)
+    stats['start'] = close.index[0].strftime('%Y-%m-%d')
+    stats['end'] = close.index[-1].strftime('%Y-%m-%d')
+    return stats
+
+
+def backtest_symbol(daily_hist, settings, rsi_period=14, smoothing='sma', max_bars=None, engine=None):
+    """1銘柄の日足データでバックテストを実行"""
+    return backtest_close(daily_hist['Close'].dropna(), settings, rsi_period, smoothing, max_bars, engine)
+
+
+def backtest_close(close, settings, rsi_period=14, smoothing='sma', max_bars=None, engine=None):
+    """1銘柄の終値系列（欠損なし）でバックテストを実行
+
+    各日のRSIは run() と同じ直近6ヶ月分（max_bars: 省メモリ設定時の保持本数）の日足から計算する。
+    engine: 指標フィルターが参照する指標を定義した IndicatorEngine（省略時は既定のRSIのみ）
+    """
+    daily_rsi, weekly_rsi = trailing_rsi(close, rsi_period, smoothing, max_bars)
+    codes = signal_codes(daily_rsi.to_numpy(), weekly_rsi.to_numpy(), settings)
+    filters = compile_filters(settings)
+    if filters:
+        engine = engine or IndicatorEngine({}, rsi_period, smoothing)
+        codes = apply_indicator_filters(close, codes, filters, engine, max_bars)
+    return evaluate_codes(close, codes)
+
+
+class BacktestCache:
+    def __init__(self, path):
+        """(銘柄, 設定ハッシュ) 別のバックテスト結果キャッシュ（JSONファイル、{symbol: {設定ハッシュ: 結果}}）
+
+        同じ銘柄でも購読者ごとにしきい値が異なるため、設定ごとに別の結果として保持する。
+        """
+        self.path = path
+        self.results = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    results = json.load(f)
+                for symbol, entries in results.items():
+                    if 'settings_hash' in entries:
+                        # 銘柄ごとに1件のみ保持していた旧形式
+                        entries = {entries['settings_hash']: {key: value for key, value in entries.items()
+                                                              if key != 'settings_hash'}}
+                    self.results[symbol] = entries
+            except (OSError, ValueError) as e:
+                logger.warning(f"バックテスト結果の読み込みエラー: {e}")
+
+    def get(self, symbol, key):
+        """設定ハッシュが一致する結果のみ返す（未算出・設定変更後は None）"""
+        entry = self.results.get(symbol, {}).get(key)
+        return entry['stats'] if entry else None
+
+    def put(self, symbol, key, stats):
+        self.results.setdefault(symbol, {})[key] = {
+            'computed_at': datetime.now().strftime('%Y-%m-%d %H:%M'),
+            'stats': stats
+        }
+
+    def retain(self, keys):
+        """現在の設定で使われている (銘柄, 設定ハッシュ) の結果のみ残す"""
+        self.results = {
+            symbol: {key: entry for key, entry in entries.items() if (symbol, key) in keys}
+            for symbol, entries in self.results.items()
+        }
+        self.results = {symbol: entries for symbol, entries in self.results.items() if entries}
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def format_performance_info(stats):
+    """アラート用の成績表示"""
+    if stats is None or stats.get('win_rate') is None:
+        return "過去勝率: 未算出\n期待年率: 未算出"
+    return (
+        f"過去勝率: {stats['win_rate']:.1f}% ({stats['trades']}回)\n"
+        f"期待年率: {stats['cagr']:.1f}%\n"
+        f"最大DD: {stats['max_drawdown']:.1f}%"
+    )
+
+
+def load_closes(system, symbols, years):
+    """銘柄ごとの直近 years 年分の終値（{symbol: Series}、取得できなかった銘柄は含まない）"""
+    from market_data import fetch_daily_bars, fetch_daily_bars_cached
+    from price_store import PriceStore
+
+    period = f"{years}y"
+
+    # 価格ストアがあればその終値をコピー無しで使い、無い銘柄のみ取得
+    closes = {}
+    store = PriceStore.from_config(system.config.get('price_store', {}))
+    if store is not None:
+        start = pd.Timestamp.now().normalize() - pd.DateOffset(years=years)
+        for symbol in symbols:
+            if symbol in store.position:
+                close = store.series(symbol)
+                closes[symbol] = close[close.index.searchsorted(start):]
+    missing = [symbol for symbol in symbols if symbol not in closes]
+    if missing:
+        if system.bar_cache is not None:
+            daily_data = fetch_daily_bars_cached(missing, system.bar_cache, period=period,
+                                                 chunk_size=system.fetch_chunk_size,
+                                                 rate_limiter=system.rate_limiter, provider=system.data_provider)
+        else:
+            daily_data = fetch_daily_bars(missing, period=period, chunk_size=system.fetch_chunk_size,
+                                          rate_limiter=system.rate_limiter, provider=system.data_provider)
+        closes.update((symbol, frame['Close'].dropna()) for symbol, frame in daily_data.items())
+    return {symbol: close for symbol, close in closes.items() if not close.empty}
+
+
+def backtest_targets(system, symbols, years):
+    """アラートで成績を表示する (銘柄, 設定) の組み合わせ
+
+    既定の監視銘柄は symbol_specific_settings、購読者の銘柄は購読者ごとの設定で判定されるため、
+    設定が異なる組み合わせはそれぞれ別に算出する。
+    戻り値は {(symbol, 設定ハッシュ): (設定, [利用者])}（利用者は '既定' または購読者ID）。
+    """
+    indicators = system.config.get('indicators')
+    owners = [('既定', system.symbols, system.symbol_settings)]
+    owners.extend((subscriber.subscriber_id, subscriber.symbols, subscriber.symbol_settings)
+                  for subscriber in system.subscriptions.subscribers.values())
+
+    wanted = set(symbols)
+    targets = {}
+    for owner, owner_symbols, symbol_settings in owners:
+        for symbol in owner_symbols:
+            if symbol not in wanted:
+                continue
+            settings = symbol_settings.get(symbol, {})
+            key = settings_hash(settings, system.rsi_period, system.rsi_smoothing, years, indicators)
+            targets.setdefault((symbol, key), (settings, []))[1].append(owner)
+    return targets
+
+
+def run_backtests(system, years=None, symbols=None):
+    """監視銘柄（購読者の銘柄を含む）のバックテストを設定ごとに実行して結果キャッシュを更新
+
+    銘柄・年数を指定しない場合は、現在の設定で使われなくなった結果をキャッシュから削除する。
+    戻り値は {(symbol, 設定ハッシュ): 成績}。
+    """
+    years = system.backtest_years if years is None else years
+    prune = symbols is None and years == system.backtest_years
+    symbols = system.universe if symbols is None else symbols
+    targets = backtest_targets(system, symbols, years)
+    closes = load_closes(system, list(dict.fromkeys(symbol for symbol, _ in targets)), years)
+
+    results = {}
+    for (symbol, key), (settings, owners) in targets.items():
+        if symbol not in closes:
+            logger.error(f"{symbol}: バックテスト用データ取得失敗")
+            continue
+        stats = backtest_close(closes[symbol], settings, system.rsi_period, system.rsi_smoothing, system.state_bars,
+                               system.indicator_engine)
+        system.backtest_cache.put(symbol, key, stats)
+        results[(symbol, key)] = stats
+        win_rate = f"{stats['win_rate']:.1f}%" if stats['win_rate'] is not None else "N/A"
+        logger.info(
+            f"{symbol} ({', '.join(owners)}): 勝率={win_rate}, 年率={stats['cagr']:.1f}%, "
+            f"最大DD={stats['max_drawdown']:.1f}%, 取引回数={stats['trades']}"
+        )
+
+    if prune:
+        system.backtest_cache.retain(set(targets))
+    system.backtest_cache.save()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSIシグナルのバックテスト")
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    parser.add_argument('--years', type=int, default=None)
+    parser.add_argument('--symbols', nargs='*', default=None)
+    args = parser.parse_args()
+
+    from main import EnhancedRSIAlertSystem
+
+    system = EnhancedRSIAlertSystem(args.config)
+    run_backtests(system, args.years, args.symbols)
+
+
+if __name__ == "__main__":
+    main()
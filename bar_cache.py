@@ -0,0 +1,238 @@
+"""
+Enhanced RSI Alert System - ローカル価格キャッシュ
+銘柄・足種ごとにSQLiteファイルへOHLCVを保存し、差分のみ取得できるようにする
+"""
+
+import logging
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+PERIOD_UNIT_DAYS = {'d': 1, 'wk': 7, 'mo': 30, 'y': 365}
+
+
+def period_to_days(period):
+    """yfinance の period 文字列（6mo, 10y, max など）を日数に換算"""
+    if period == 'max':
+        return float('inf')
+    for unit, days in PERIOD_UNIT_DAYS.items():
+        if period.endswith(unit) and period[:-len(unit)].isdigit():
+            return int(period[:-len(unit)]) * days
+    raise ValueError(f"未対応の期間指定: {period}")
+
+
+def trim_to_period(frame, period):
+    """最終バーから period 分（yfinance の period 指定と同じ範囲）に切り詰める"""
+    days = period_to_days(period)
+    if frame is None or frame.empty or days == float('inf'):
+        return frame
+    return frame[frame.index > frame.index[-1] - pd.Timedelta(days=days)]
+
+
+class BarCache:
+    def __init__(self, cache_dir, max_age_days=30, overlap_days=7, adjustment_tolerance=0.0005):
+        """価格キャッシュ初期化
+
+        max_age_days: 最終更新からこの日数を過ぎたキャッシュは破棄して再取得
+        overlap_days: 差分取得時に重ねて再取得する日数（分割・配当調整の検出用）
+        adjustment_tolerance: 重複期間の終値がこの相対誤差を超えたら調整ありとみなす
+        """
+        self.cache_dir = cache_dir
+        self.max_age_days = max_age_days
+        self.overlap_days = overlap_days
+        self.adjustment_tolerance = adjustment_tolerance
+        # 読み込み済みデータのメモリキャッシュ {(symbol, interval): (ファイル更新時刻, DataFrame)}
+        self.memory = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, symbol, interval):
+        safe_symbol = symbol.replace('/', '_').replace('\\', '_').replace(':', '_')
+        return os.path.join(self.cache_dir, f"{safe_symbol}_{interval}.sqlite")
+
+    def _connect(self, symbol, interval):
+        conn = sqlite3.connect(self._path(symbol, interval))
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS bars (
+                ts TEXT PRIMARY KEY,
+                open REAL, high REAL, low REAL, close REAL, volume REAL
+            )
+        """)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        return conn
+
+    def _get_meta(self, conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _remember(self, symbol, interval, frame):
+        """ファイル内容と一致するデータをメモリに保持（ファイルが更新されたら無効）"""
+        self.memory[(symbol, interval)] = (os.stat(self._path(symbol, interval)).st_mtime_ns, frame)
+
+    def invalidate(self, symbol, interval='1d'):
+        """キャッシュを破棄"""
+        self.memory.pop((symbol, interval), None)
+        path = self._path(symbol, interval)
+        if os.path.exists(path):
+            os.remove(path)
+            logger.info(f"{symbol}: {interval}キャッシュを破棄しました")
+
+    def is_expired(self, symbol, interval='1d'):
+        """最終更新が max_age_days を超えているか"""
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return False
+        age_days = (time.time() - os.path.getmtime(path)) / 86400
+        return age_days > self.max_age_days
+
+    def evict_expired(self):
+        """期限切れのキャッシュファイルを一括削除（監視対象から外れた銘柄など）"""
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not name.endswith('.sqlite'):
+                continue
+            age_days = (time.time() - os.path.getmtime(path)) / 86400
+            if age_days > self.max_age_days:
+                os.remove(path)
+                removed += 1
+        if removed:
+            logger.info(f"期限切れキャッシュを{removed}件削除しました")
+        return removed
+
+    def load(self, symbol, interval='1d'):
+        """キャッシュ済みのOHLCVを取得（無い・期限切れの場合は None）"""
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+        if self.is_expired(symbol, interval):
+            self.invalidate(symbol, interval)
+            return None
+
+        remembered = self.memory.get((symbol, interval))
+        if remembered and remembered[0] == os.stat(path).st_mtime_ns:
+            return remembered[1]
+
+        try:
+            conn = self._connect(symbol, interval)
+            try:
+                rows = conn.execute(
+                    "SELECT ts, open, high, low, close, volume FROM bars ORDER BY ts"
+                ).fetchall()
+                tz = self._get_meta(conn, 'tz')
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            logger.warning(f"{symbol}: キャッシュ読み込みエラー、破棄します: {e}")
+            self.invalidate(symbol, interval)
+            return None
+
+        if not rows:
+            return None
+
+        index = pd.to_datetime([row[0] for row in rows], utc=bool(tz))
+        if tz:
+            index = index.tz_convert(tz)
+        frame = pd.DataFrame([row[1:] for row in rows], index=index, columns=PRICE_COLUMNS)
+        frame.index.name = 'Date'
+        self._remember(symbol, interval, frame)
+        return frame
+
+    def covers(self, symbol, cached, period, interval='1d'):
+        """キャッシュが period 分の履歴を保持しているか"""
+        required_days = period_to_days(period)
+        conn = self._connect(symbol, interval)
+        try:
+            stored_period = self._get_meta(conn, 'period')
+        finally:
+            conn.close()
+        if stored_period and period_to_days(stored_period) >= required_days:
+            return True
+        first_bar = cached.index[0]
+        now = pd.Timestamp.now(tz=first_bar.tz) if first_bar.tz is not None else pd.Timestamp.now()
+        # 週末・祝日分の余裕を持たせて判定
+        return (now - first_bar).days + 7 >= required_days
+
+    def store(self, symbol, frame, interval='1d', replace=False, period=None):
+        """OHLCVをキャッシュへ保存（同一時刻のバーは上書き、period は全取得時の取得期間）"""
+        if frame is None or frame.empty:
+            return
+
+        tz = str(frame.index.tz) if getattr(frame.index, 'tz', None) is not None else ''
+        columns = [col for col in PRICE_COLUMNS if col in frame.columns]
+        values = frame[columns].reindex(columns=PRICE_COLUMNS)
+        rows = [
+            (str(ts),) + tuple(None if pd.isna(v) else float(v) for v in row)
+            for ts, row in zip(frame.index, values.itertuples(index=False, name=None))
+        ]
+
+        conn = self._connect(symbol, interval)
+        try:
+            with conn:
+                if replace:
+                    conn.execute("DELETE FROM bars")
+                conn.executemany("INSERT OR REPLACE INTO bars VALUES (?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('tz', ?)", (tz,))
+                if period is not None:
+                    conn.execute("INSERT OR REPLACE INTO meta VALUES ('period', ?)", (period,))
+        finally:
+            conn.close()
+        if replace:
+            self._remember(symbol, interval, frame)
+        else:
+            self.memory.pop((symbol, interval), None)
+
+    def fetch_start(self, cached):
+        """差分取得の開始日（最終バーから overlap_days 日前）"""
+        start = cached.index[-1] - pd.Timedelta(days=self.overlap_days)
+        return start.strftime('%Y-%m-%d')
+
+    def merge(self, symbol, cached, fresh, interval='1d'):
+        """差分データをキャッシュへ統合
+
+        重複期間の終値が一致しない場合は分割・配当による価格調整とみなし、
+        キャッシュを破棄して None を返す（呼び出し側で全期間を再取得する）。
+        """
+        if fresh is None or fresh.empty:
+            return cached
+
+        # キャッシュ最終バーは取得時点で未確定の可能性があるため比較対象外
+        overlap = cached.index[:-1].intersection(fresh.index)
+        if len(overlap) > 0:
+            old_close = cached.loc[overlap, 'Close']
+            new_close = fresh.loc[overlap, 'Close']
+            diff = ((new_close - old_close).abs() / old_close.abs()).max()
+            if pd.notna(diff) and diff > self.adjustment_tolerance:
+                logger.info(f"{symbol}: 価格調整を検出（最大乖離 {diff:.4%}）、キャッシュを再構築します")
+                self.invalidate(symbol, interval)
+                return None
+
+        self.store(symbol, fresh, interval)
+        combined = pd.concat([cached[~cached.index.isin(fresh.index)], fresh[cached.columns.intersection(fresh.columns)]])
+        combined = self.prune(symbol, combined.sort_index(), interval)
+        self._remember(symbol, interval, combined)
+        return combined
+
+    def prune(self, symbol, frame, interval='1d'):
+        """全取得時の取得期間（covers() の判定に使う期間）より古いバーを削除
+
+        差分取得のたびにバーが追加されるため、古いバーを削除してファイルの肥大化を防ぐ。
+        """
+        conn = self._connect(symbol, interval)
+        try:
+            stored_period = self._get_meta(conn, 'period')
+            if not stored_period:
+                return frame
+            kept = trim_to_period(frame, stored_period)
+            stale = [(str(ts),) for ts in frame.index[:len(frame) - len(kept)]]
+            if stale:
+                with conn:
+                    conn.executemany("DELETE FROM bars WHERE ts = ?", stale)
+        finally:
+            conn.close()
+        return kept
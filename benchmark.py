@@ -0,0 +1,437 @@
+"""
+Enhanced RSI Alert System - オフラインベンチマーク
+合成OHLCVデータのプロバイダーとローカルのLINEスタブサーバーを使い、ネットワーク無しで
+取得・RSI計算・シグナル判定・履歴保存・通知の各段階の処理時間とピークメモリを
+銘柄数ごとに計測する。結果は benchmarks/results.jsonl に追記し、前回の結果と比較する。
+--startup では新しいプロセスでの起動時間（事前判定での終了・従来の初期化後の省略）と
+主要ライブラリの読み込み時間を計測し、benchmarks/startup.jsonl に追記する。
+
+使い方:
+    python benchmark.py [--sizes 10 100 1000] [--years 1] [--latency-ms 0]
+    python benchmark.py --startup [--runs 5]
+"""
+
+import argparse
+import http.server
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from bar_cache import period_to_days
+from history_store import HistoryStore
+from main import EnhancedRSIAlertSystem
+from trading_calendar import TradingCalendar
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_PATH = os.path.join(BASE_DIR, 'benchmarks', 'results.jsonl')
+DEFAULT_STARTUP_RESULTS_PATH = os.path.join(BASE_DIR, 'benchmarks', 'startup.jsonl')
+DEFAULT_SIZES = [10, 100, 500]
+STAGES = ['fetch', 'rsi', 'signal', 'history', 'notify']
+# 段階ごとに集計する run() のメトリクス（実行サマリーの stages のキー）
+# fetch・notify は取得スレッド・送信スレッドでの所要時間で、他の段階と並行する
+STAGE_METRICS = {
+    'fetch': ['fetch_chunk_seconds'],
+    'rsi': ['stage_seconds{stage=compute_universe_rsi}'],
+    'signal': ['stage_seconds{stage=get_stock_data}', 'stage_seconds{stage=check_enhanced_signals}'],
+    'history': ['stage_seconds{stage=save_enhanced_history}'],
+    'notify': ['line_request_seconds'],
+}
+STARTUP_MODULES = ['numpy', 'pandas', 'yfinance', 'requests', 'main']
+
+
+class SyntheticDataProvider:
+    """幾何ブラウン運動による合成日足（YahooDataProvider と同じインターフェース）
+
+    銘柄名から乱数シードを決めるため、同じ銘柄は常に同じ価格系列になる。
+    end_date を進めると新しい日足が追加されたように振る舞う。
+    """
+
+    def __init__(self, years=1, end_date=None, latency_ms=0.0, tz='America/New_York'):
+        self.end_date = pd.Timestamp(end_date or datetime.now().date())
+        self.start_date = self.end_date - pd.Timedelta(days=int(years * 365) + 370)
+        self.latency = latency_ms / 1000.0
+        self.tz = tz
+        self.requests = 0
+        self.frames = {}
+
+    def _series(self, symbol):
+        if symbol not in self.frames:
+            rng = np.random.default_rng(zlib.crc32(symbol.encode('utf-8')))
+            index = pd.bdate_range(self.start_date, self.end_date + pd.Timedelta(days=30), tz=self.tz, name='Date')
+            close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.025, len(index))))
+            spread = np.abs(rng.normal(0, 0.01, len(index)))
+            self.frames[symbol] = pd.DataFrame({
+                'Open': close * (1 + rng.normal(0, 0.005, len(index))),
+                'High': close * (1 + spread),
+                'Low': close * (1 - spread),
+                'Close': close,
+                'Volume': rng.integers(1_000_000, 10_000_000, len(index)).astype(float)
+            }, index=index)
+        frame = self.frames[symbol]
+        return frame[frame.index <= pd.Timestamp(self.end_date, tz=self.tz)]
+
+    def download(self, symbols, period=None, start=None, interval="1d", threads=True, timeout=10):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        results = {}
+        for symbol in symbols:
+            frame = self._series(symbol)
+            if start:
+                frame = frame[frame.index >= pd.Timestamp(start, tz=self.tz)]
+            elif period:
+                frame = frame[frame.index > frame.index[-1] - pd.Timedelta(days=period_to_days(period))]
+            results[symbol] = frame.copy()
+        return results
+
+    def history(self, symbol, period="6mo"):
+        return self.download([symbol], period=period)[symbol]
+
+
+class LineStub:
+    """LINE broadcast API のローカルスタブ（受信したメッセージ数を数えて200を返す）"""
+
+    def __init__(self, latency_ms=0.0):
+        stub = self
+        self.requests = 0
+        self.messages = 0
+        self.latency = latency_ms / 1000.0
+        self.lock = threading.Lock()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub.lock:
+                    stub.requests += 1
+                    stub.messages += len(body.get('messages', []))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v2/bot/message/broadcast"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_config(work_dir, symbols, line_url, template_path=None):
+    """作業ディレクトリ内に閉じた設定ファイルを作成"""
+    template_path = template_path or os.path.join(BASE_DIR, 'config.template.json')
+    with open(template_path, 'r') as f:
+        config = json.load(f)
+    config['symbols'] = symbols
+    config['symbol_specific_settings'] = {}
+    config['cache']['dir'] = os.path.join(work_dir, 'cache')
+    config['history'] = {
+        'db_path': os.path.join(work_dir, 'signals_history.sqlite'),
+        'archive_dir': os.path.join(work_dir, 'history_archive')
+    }
+    config['backtest']['cache_file'] = os.path.join(work_dir, 'backtest_cache.json')
+    config['notification']['line']['endpoint'] = line_url
+    config['notification']['dispatch']['outbox_path'] = os.path.join(work_dir, 'outbox.sqlite')
+    config['notification']['dispatch']['broadcasts_per_hour'] = 0
+    config['data_fetch']['requests_per_second'] = 0
+    config['metrics'].update({
+        'enabled': True,
+        'textfile': os.path.join(work_dir, 'metrics', 'rsi_alert.prom'),
+        'summary_file': os.path.join(work_dir, 'metrics', 'run_summary.jsonl'),
+        'http_port': None
+    })
+    config_path = os.path.join(work_dir, 'config.json')
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    return config_path
+
+
+def evaluate_day(system):
+    """本番と同じ run() で1日分実行し、Metrics の段階別タイマーから段階別時間を集計
+
+    戻り値は ({段階: 秒, 'total': run() 全体の秒数}, 通知件数)。
+    履歴のコミットは 'total' のみに含まれる。
+    """
+    started = time.perf_counter()
+    system.run(force=True)
+    total = time.perf_counter() - started
+
+    summary = system.metrics.run_summary()
+    timings = {
+        stage: sum(summary['stages'].get(key, {}).get('total', 0.0) for key in keys)
+        for stage, keys in STAGE_METRICS.items()
+    }
+    timings['total'] = total
+    alerts = sum(value for key, value in summary['counters'].items() if key.startswith('alerts_total'))
+    return timings, alerts
+
+
+def simulate(n_symbols, years, latency_ms, days, trace_memory=False):
+    """銘柄数 n_symbols で days 日分を順に評価（1日目はキャッシュ無し、2日目以降は差分取得）
+
+    戻り値は (日ごとの段階別時間, tracemalloc のピーク, 取得・通知の集計)。
+    """
+    work_dir = tempfile.mkdtemp(prefix='rsi_bench_')
+    symbols = [f"SYN{i:05d}" for i in range(n_symbols)]
+    end_dates = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=1), periods=days)
+    try:
+        with LineStub(latency_ms) as stub:
+            provider = SyntheticDataProvider(years, end_dates[0], latency_ms)
+            system = EnhancedRSIAlertSystem(make_config(work_dir, symbols, stub.url))
+            system.data_provider = provider
+
+            if trace_memory:
+                tracemalloc.start()
+            day_timings = []
+            alerts = 0
+            try:
+                for end_date in end_dates:
+                    provider.end_date = end_date
+                    timings, day_alerts = evaluate_day(system)
+                    day_timings.append(timings)
+                    alerts += day_alerts
+                peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+            finally:
+                if trace_memory:
+                    tracemalloc.stop()
+                system.stop_notifiers()
+                for notifier in system.all_notifiers():
+                    notifier.outbox.close()
+                system.history_store.close()
+
+            counts = {
+                'provider_requests': provider.requests,
+                'alerts': alerts,
+                'line_requests': stub.requests,
+                'line_messages': stub.messages
+            }
+            return day_timings, peak, counts
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_size(n_symbols, years, latency_ms, days, measure_memory):
+    """1銘柄数分のベンチマーク（ピークメモリは計測誤差を避けるため別パスで計測）"""
+    day_timings, _, counts = simulate(n_symbols, years, latency_ms, days)
+    phases = {'cold': day_timings[0]}
+    if len(day_timings) > 1:
+        # 2日目以降（差分取得）は平均
+        warm = day_timings[1:]
+        phases['warm'] = {key: sum(t[key] for t in warm) / len(warm) for key in warm[0]}
+
+    peak = None
+    if measure_memory:
+        _, peak, _ = simulate(n_symbols, years, latency_ms, days, trace_memory=True)
+
+    return dict({
+        'symbols': n_symbols,
+        'phases': {name: {k: round(v, 4) for k, v in t.items()} for name, t in phases.items()},
+        'peak_memory_mb': round(peak / 1024 / 1024, 2) if peak is not None else None
+    }, **counts)
+
+
+def import_times(work_dir, module='main'):
+    """新しいプロセスで module を読み込み、主要ライブラリの読み込み時間（秒、依存を含む）を返す"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=work_dir, env=dict(os.environ, PYTHONPATH=BASE_DIR), capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        if cumulative.isdigit() and name in STARTUP_MODULES:
+            times[name] = int(cumulative) / 1e6
+    return times
+
+
+def wall_time(command, work_dir, runs):
+    """コマンドを runs 回実行した所要時間の中央値（秒）"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=work_dir, env=dict(os.environ, PYTHONPATH=BASE_DIR),
+                       capture_output=True, check=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def measure_startup(runs=5):
+    """評価済みの日足が最新の状態で、起動から終了までの時間と読み込み時間を計測"""
+    work_dir = tempfile.mkdtemp(prefix='rsi_startup_')
+    try:
+        config_path = make_config(work_dir, ['SYN00000'], 'http://127.0.0.1:9/')
+        with open(config_path, 'r') as f:
+            db_path = json.load(f)['history']['db_path']
+        calendar = TradingCalendar()
+        bar_date, _ = calendar.latest_bar()
+        store = HistoryStore(db_path)
+        store.set_meta('last_bar_date', bar_date.isoformat())
+        store.set_meta('last_bar_final', '1')
+        store.set_meta('next_bar_at', calendar.next_bar_time(bar_date.isoformat(), True).isoformat())
+        store.close()
+
+        skip_script = "import sys; from main import EnhancedRSIAlertSystem; EnhancedRSIAlertSystem(sys.argv[1]).run()"
+        return {
+            'python': wall_time([sys.executable, '-c', 'pass'], work_dir, runs),
+            'fast_exit': wall_time([sys.executable, os.path.join(BASE_DIR, 'main.py'), '--config', config_path],
+                                   work_dir, runs),
+            'init_then_skip': wall_time([sys.executable, '-c', skip_script, config_path], work_dir, runs),
+            'imports': import_times(work_dir)
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def print_startup_report(record, previous):
+    """起動時間・読み込み時間を表示（前回結果があれば増減率も表示）"""
+    def row(label, value, before):
+        change = f" ({(value / before - 1) * 100:+.0f}%)" if before else ""
+        print(f"{label:>16} {value * 1000:9.1f}ms{change}")
+
+    before = (previous or {}).get('startup', {})
+    for key in ('python', 'fast_exit', 'init_then_skip'):
+        row(key, record['startup'][key], before.get(key))
+    print("ライブラリ読み込み（新しいプロセスで import main、依存を含む）:")
+    for name, value in record['startup']['imports'].items():
+        row(name, value, before.get('imports', {}).get(name))
+    if previous:
+        print(f"比較対象: {previous.get('revision')} ({previous.get('timestamp')})")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_previous(results_path, years=None, latency_ms=None):
+    """同じ条件（期間・疑似遅延）で計測した前回の結果（無い場合は None）"""
+    if not os.path.exists(results_path):
+        return None
+    last = None
+    with open(results_path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('years') == years and record.get('latency_ms') == latency_ms:
+                last = record
+    return last
+
+
+def print_report(record, previous):
+    """段階別の結果を表示（同じ銘柄数の前回結果があれば増減率も表示）"""
+    previous_sizes = {
+        (result['symbols'], phase): timings
+        for result in (previous or {}).get('results', [])
+        for phase, timings in result['phases'].items()
+    }
+    header = f"{'symbols':>8} {'phase':>5} " + ' '.join(f"{stage:>9}" for stage in STAGES + ['total']) + f" {'peakMB':>8}"
+    print(header)
+    for result in record['results']:
+        for phase, timings in result['phases'].items():
+            cells = []
+            for stage in STAGES + ['total']:
+                cell = f"{timings[stage]:.3f}"
+                before = previous_sizes.get((result['symbols'], phase), {}).get(stage)
+                if before:
+                    cell += f"({(timings[stage] / before - 1) * 100:+.0f}%)"
+                cells.append(f"{cell:>9}")
+            peak = result['peak_memory_mb']
+            print(f"{result['symbols']:>8} {phase:>5} " + ' '.join(cells) + f" {peak if peak is not None else '-':>8}")
+    if previous:
+        print(f"比較対象: {previous.get('revision')} ({previous.get('timestamp')})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSIアラートシステムのオフラインベンチマーク")
+    parser.add_argument('--sizes', type=int, nargs='*', default=DEFAULT_SIZES)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--days', type=int, default=3, help="計測する日数（1日目はキャッシュ無し）")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="データ取得・通知の疑似遅延")
+    parser.add_argument('--no-memory', action='store_true', help="tracemalloc によるピークメモリ計測を行わない")
+    parser.add_argument('--output', default=None,
+                        help="結果の追記先（既定は benchmarks/results.jsonl、--startup では startup.jsonl）")
+    parser.add_argument('--startup', action='store_true', help="起動時間・ライブラリ読み込み時間を計測")
+    parser.add_argument('--runs', type=int, default=5, help="起動時間の計測回数（中央値を記録）")
+    args = parser.parse_args()
+
+    if args.startup:
+        output = args.output or DEFAULT_STARTUP_RESULTS_PATH
+        record = {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'startup': measure_startup(max(1, args.runs))
+        }
+        previous = load_previous(output)
+        print_startup_report(record, previous)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'a') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return
+    args.output = args.output or DEFAULT_RESULTS_PATH
+
+    # main のログ設定（INFO）を各銘柄の出力が出ないよう抑制
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = [
+        run_size(n, args.years, args.latency_ms, max(1, args.days), not args.no_memory)
+        for n in args.sizes
+    ]
+    record = {
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'years': args.years,
+        'latency_ms': args.latency_ms,
+        'memory_traced': not args.no_memory,
+        'results': results
+    }
+
+    previous = load_previous(args.output, args.years, args.latency_ms)
+    print_report(record, previous)
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'a') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+if __name__ == "__main__":
+    main()
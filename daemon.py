@@ -0,0 +1,179 @@
+"""
+Enhanced RSI Alert System - 常駐モード
+EnhancedRSIAlertSystem を常駐させ、取引所の立会時間に合わせた独自スケジュールで
+判定を実行する。価格キャッシュ・通知接続・RSI状態はメモリ上で実行間に維持し、
+設定ファイルが更新されたら再読み込みする。
+
+使い方:
+    python daemon.py [--config C:\\rsi_alert\\config.json]
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+from datetime import datetime, time as dtime, timedelta
+from zoneinfo import ZoneInfo
+
+from main import EnhancedRSIAlertSystem
+
+logger = logging.getLogger(__name__)
+
+
+def parse_time(value):
+    """'HH:MM' 形式の時刻を datetime.time に変換"""
+    hour, minute = value.split(':')
+    return dtime(int(hour), int(minute))
+
+
+class MarketClock:
+    def __init__(self, timezone='America/New_York', session_open='09:30', session_close='16:00',
+                 interval_minutes=15, post_close_delay_minutes=5, calendar=None):
+        """取引所時間に合わせた実行スケジュール
+
+        interval_minutes: 立会時間中の判定間隔（0 の場合は引け後の1回のみ）
+        post_close_delay_minutes: 引け後、日足確定を待って最終判定するまでの分数
+        calendar: TradingCalendar（休場日・短縮取引日を反映、無い場合は平日のみ判定）
+        """
+        self.tz = ZoneInfo(timezone)
+        self.session_open = parse_time(session_open)
+        self.session_close = parse_time(session_close)
+        self.interval = timedelta(minutes=interval_minutes)
+        self.post_close_delay = timedelta(minutes=post_close_delay_minutes)
+        self.calendar = calendar
+
+    @classmethod
+    def from_config(cls, config, calendar=None):
+        return cls(
+            timezone=config.get('timezone', 'America/New_York'),
+            session_open=config.get('session_open', '09:30'),
+            session_close=config.get('session_close', '16:00'),
+            interval_minutes=config.get('interval_minutes', 15),
+            post_close_delay_minutes=config.get('post_close_delay_minutes', 5),
+            calendar=calendar
+        )
+
+    def now(self):
+        return datetime.now(self.tz)
+
+    def is_trading_day(self, day):
+        if self.calendar is not None:
+            return self.calendar.is_session(day)
+        return day.weekday() < 5
+
+    def run_times(self, day):
+        """指定日の実行時刻（立会時間中の一定間隔 + 引け後の最終判定）"""
+        session_open = datetime.combine(day, self.session_open, tzinfo=self.tz)
+        session_close = datetime.combine(day, self.session_close, tzinfo=self.tz)
+        if self.calendar is not None:
+            session_close = min(session_close, self.calendar.session_close(day).astimezone(self.tz))
+        times = []
+        if self.interval:
+            run_time = session_open + self.interval
+            while run_time < session_close:
+                times.append(run_time)
+                run_time += self.interval
+        times.append(session_close + self.post_close_delay)
+        return times
+
+    def next_run(self, after=None):
+        """after より後の最初の実行時刻"""
+        after = (after or self.now()).astimezone(self.tz)
+        day = after.date()
+        for _ in range(14):
+            if self.is_trading_day(day):
+                for run_time in self.run_times(day):
+                    if run_time > after:
+                        return run_time
+            day += timedelta(days=1)
+        raise RuntimeError("2週間以内に実行可能な取引日がありません")
+
+
+class RSIDaemon:
+    def __init__(self, config_path="C:\\rsi_alert\\config.json"):
+        """常駐デーモン初期化（システムは1回だけ初期化して使い回す）"""
+        self.system = EnhancedRSIAlertSystem(config_path)
+        self.system.resident = True
+        self.apply_daemon_config()
+        self.stop_event = threading.Event()
+
+    def apply_daemon_config(self):
+        daemon_config = self.system.config.get('daemon', {})
+        self.clock = MarketClock.from_config(daemon_config, self.system.calendar)
+        self.config_poll_seconds = daemon_config.get('config_poll_seconds', 30)
+        self.run_on_start = daemon_config.get('run_on_start', False)
+
+    def check_config(self):
+        """設定ファイルの更新を検知して再読み込み（スケジュールが変わった場合は True）"""
+        if not self.system.config_changed():
+            return False
+        try:
+            changed = self.system.reload_config()
+        except (OSError, ValueError) as e:
+            # 書きかけ・不正な設定は無視して現行設定で継続（次の更新まで再試行しない）
+            logger.error(f"設定再読み込みエラー（現行設定で継続）: {e}")
+            try:
+                self.system.config_mtime = os.path.getmtime(self.system.config_path)
+            except OSError:
+                pass
+            return False
+        if 'daemon' in changed or 'calendar' in changed:
+            self.apply_daemon_config()
+            return True
+        return False
+
+    def run_cycle(self):
+        """1回分の判定を実行（例外は通知して常駐を継続）"""
+        try:
+            self.system.run()
+        except Exception as e:
+            logger.error(f"Enhanced システムエラー: {e}")
+            error_message = f"⚠️ Enhanced RSIアラートシステムエラー\n\n{str(e)}\n\n管理者に連絡してください。"
+            self.system.send_line_message(error_message)
+
+    def wait_until(self, run_time):
+        """実行時刻まで待機（待機中も設定更新・停止要求を監視）。スケジュール変更時は False"""
+        while not self.stop_event.is_set():
+            if self.check_config():
+                return False
+            remaining = (run_time - self.clock.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            self.stop_event.wait(min(remaining, self.config_poll_seconds))
+        return False
+
+    def stop(self, *args):
+        logger.info("常駐モード停止要求を受け付けました")
+        self.stop_event.set()
+
+    def serve_forever(self):
+        logger.info("=== Enhanced RSIアラートシステム常駐モード開始 ===")
+        self.system.start_notifiers()
+        try:
+            if self.run_on_start:
+                self.run_cycle()
+            while not self.stop_event.is_set():
+                run_time = self.clock.next_run()
+                logger.info(f"次回実行: {run_time.strftime('%Y-%m-%d %H:%M %Z')}")
+                if self.wait_until(run_time):
+                    self.run_cycle()
+        finally:
+            self.system.flush_notifiers()
+            self.system.stop_notifiers()
+            logger.info("=== Enhanced RSIアラートシステム常駐モード終了 ===")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSIアラートシステム常駐モード")
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    args = parser.parse_args()
+
+    daemon = RSIDaemon(args.config)
+    signal.signal(signal.SIGINT, daemon.stop)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
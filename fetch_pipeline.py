@@ -0,0 +1,143 @@
+"""
+Enhanced RSI Alert System - 並列データ取得パイプライン
+銘柄チャンクを並列に取得し、レート制限・指数バックオフ付きリトライ・
+タスクごとのタイムアウトを適用して、取得完了した順に結果を返す
+（スレッドは外部から停止できないため、タイムアウトは取得関数の通信タイムアウトと
+リトライの打ち切りで実行中の取得にも適用する）
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from market_data import chunk_symbols
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """トークンバケット方式のレート制限（スレッドセーフ）"""
+
+    def __init__(self, rate, capacity=None):
+        """rate: 1秒あたりの補充トークン数、capacity: バースト上限"""
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """トークンが利用可能になるまで待機して消費"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    """指数バックオフ（フルジッター）の待機秒数"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+class FetchPipeline:
+    def __init__(self, fetch_func, max_workers=4, max_retries=3,
+                 base_delay=1.0, max_delay=30.0, task_timeout=60.0, request_timeout=30.0):
+        """並列取得パイプライン初期化
+
+        fetch_func(symbols, timeout) は {symbol: DataFrame} を返す関数（timeout は通信タイムアウトの秒数）。
+        結果に含まれない銘柄は取得失敗とみなし、指数バックオフ後に再取得する。レート制限は
+        リクエスト単位で fetch_func 側に適用する（TokenBucket を渡す）。
+        各試行の通信タイムアウトは request_timeout とタスクの残り時間の短い方で、
+        task_timeout を過ぎたタスクはリトライせずに打ち切る。
+        """
+        self.fetch_func = fetch_func
+        self.max_workers = max(1, int(max_workers))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.task_timeout = task_timeout
+        self.request_timeout = request_timeout
+
+    def _fetch_with_retry(self, symbols):
+        """1チャンク分を取得（取得できなかった銘柄のみリトライ、タスクのタイムアウトまで）"""
+        deadline = time.monotonic() + self.task_timeout if self.task_timeout else None
+        results = {}
+        remaining = list(symbols)
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                delay = backoff_delay(attempt - 1, self.base_delay, self.max_delay)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    logger.warning(f"タスクのタイムアウトまでに再取得できないため打ち切ります ({len(remaining)}銘柄)")
+                    break
+                logger.info(f"再取得まで{delay:.1f}秒待機 ({len(remaining)}銘柄, 試行{attempt + 1})")
+                time.sleep(delay)
+            timeout = self.request_timeout
+            if deadline is not None:
+                timeout = min(timeout or self.task_timeout, max(deadline - time.monotonic(), 0.1))
+            try:
+                frames = self.fetch_func(remaining, timeout)
+            except Exception as e:
+                logger.warning(f"チャンク取得エラー ({len(remaining)}銘柄): {e}")
+                frames = {}
+            results.update(frames)
+            remaining = [s for s in remaining if s not in frames]
+            if not remaining:
+                break
+        return results, remaining
+
+    def iter_results(self, symbols, chunk_size):
+        """取得完了したチャンクから順に (chunk, {symbol: DataFrame}) を返すジェネレータ
+
+        取得できなかった銘柄・タイムアウトした銘柄は辞書に含まれない。
+        """
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fetch')
+        started = {}
+        pending = set()
+        try:
+            for chunk in chunk_symbols(list(dict.fromkeys(symbols)), chunk_size):
+                future = executor.submit(self._fetch_with_retry, chunk)
+                started[future] = (chunk, None)
+                pending.add(future)
+
+            while pending:
+                done, pending = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+
+                for future in done:
+                    chunk, _ = started.pop(future)
+                    try:
+                        frames, failed = future.result()
+                    except Exception as e:
+                        logger.error(f"チャンク処理エラー: {e}")
+                        frames, failed = {}, chunk
+                    if failed:
+                        logger.warning(f"取得失敗銘柄: {', '.join(failed)}")
+                    yield chunk, frames
+
+                # 実行開始からの経過時間でタイムアウト判定（キュー待ちの時間は含めない）
+                for future in list(pending):
+                    chunk, start = started[future]
+                    if start is None:
+                        if future.running():
+                            started[future] = (chunk, now)
+                        continue
+                    if self.task_timeout and now - start > self.task_timeout:
+                        pending.discard(future)
+                        started.pop(future)
+                        future.cancel()
+                        # 実行中の取得は通信タイムアウトで終了し、その結果は使わずに破棄する
+                        logger.error(
+                            f"取得タイムアウト ({self.task_timeout}秒)、実行中の取得の結果は破棄します: "
+                            f"{', '.join(chunk)}"
+                        )
+                        yield chunk, {}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
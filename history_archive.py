@@ -0,0 +1,250 @@
+"""
+Enhanced RSI Alert System - 履歴アーカイブ
+保持期間を過ぎた signals_history の行を月単位の圧縮列指向ファイル
+（Parquet、pyarrow が無い場合は gzip 圧縮CSV）へ移し、SQLite には直近の行のみを残す。
+照会時は期間に該当する月のファイルと必要な列だけを読み込む。
+
+使い方:
+    python history_archive.py compact
+    python history_archive.py query --symbols TECL --start 2020-01-01 --columns date daily_rsi
+"""
+
+import argparse
+import glob
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from history_store import HISTORY_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow が無い環境では gzip 圧縮CSVで保存
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'parquet': '.parquet', 'csv': '.csv.gz'}
+FLOAT_COLUMNS = ['price', 'daily_rsi', 'weekly_rsi', 'prev_daily_rsi']
+PARTITION_PATTERN = re.compile(r'signals_history_(\d{4}-\d{2})(\.parquet|\.csv\.gz)$')
+DEFAULT_RETENTION_DAYS = 90
+
+
+def month_after(month):
+    """'YYYY-MM' の翌月1日（'YYYY-MM-DD'）"""
+    year, mon = int(month[:4]), int(month[5:7])
+    return date(year + mon // 12, mon % 12 + 1, 1).isoformat()
+
+
+def normalize_frame(frame):
+    """列順・型を揃え、(symbol, date) 順に並べる（同じ行は後の方を優先）"""
+    frame = frame.reindex(columns=HISTORY_COLUMNS)
+    for col in FLOAT_COLUMNS:
+        frame[col] = pd.to_numeric(frame[col], errors='coerce').astype('float64')
+    for col in HISTORY_COLUMNS:
+        if col not in FLOAT_COLUMNS:
+            frame[col] = frame[col].astype(object).where(frame[col].notna(), None)
+    frame = frame.drop_duplicates(['symbol', 'date'], keep='last')
+    return frame.sort_values(['symbol', 'date'], kind='stable').reset_index(drop=True)
+
+
+class HistoryArchive:
+    def __init__(self, archive_dir, format=None):
+        """月別パーティションのアーカイブ
+
+        format: 'parquet' または 'csv'（未指定時は pyarrow があれば parquet）
+        """
+        self.archive_dir = archive_dir
+        if format is None:
+            format = 'parquet' if pq is not None else 'csv'
+        if format == 'parquet' and pq is None:
+            logger.warning("pyarrow が無いため履歴アーカイブは gzip 圧縮CSVで保存します")
+            format = 'csv'
+        self.format = format
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config.get('archive_dir', "C:\\rsi_alert\\history_archive"),
+            format=config.get('archive_format')
+        )
+
+    def partition_path(self, month, format=None):
+        return os.path.join(self.archive_dir, f"signals_history_{month}{FORMATS[format or self.format]}")
+
+    def partitions(self):
+        """{月: [ファイルパス]}（形式を切り替えた月は両方の形式が並ぶ）"""
+        found = {}
+        for path in sorted(glob.glob(os.path.join(self.archive_dir, 'signals_history_*'))):
+            match = PARTITION_PATTERN.search(os.path.basename(path))
+            if match:
+                found.setdefault(match.group(1), []).append(path)
+        return found
+
+    def read_partition(self, path, columns=None, symbols=None):
+        """1ファイルを読み込む（Parquet は必要な列・銘柄の行グループのみ）"""
+        if path.endswith('.parquet'):
+            if pq is None:
+                raise RuntimeError(f"Parquet形式のアーカイブを読むには pyarrow が必要です: {path}")
+            filters = [('symbol', 'in', list(symbols))] if symbols is not None else None
+            return pq.read_table(path, columns=columns, filters=filters).to_pandas()
+        frame = pd.read_csv(
+            path, usecols=columns, compression='gzip', keep_default_na=False, na_values={
+                col: [''] for col in FLOAT_COLUMNS
+            }, dtype={col: str for col in HISTORY_COLUMNS if col not in FLOAT_COLUMNS}
+        )
+        if symbols is not None:
+            frame = frame[frame['symbol'].isin(list(symbols))]
+        # CSVでは文字列列の None が空文字になるため戻す
+        for col in frame.columns:
+            if col not in FLOAT_COLUMNS:
+                frame[col] = frame[col].where(frame[col] != '', None)
+        return frame
+
+    def write_partition(self, month, frame):
+        """月のパーティションに行を追加（既存の行と結合し、一時ファイルから置き換え）
+
+        同じ (symbol, date) の行は追加した行で置き換える。
+        """
+        existing = self.partitions().get(month, [])
+        if existing:
+            frame = pd.concat([self.read_partition(path) for path in existing] + [frame], ignore_index=True)
+        return self.replace_partition(month, normalize_frame(frame), existing)
+
+    def replace_partition(self, month, frame, existing):
+        """月のパーティションの内容を frame で置き換える（行が無くなった月はファイルを削除）"""
+        if frame.empty:
+            for old_path in existing:
+                os.remove(old_path)
+            return 0
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = self.partition_path(month)
+        tmp_path = f"{path}.tmp"
+        if self.format == 'parquet':
+            pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp_path, compression='zstd')
+        else:
+            frame.to_csv(tmp_path, index=False, compression='gzip')
+        os.replace(tmp_path, path)
+        for old_path in existing:
+            if old_path != path:
+                os.remove(old_path)
+        return len(frame)
+
+    def delete_range(self, symbols, start, end):
+        """指定銘柄の start〜end（両端含む）のアーカイブ済みの行を削除（削除行数を返す）"""
+        symbols = list(symbols)
+        removed = 0
+        for month, paths in sorted(self.partitions().items()):
+            if month < start[:7] or month > end[:7]:
+                continue
+            frame = pd.concat([self.read_partition(path) for path in paths], ignore_index=True)
+            drop = frame['symbol'].isin(symbols) & (frame['date'] >= start) & (frame['date'] <= end)
+            if drop.any():
+                self.replace_partition(month, normalize_frame(frame[~drop]), paths)
+                removed += int(drop.sum())
+        return removed
+
+    def keys(self, symbols, start, end):
+        """指定銘柄の start〜end（両端含む）のアーカイブ済みの行の {(symbol, date)}"""
+        frame = self.query(start, end, symbols, ['symbol', 'date'])
+        return set(zip(frame['symbol'], frame['date']))
+
+    def query(self, start=None, end=None, symbols=None, columns=None):
+        """期間に該当する月のパーティションから必要な列だけを読み込む"""
+        columns = [col for col in HISTORY_COLUMNS if columns is None or col in columns]
+        # 絞り込みに使う列は読み込み後に落とす
+        read_columns = list(dict.fromkeys(columns + ['date', 'symbol']))
+        frames = []
+        for month, paths in sorted(self.partitions().items()):
+            if start is not None and month < start[:7]:
+                continue
+            if end is not None and month > end[:7]:
+                continue
+            for path in paths:
+                frame = self.read_partition(path, read_columns, symbols)
+                if start is not None:
+                    frame = frame[frame['date'] >= start]
+                if end is not None:
+                    frame = frame[frame['date'] <= end]
+                frames.append(frame)
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)[columns]
+
+
+def compact_history(store, archive, retention_days=DEFAULT_RETENTION_DAYS, today=None, vacuum=True):
+    """保持期間より古い履歴行を月別アーカイブへ移し、SQLite から削除（移した行数を返す）
+
+    月ごとにアーカイブの書き込みが完了してから削除するため、途中で中断しても行は失われない
+    （再実行時は同じ行が重複せずに結合される）。
+    """
+    today = today or date.today()
+    cutoff = (today - timedelta(days=retention_days)).isoformat()
+    moved = 0
+    for month in store.months_before(cutoff):
+        columns, rows = store.query(start=f"{month}-01", before=min(cutoff, month_after(month)))
+        if not rows:
+            continue
+        archive.write_partition(month, pd.DataFrame(rows, columns=columns))
+        store.delete_before(cutoff, month)
+        moved += len(rows)
+        logger.info(f"履歴をアーカイブしました: {month} ({len(rows)}行)")
+    if moved and vacuum:
+        store.vacuum()
+    return moved
+
+
+def load_history(store, archive, start=None, end=None, symbols=None, columns=None):
+    """アーカイブと直近の履歴（SQLite）をまとめて取得（期間・銘柄・列で絞り込み）"""
+    archived = archive.query(start, end, symbols, columns) if archive is not None else None
+    names, rows = store.query(start, end, symbols, columns)
+    recent = pd.DataFrame(rows, columns=names)
+    for col in FLOAT_COLUMNS:
+        if col in recent.columns:
+            recent[col] = recent[col].astype('float64')
+    if archived is None or archived.empty:
+        return recent
+    if recent.empty:
+        return archived
+    return pd.concat([archived, recent], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シグナル履歴のアーカイブ・照会")
+    parser.add_argument('command', choices=['compact', 'query'])
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    parser.add_argument('--retention-days', type=int, default=None)
+    parser.add_argument('--symbols', nargs='*', default=None)
+    parser.add_argument('--start', default=None)
+    parser.add_argument('--end', default=None)
+    parser.add_argument('--columns', nargs='*', default=None)
+    parser.add_argument('--output', default=None, help="照会結果のCSV出力先（未指定時は画面表示）")
+    args = parser.parse_args()
+
+    from main import EnhancedRSIAlertSystem
+
+    system = EnhancedRSIAlertSystem(args.config)
+    if args.command == 'compact':
+        retention_days = args.retention_days or system.history_retention_days
+        moved = compact_history(system.history_store, system.history_archive, retention_days)
+        system.history_store.set_meta('history_compacted_date', datetime.now().strftime('%Y-%m-%d'))
+        logger.info(f"履歴アーカイブ完了: {moved}行")
+        return
+
+    frame = load_history(system.history_store, system.history_archive, args.start, args.end,
+                         args.symbols, args.columns)
+    if args.output:
+        frame.to_csv(args.output, index=False)
+        logger.info(f"照会結果を書き出しました: {args.output} ({len(frame)}行)")
+    else:
+        print(frame.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+"""
+Enhanced RSI Alert System - シグナル履歴ストア
+signals_history をSQLiteで管理し、(symbol, date) ユニークインデックスと最新状態テーブルで
+前回データを定数時間で参照できるようにする（同一バーの再実行は1行に上書き）
+"""
+
+import csv
+import json
+import logging
+import os
+import sqlite3
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLUMNS = [
+    'date', 'symbol', 'price', 'daily_rsi', 'weekly_rsi',
+    'signal_type', 'strategy', 'reason', 'prev_daily_rsi'
+]
+
+# CSV履歴で「値なし」を表していた文字列
+MISSING_VALUES = {'', 'None', 'N/A', 'nan'}
+
+
+def _to_float(value):
+    if value is None or value in MISSING_VALUES:
+        return None
+    return float(value)
+
+
+class HistoryStore:
+    def __init__(self, db_path):
+        """履歴ストア初期化"""
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self._pending = None
+        self._pending_states = None
+        # 保存済みRSI状態のメモリキャッシュ（常駐モードで実行間のDB読み込みを省く）
+        self._state_cache = {}
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS signals_history (
+                    date TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    price REAL,
+                    daily_rsi REAL,
+                    weekly_rsi REAL,
+                    signal_type TEXT,
+                    strategy TEXT,
+                    reason TEXT,
+                    prev_daily_rsi REAL
+                )
+            """)
+            # 旧バージョンの非ユニークインデックスは重複行を整理してからユニーク化（同一バーは1行）
+            has_old_index = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_history_symbol_date'"
+            ).fetchone()
+            if has_old_index:
+                removed = self.conn.execute("""
+                    DELETE FROM signals_history WHERE rowid NOT IN (
+                        SELECT MAX(rowid) FROM signals_history GROUP BY symbol, date
+                    )
+                """).rowcount
+                self.conn.execute("DROP INDEX idx_history_symbol_date")
+                if removed:
+                    logger.info(f"重複した履歴行を{removed}行削除しました")
+            self.conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_history_symbol_date_unique ON signals_history (symbol, date)"
+            )
+            # 銘柄ごとの最新状態（前回データ参照用）
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS latest_state (
+                    symbol TEXT PRIMARY KEY,
+                    date TEXT NOT NULL,
+                    daily_rsi REAL,
+                    weekly_rsi REAL
+                )
+            """)
+            # ストリーミングRSIの状態（銘柄・足種ごと）
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS rsi_state (
+                    symbol TEXT NOT NULL,
+                    timeframe TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    PRIMARY KEY (symbol, timeframe)
+                )
+            """)
+            # 購読者別に通知済みのシグナル（購読者ごとにしきい値が異なるため銘柄の履歴とは別に記録）
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS subscriber_signals (
+                    subscriber TEXT NOT NULL,
+                    symbol TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    signal_type TEXT NOT NULL,
+                    PRIMARY KEY (subscriber, symbol, date)
+                )
+            """)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def set_meta_many(self, items):
+        """複数の meta をまとめて保存（{key: value}）"""
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", list(items.items()))
+
+    def migrate_from_csv(self, csv_path):
+        """旧形式の signals_history.csv を一度だけ取り込む"""
+        done = self.conn.execute("SELECT value FROM meta WHERE key = 'csv_migrated'").fetchone()
+        if done or not os.path.exists(csv_path):
+            return 0
+
+        rows = []
+        with open(csv_path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                try:
+                    rows.append((
+                        row['date'],
+                        row['symbol'],
+                        _to_float(row['price']),
+                        _to_float(row['daily_rsi']),
+                        _to_float(row['weekly_rsi']),
+                        row['signal_type'],
+                        row['strategy'],
+                        row['reason'],
+                        _to_float(row['prev_daily_rsi']),
+                    ))
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"履歴移行: 不正な行をスキップ ({e})")
+
+        with self.conn:
+            self._insert_rows(rows)
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('csv_migrated', ?)", (csv_path,))
+
+        logger.info(f"CSV履歴を移行しました: {len(rows)}行")
+        return len(rows)
+
+    def get_latest(self, symbol, before=None):
+        """銘柄の最新状態を取得（無い場合は None）
+
+        before を指定した場合はその日付より前の最新行を返す（同一バーの再実行時に
+        自分自身と比較しないため）。
+        """
+        if before is None:
+            row = self.conn.execute(
+                "SELECT date, daily_rsi, weekly_rsi FROM latest_state WHERE symbol = ?", (symbol,)
+            ).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT date, daily_rsi, weekly_rsi FROM signals_history WHERE symbol = ? AND date < ? "
+                "ORDER BY date DESC LIMIT 1",
+                (symbol, before)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'date': row[0],
+            'daily_rsi': row[1] if row[1] is not None else float('nan'),
+            'weekly_rsi': row[2]
+        }
+
+    def get_latest_many(self, symbols, before):
+        """複数銘柄について before より前の最新行をまとめて取得（{symbol: get_latest() と同じ形式}）"""
+        latest = {}
+        symbols = list(symbols)
+        # SQLite のパラメーター数上限を超えないよう分割して照会
+        for start in range(0, len(symbols), 500):
+            part = symbols[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT symbol, MAX(date), daily_rsi, weekly_rsi FROM signals_history "
+                f"WHERE date < ? AND symbol IN ({', '.join('?' * len(part))}) GROUP BY symbol",
+                [before] + part
+            ).fetchall()
+            for row in rows:
+                latest[row[0]] = {
+                    'date': row[1],
+                    'daily_rsi': row[2] if row[2] is not None else float('nan'),
+                    'weekly_rsi': row[3]
+                }
+        return latest
+
+    def get_signal(self, symbol, date):
+        """指定バーで記録済みのシグナル種別（無い場合は None）"""
+        row = self.conn.execute(
+            "SELECT signal_type FROM signals_history WHERE symbol = ? AND date = ?", (symbol, date)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_subscriber_signal(self, subscriber, symbol, date):
+        """購読者に指定バーで通知済みのシグナル種別（無い場合は None）"""
+        row = self.conn.execute(
+            "SELECT signal_type FROM subscriber_signals WHERE subscriber = ? AND symbol = ? AND date = ?",
+            (subscriber, symbol, date)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_subscriber_signal(self, subscriber, symbol, date, signal_type):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO subscriber_signals VALUES (?, ?, ?, ?)",
+                (subscriber, symbol, date, signal_type)
+            )
+
+    def summarize_period(self, start_date, end_date):
+        """期間内の銘柄別集計（シグナル件数・日足RSIの最小/最大）"""
+        rows = self.conn.execute("""
+            SELECT symbol,
+                   COUNT(*),
+                   SUM(CASE WHEN signal_type = 'BUY' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN signal_type = 'SELL' THEN 1 ELSE 0 END),
+                   MIN(daily_rsi),
+                   MAX(daily_rsi)
+            FROM signals_history
+            WHERE date >= ? AND date <= ?
+            GROUP BY symbol
+        """, (start_date, end_date)).fetchall()
+        return {
+            row[0]: {
+                'rows': row[1],
+                'buy_signals': row[2],
+                'sell_signals': row[3],
+                'min_daily_rsi': row[4],
+                'max_daily_rsi': row[5]
+            }
+            for row in rows
+        }
+
+    def query(self, start=None, end=None, symbols=None, columns=None, before=None):
+        """期間・銘柄・列を指定して履歴行を取得（列名のリスト, 行のリスト）
+
+        end は指定日を含み、before は指定日を含まない。
+        """
+        columns = [col for col in HISTORY_COLUMNS if columns is None or col in columns]
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("date <= ?")
+            params.append(end)
+        if before is not None:
+            conditions.append("date < ?")
+            params.append(before)
+        if symbols is not None:
+            symbols = list(symbols)
+            conditions.append(f"symbol IN ({', '.join('?' * len(symbols))})")
+            params.extend(symbols)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.conn.execute(
+            f"SELECT {', '.join(columns)} FROM signals_history{where} ORDER BY date, symbol", params
+        ).fetchall()
+        return columns, rows
+
+    def delete_range(self, symbols, start, end):
+        """指定銘柄の start〜end（両端含む）の履歴行を削除（削除行数を返す）"""
+        symbols = list(symbols)
+        removed = 0
+        with self.conn:
+            for offset in range(0, len(symbols), 500):
+                part = symbols[offset:offset + 500]
+                removed += self.conn.execute(
+                    f"DELETE FROM signals_history WHERE date >= ? AND date <= ? "
+                    f"AND symbol IN ({', '.join('?' * len(part))})",
+                    [start, end] + part
+                ).rowcount
+        return removed
+
+    def insert_many(self, rows):
+        """履歴行（HISTORY_COLUMNS 順のタプル）をまとめて追加（同一バーの既存行は残す、追加行数を返す）
+
+        最新状態は銘柄ごとの最後の行のみで更新する（日付順に並んでいること）。
+        """
+        if not rows:
+            return 0
+        last_rows = {row[1]: row for row in rows}
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO signals_history ({', '.join(HISTORY_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})",
+                rows
+            )
+            inserted = self.conn.total_changes - before
+            self.conn.executemany("""
+                INSERT INTO latest_state (symbol, date, daily_rsi, weekly_rsi) VALUES (?, ?, ?, ?)
+                ON CONFLICT(symbol) DO UPDATE SET
+                    date = excluded.date, daily_rsi = excluded.daily_rsi, weekly_rsi = excluded.weekly_rsi
+                WHERE excluded.date >= latest_state.date
+            """, [(r[1], r[0], r[3], r[4]) for r in last_rows.values()])
+        return inserted
+
+    def months_before(self, cutoff):
+        """cutoff より前の行を含む月（'YYYY-MM'）の一覧"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT substr(date, 1, 7) FROM signals_history WHERE date < ? ORDER BY 1", (cutoff,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_before(self, cutoff, month=None):
+        """cutoff より前の履歴行を削除（アーカイブ済みの行、month 指定時はその月のみ）"""
+        with self.conn:
+            if month is None:
+                return self.conn.execute("DELETE FROM signals_history WHERE date < ?", (cutoff,)).rowcount
+            return self.conn.execute(
+                "DELETE FROM signals_history WHERE date < ? AND substr(date, 1, 7) = ?", (cutoff, month)
+            ).rowcount
+
+    def vacuum(self):
+        """削除した領域を解放してファイルを縮小"""
+        self.conn.execute("VACUUM")
+
+    def get_rsi_state(self, symbol, timeframe):
+        """保存済みのRSI状態を取得（無い場合は None）"""
+        if self._pending_states is not None and (symbol, timeframe) in self._pending_states:
+            return self._pending_states[(symbol, timeframe)]
+        if (symbol, timeframe) in self._state_cache:
+            return self._state_cache[(symbol, timeframe)]
+        row = self.conn.execute(
+            "SELECT state FROM rsi_state WHERE symbol = ? AND timeframe = ?", (symbol, timeframe)
+        ).fetchone()
+        state = json.loads(row[0]) if row else None
+        self._state_cache[(symbol, timeframe)] = state
+        return state
+
+    def put_rsi_state(self, symbol, timeframe, state):
+        """RSI状態を保存（バッチ中はトランザクション終了時にまとめて書き込み）"""
+        if self._pending_states is not None:
+            self._pending_states[(symbol, timeframe)] = state
+            return
+        with self.conn:
+            self._write_states({(symbol, timeframe): state})
+
+    def _write_states(self, states):
+        self._state_cache.update(states)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO rsi_state (symbol, timeframe, state) VALUES (?, ?, ?)",
+            [(symbol, timeframe, json.dumps(state)) for (symbol, timeframe), state in states.items()]
+        )
+
+    def append(self, row):
+        """履歴行を追加（バッチ中はトランザクション終了時にまとめて書き込み）"""
+        values = tuple(row.get(col) for col in HISTORY_COLUMNS)
+        if self._pending is not None:
+            self._pending.append(values)
+            return
+        with self.conn:
+            self._insert_rows([values])
+
+    @contextmanager
+    def batch(self):
+        """実行中の書き込みをまとめ、終了時に1トランザクションで保存"""
+        if self._pending is not None:
+            yield self
+            return
+
+        self._pending = []
+        self._pending_states = {}
+        try:
+            yield self
+        finally:
+            pending, self._pending = self._pending, None
+            pending_states, self._pending_states = self._pending_states, None
+            if pending or pending_states:
+                with self.conn:
+                    self._insert_rows(pending)
+                    self._write_states(pending_states)
+                logger.info(f"履歴を一括保存しました: {len(pending)}行")
+
+    def _insert_rows(self, rows):
+        if not rows:
+            return
+        # 同一バーは最新の評価で上書き（発生済みのシグナルは再評価で消えても記録を残す）
+        self.conn.executemany(f"""
+            INSERT INTO signals_history ({', '.join(HISTORY_COLUMNS)}) VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})
+            ON CONFLICT(symbol, date) DO UPDATE SET
+                price = excluded.price,
+                daily_rsi = excluded.daily_rsi,
+                weekly_rsi = excluded.weekly_rsi,
+                prev_daily_rsi = excluded.prev_daily_rsi,
+                signal_type = CASE WHEN excluded.signal_type = 'NONE' THEN signal_type ELSE excluded.signal_type END,
+                strategy = CASE WHEN excluded.signal_type = 'NONE' THEN strategy ELSE excluded.strategy END,
+                reason = CASE WHEN excluded.signal_type = 'NONE' THEN reason ELSE excluded.reason END
+        """, rows)
+        # 最新状態を更新（同日の再実行は後から書いた行を優先）
+        self.conn.executemany("""
+            INSERT INTO latest_state (symbol, date, daily_rsi, weekly_rsi) VALUES (?, ?, ?, ?)
+            ON CONFLICT(symbol) DO UPDATE SET
+                date = excluded.date, daily_rsi = excluded.daily_rsi, weekly_rsi = excluded.weekly_rsi
+            WHERE excluded.date >= latest_state.date
+        """, [(r[1], r[0], r[3], r[4]) for r in rows])
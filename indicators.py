@@ -0,0 +1,420 @@
+"""
+Enhanced RSI Alert System - 指標エンジン
+MACD・ボリンジャー%B・ストキャスティクスRSI・RSIダイバージェンスを、RSIと共通の
+中間値（価格差分・上昇幅/下落幅・移動平均・EMA・移動標準偏差等）から計算する。
+各指標は必要な中間値を宣言し、中間値は系列（銘柄×時間足）ごとに1回だけ計算して
+指標間で再利用する。アラート判定で計算済みのRSI系列は中間値として受け取り、再計算しない。
+設定の銘柄別 indicator_filters から指標を名前で参照できる。
+
+設定例（config.json）:
+    "indicators": {
+      "macd_hist": {"type": "macd", "fast": 12, "slow": 26, "signal": 9, "output": "hist"},
+      "bb_percent_b": {"type": "bollinger_percent_b", "period": 20, "num_std": 2}
+    },
+    "symbol_specific_settings": {
+      "TECL": {"indicator_filters": [
+        {"indicator": "bb_percent_b", "timeframe": "daily", "signal": "BUY", "op": "<=", "value": 0.2}
+      ]}
+    }
+
+使い方:
+    python indicators.py --symbols TECL SOXL      # 設定済みの全指標の最新値を表示
+"""
+
+import argparse
+import json
+import logging
+import math
+import operator
+
+import numpy as np
+
+from market_data import resample_bars
+from rsi_engine import wilder_average
+from run_state import WARMUP_FACTOR, rsi_lookback
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAMES = ('daily', 'weekly')
+
+FILTER_OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+CLOSE = ('close',)
+
+
+class SeriesContext:
+    """1系列分の中間値キャッシュ（キーは (中間値名, 引数...)、同じキーは1回だけ計算）
+
+    seed: 呼び出し側で計算済みの中間値 {キー: 系列}（close の日付に揃えて登録し、再計算しない）
+    """
+
+    def __init__(self, close, seed=None):
+        self.close = close
+        self.cache = {CLOSE: close}
+        for key, series in (seed or {}).items():
+            self.cache[key] = series.reindex(close.index)
+
+    def get(self, key):
+        value = self.cache.get(key)
+        if value is None:
+            value = INTERMEDIATES[key[0]](self, *key[1:])
+            self.cache[key] = value
+        return value
+
+
+def _delta(ctx):
+    return ctx.close.diff()
+
+
+def _gain(ctx):
+    delta = ctx.get(('delta',))
+    return delta.where(delta > 0, 0)
+
+
+def _loss(ctx):
+    delta = ctx.get(('delta',))
+    return -delta.where(delta < 0, 0)
+
+
+def _sma(ctx, source, window):
+    return ctx.get(source).rolling(window=window).mean()
+
+
+def _wilder(ctx, source, window):
+    return wilder_average(ctx.get(source), window)
+
+
+def _ema(ctx, source, span):
+    return ctx.get(source).ewm(span=span, adjust=False).mean()
+
+
+def _std(ctx, source, window):
+    return ctx.get(source).rolling(window=window).std(ddof=0)
+
+
+def _rolling_min(ctx, source, window):
+    return ctx.get(source).rolling(window=window).min()
+
+
+def _rolling_max(ctx, source, window):
+    return ctx.get(source).rolling(window=window).max()
+
+
+def _rsi(ctx, period, smoothing):
+    """calculate_rsi_series() と同じ定義（上昇幅・下落幅の平均は他の指標と共有）"""
+    average = 'wilder' if smoothing == 'wilder' else 'sma'
+    rs = ctx.get((average, ('gain',), period)) / ctx.get((average, ('loss',), period))
+    return 100 - (100 / (1 + rs))
+
+
+def _macd_line(ctx, fast, slow):
+    return ctx.get(('ema', CLOSE, fast)) - ctx.get(('ema', CLOSE, slow))
+
+
+INTERMEDIATES = {
+    'delta': _delta,
+    'gain': _gain,
+    'loss': _loss,
+    'sma': _sma,
+    'wilder': _wilder,
+    'ema': _ema,
+    'std': _std,
+    'min': _rolling_min,
+    'max': _rolling_max,
+    'rsi': _rsi,
+    'macd_line': _macd_line
+}
+
+
+def rsi_key(params):
+    return ('rsi', params['rsi_period'], params['smoothing'])
+
+
+def _last(series):
+    if series.empty:
+        return float('nan')
+    return float(series.iloc[-1])
+
+
+class Indicator:
+    """指標の種類の基底（defaults: 既定の引数）
+
+    各指標は次のメソッドを実装し、INDICATOR_TYPES に登録する。
+        requires(params): 使用する中間値のキーのリスト
+        lookback(params): 最新値が変わらない範囲で系列を切り詰められる本数
+        latest(ctx, params): SeriesContext の中間値から計算した最新値
+    """
+    defaults = {}
+
+
+class RSI(Indicator):
+    def requires(self, params):
+        return [rsi_key(params)]
+
+    def lookback(self, params):
+        return rsi_lookback(params['rsi_period'], params['smoothing'])
+
+    def latest(self, ctx, params):
+        return _last(ctx.get(rsi_key(params)))
+
+
+class MACD(Indicator):
+    defaults = {'fast': 12, 'slow': 26, 'signal': 9, 'output': 'hist'}
+
+    def requires(self, params):
+        line = ('macd_line', params['fast'], params['slow'])
+        return [('ema', CLOSE, params['fast']), ('ema', CLOSE, params['slow']), line,
+                ('ema', line, params['signal'])]
+
+    def lookback(self, params):
+        return WARMUP_FACTOR * (params['slow'] + params['signal'])
+
+    def latest(self, ctx, params):
+        line = ('macd_line', params['fast'], params['slow'])
+        macd = _last(ctx.get(line))
+        signal = _last(ctx.get(('ema', line, params['signal'])))
+        return {'macd': macd, 'signal': signal, 'hist': macd - signal}[params['output']]
+
+
+class BollingerPercentB(Indicator):
+    defaults = {'period': 20, 'num_std': 2.0}
+
+    def requires(self, params):
+        return [('sma', CLOSE, params['period']), ('std', CLOSE, params['period'])]
+
+    def lookback(self, params):
+        return params['period']
+
+    def latest(self, ctx, params):
+        middle = _last(ctx.get(('sma', CLOSE, params['period'])))
+        width = params['num_std'] * _last(ctx.get(('std', CLOSE, params['period'])))
+        if not width:
+            return float('nan')
+        return (_last(ctx.close) - (middle - width)) / (2 * width)
+
+
+class StochRSI(Indicator):
+    defaults = {'period': 14, 'k': 3}
+
+    def requires(self, params):
+        rsi = rsi_key(params)
+        return [rsi, ('min', rsi, params['period']), ('max', rsi, params['period'])]
+
+    def lookback(self, params):
+        return rsi_lookback(params['rsi_period'], params['smoothing']) + params['period'] + params['k']
+
+    def latest(self, ctx, params):
+        rsi = ctx.get(rsi_key(params))
+        if len(rsi) < params['k']:
+            return float('nan')
+        # %K の平滑化に必要な末尾 k 本のみ計算
+        tail = slice(len(rsi) - params['k'], None)
+        low = ctx.get(('min', rsi_key(params), params['period'])).values[tail]
+        high = ctx.get(('max', rsi_key(params), params['period'])).values[tail]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stoch = (rsi.values[tail] - low) / (high - low)
+        return float(np.mean(stoch))
+
+
+class RSIDivergence(Indicator):
+    """直近 lookback 本と、その前の lookback 本の安値・高値を比較（強気 +1 / 弱気 -1 / なし 0）"""
+    defaults = {'lookback': 14}
+
+    def requires(self, params):
+        return [rsi_key(params)]
+
+    def lookback(self, params):
+        return rsi_lookback(params['rsi_period'], params['smoothing']) + 2 * params['lookback']
+
+    def latest(self, ctx, params):
+        lookback = params['lookback']
+        close = ctx.close.values[-2 * lookback:]
+        rsi = ctx.get(rsi_key(params)).values[-2 * lookback:]
+        if len(close) < 2 * lookback or np.isnan(rsi).any():
+            return float('nan')
+        prior, recent = slice(0, lookback), slice(lookback, None)
+        prior_low, recent_low = np.argmin(close[prior]), lookback + np.argmin(close[recent])
+        if close[recent_low] < close[prior_low] and rsi[recent_low] > rsi[prior_low]:
+            return 1.0
+        prior_high, recent_high = np.argmax(close[prior]), lookback + np.argmax(close[recent])
+        if close[recent_high] > close[prior_high] and rsi[recent_high] < rsi[prior_high]:
+            return -1.0
+        return 0.0
+
+
+INDICATOR_TYPES = {
+    'rsi': RSI(),
+    'macd': MACD(),
+    'bollinger_percent_b': BollingerPercentB(),
+    'stoch_rsi': StochRSI(),
+    'rsi_divergence': RSIDivergence()
+}
+
+
+class IndicatorFilter:
+    __slots__ = ('indicator', 'timeframe', 'signal', 'op', 'op_name', 'value')
+
+    def __init__(self, indicator, value, op='<=', timeframe='daily', signal=None):
+        """指標の最新値に対する条件（signal を指定した場合はその売買方向のみに適用）"""
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"未対応の比較演算子: {op}")
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"未対応の時間足: {timeframe}")
+        self.indicator = indicator
+        self.timeframe = timeframe
+        self.signal = signal
+        self.op = FILTER_OPERATORS[op]
+        self.op_name = op
+        self.value = value
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['indicator'], config['value'], config.get('op', '<='),
+                   config.get('timeframe', 'daily'), config.get('signal'))
+
+    @property
+    def label(self):
+        return f"{self.indicator}({self.timeframe})"
+
+
+def compile_filters(settings):
+    """銘柄別設定の indicator_filters を IndicatorFilter のリストに変換"""
+    return [IndicatorFilter.from_config(entry) for entry in settings.get('indicator_filters', [])]
+
+
+def check_indicator_filters(filters, row, signal_type):
+    """シグナル候補に指標フィルターを適用（(通過したか, 理由) を返す）
+
+    週足RSIと同じく、値が無い指標（未計算・データ不足）の条件は適用しない。
+    """
+    values = row.get('indicators') or {}
+    passed = []
+    for indicator_filter in filters:
+        if indicator_filter.signal not in (None, signal_type):
+            continue
+        value = values.get(indicator_filter.timeframe, {}).get(indicator_filter.indicator)
+        if value is None or math.isnan(value):
+            continue
+        condition = f"{indicator_filter.op_name}{indicator_filter.value}"
+        if not indicator_filter.op(value, indicator_filter.value):
+            return False, f"指標フィルターで除外 ({indicator_filter.label}: {value:.2f}, 条件 {condition})"
+        passed.append(f"{indicator_filter.label}: {value:.2f}{condition}")
+    return True, ", ".join(passed)
+
+
+class IndicatorEngine:
+    def __init__(self, definitions, rsi_period=14, smoothing='sma'):
+        """名前付きの指標定義（{name: {'type': ..., 引数...}}）を検証して保持"""
+        self.definitions = {}
+        for name, definition in definitions.items():
+            kind = definition.get('type', name)
+            if kind not in INDICATOR_TYPES:
+                raise ValueError(f"未対応の指標: {name} (type: {kind})")
+            params = dict(INDICATOR_TYPES[kind].defaults, rsi_period=rsi_period, smoothing=smoothing)
+            params.update((key, value) for key, value in definition.items() if key != 'type')
+            self.definitions[name] = (INDICATOR_TYPES[kind], params)
+        # 名前を付けずに参照できる既定のRSI（アラート判定のRSIと同じ設定）
+        self.definitions.setdefault('rsi', (INDICATOR_TYPES['rsi'], {'rsi_period': rsi_period, 'smoothing': smoothing}))
+        self.rsi_key = rsi_key({'rsi_period': rsi_period, 'smoothing': smoothing})
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.get('indicators', {}), config['rsi_period'], config.get('rsi', {}).get('smoothing', 'sma'))
+
+    def needs(self, filter_lists):
+        """フィルターが参照する (時間足, 指標名) の集合（未定義の指標名は設定エラー）"""
+        needed = set()
+        for filters in filter_lists:
+            for indicator_filter in filters:
+                if indicator_filter.indicator not in self.definitions:
+                    raise ValueError(f"indicator_filters が未定義の指標を参照しています: {indicator_filter.indicator}")
+                needed.add((indicator_filter.timeframe, indicator_filter.indicator))
+        return needed
+
+    def lookback(self, name):
+        indicator, params = self.definitions[name]
+        return indicator.lookback(params)
+
+    def rsi_timeframes(self, needed):
+        """指定した (時間足, 指標名) のうち、アラート判定と同じRSI系列を使う時間足の集合
+
+        この時間足ではRSI計算側で求めた系列を evaluate(rsi_series=...) で渡せば、
+        価格差分・上昇幅/下落幅・RSIを指標エンジンで再計算しない。
+        """
+        timeframes = set()
+        for timeframe, name in needed:
+            indicator, params = self.definitions[name]
+            if self.rsi_key in indicator.requires(params):
+                timeframes.add(timeframe)
+        return timeframes
+
+    def shared_intermediates(self, names=None):
+        """複数の指標が使う中間値のキーと参照数（設定確認用）"""
+        counts = {}
+        for name in names if names is not None else self.definitions:
+            indicator, params = self.definitions[name]
+            for key in indicator.requires(params):
+                counts[key] = counts.get(key, 0) + 1
+        return {key: count for key, count in counts.items() if count > 1}
+
+    def evaluate_series(self, close, names, rsi=None):
+        """1系列について指定した指標の最新値を計算（中間値は指標間で共有、rsi: 計算済みのRSI系列）"""
+        ctx = SeriesContext(close.dropna(), {self.rsi_key: rsi} if rsi is not None else None)
+        values = {}
+        for name in names:
+            indicator, params = self.definitions[name]
+            try:
+                values[name] = indicator.latest(ctx, params)
+            except Exception as e:
+                logger.error(f"指標計算エラー ({name}): {e}")
+                values[name] = float('nan')
+        return values
+
+    def evaluate(self, daily_hist, needed=None, rsi_series=None):
+        """日足から時間足ごとの指標の最新値を計算（{timeframe: {name: value}}）
+
+        needed: (時間足, 指標名) の集合。省略時は全指標を日足・週足で計算する。
+        rsi_series: アラート判定で計算済みのRSI系列 {時間足: Series}（既定のRSIの中間値として共有）。
+        週足は週足の指標が必要な場合のみ作成する。
+        """
+        rsi_series = rsi_series or {}
+        if needed is None:
+            needed = {(timeframe, name) for timeframe in TIMEFRAMES for name in self.definitions}
+        result = {}
+        for timeframe in TIMEFRAMES:
+            names = sorted(name for needed_timeframe, name in needed if needed_timeframe == timeframe)
+            if not names:
+                continue
+            frame = daily_hist if timeframe == 'daily' else resample_bars(daily_hist, 'weekly')
+            if frame.empty:
+                continue
+            result[timeframe] = self.evaluate_series(frame['Close'], names, rsi_series.get(timeframe))
+        return result
+
+
+def main():
+    from main import EnhancedRSIAlertSystem
+
+    parser = argparse.ArgumentParser(description="RSIアラートシステム 指標の最新値表示")
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    parser.add_argument('--symbols', nargs='+', default=None, help="対象銘柄（未指定時は監視銘柄）")
+    args = parser.parse_args()
+
+    system = EnhancedRSIAlertSystem(args.config)
+    engine = system.indicator_engine
+    for key, count in engine.shared_intermediates().items():
+        logger.info(f"共有される中間値: {key} ({count}指標)")
+    daily_data = system.prefetch_daily_data(args.symbols or system.symbols)
+    report = {symbol: engine.evaluate(frame) for symbol, frame in daily_data.items()}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
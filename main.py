@@ -1,127 +1,504 @@
-import yfinance as yf
+from startup import parse_args, exit_if_up_to_date, configure_logging
+
+if __name__ == "__main__":
+    # 取得・計算が不要なスケジュール実行は pandas 等を読み込む前に終了
+    exit_if_up_to_date(parse_args())
+
 import pandas as pd
+import numpy as np
 import json
-import csv
-import requests
 from datetime import datetime, timedelta
 import os
+import time
 import logging
 
-# ログ設定
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('C:\\rsi_alert\\system.log'),
-        logging.StreamHandler()
-    ]
+from backtest import BacktestCache, settings_hash, format_performance_info, DEFAULT_YEARS
+from bar_cache import BarCache
+from fetch_pipeline import FetchPipeline, TokenBucket
+from history_store import HistoryStore
+from history_archive import HistoryArchive, compact_history, DEFAULT_RETENTION_DAYS
+from metrics import Metrics, MetricsServer, instrumented
+from notifier import Outbox, LineNotifier, LINE_BROADCAST_URL
+from signal_rules import SignalRules
+from indicators import IndicatorEngine, compile_filters, check_indicator_filters
+from run_state import (SymbolSnapshot, SignalRecord, compact_frame, chunk_size_for_budget, rsi_lookback,
+                       daily_bars_for_weekly)
+from subscriptions import SubscriptionIndex
+from trading_calendar import TradingCalendar
+from rsi_engine import calculate_rsi_series, calculate_rsi_matrix, latest_rsi_matrix, advance_rsi_state, StreamingRSI
+from market_data import (
+    fetch_daily_bars, fetch_daily_bars_cached, resample_bars, YahooDataProvider,
+    DEFAULT_CHUNK_SIZE, DEFAULT_DAILY_PERIOD
 )
+
+# ログ設定
+configure_logging()
 logger = logging.getLogger(__name__)
 
 class EnhancedRSIAlertSystem:
     def __init__(self, config_path="C:\\rsi_alert\\config.json"):
         """Enhanced RSIアラートシステム初期化"""
-        with open(config_path, 'r') as f:
-            self.config = json.load(f)
+        self.config_path = config_path
+        self.config_mtime = os.path.getmtime(config_path)
+        self.config = self.load_config()
+        
+        # 常駐モードでは通知スレッドを実行間で維持する（daemon.py が設定）
+        self.resident = False
+        
+        # 価格データの取得元（ベンチマーク等では合成データのプロバイダーに差し替える）
+        self.data_provider = YahooDataProvider()
+        
+        self.apply_settings()
+        self.init_metrics()
+        self.init_fetch_pipeline()
+        self.init_bar_cache()
+        self.init_notifier()
+        self.init_backtest_cache()
+        self.init_calendar()
+        
+        # 実行単位の市場データスナップショット {(symbol, as_of): data}
+        self.snapshot_cache = {}
         
+        # 履歴ファイル初期化
+        self.init_history_file()
+        
+        logger.info("Enhanced RSI Alert System initialized")
+        logger.info(f"Enhanced Mode: {self.enhanced_mode}")
+    
+    def load_config(self):
+        """設定ファイルを読み込む（シャード実行ではパスを書き換える）"""
+        with open(self.config_path, 'r') as f:
+            return json.load(f)
+    
+    def apply_settings(self):
+        """銘柄・RSI関連の設定を反映"""
         self.symbols = self.config['symbols']
         self.rsi_period = self.config['rsi_period']
         self.enhanced_mode = self.config.get('enhanced_mode', False)
         self.symbol_settings = self.config.get('symbol_specific_settings', {})
+        # シグナル判定用のしきい値配列（設定の読み込み時に1回だけ作成）
+        self.signal_rules = SignalRules(self.symbols, self.symbol_settings)
+        
+        # 購読者別のウォッチリスト（取得・RSI計算は全購読者の銘柄を合わせて1回だけ行う）
+        self.subscriptions = SubscriptionIndex.from_config(self.config.get('subscribers', []))
+        self.symbol_set = set(self.symbols)
+        self.universe = list(dict.fromkeys(self.symbols + self.subscriptions.symbols()))
+        
+        # RSI計算方式（sma: 従来の単純移動平均 / wilder: Wilder平滑化）
+        rsi_config = self.config.get('rsi', {})
+        self.rsi_smoothing = rsi_config.get('smoothing', 'sma')
+        self.incremental_rsi = rsi_config.get('incremental', False)
+        self.rsi_dtype = np.float32 if rsi_config.get('dtype') == 'float32' else np.float64
+        
+        # 指標フィルターが参照する指標のみ、銘柄ごとに中間値を共有して計算
+        self.indicator_engine = IndicatorEngine.from_config(self.config)
+        all_rules = [self.signal_rules] + [subscriber.rules for subscriber in self.subscriptions.subscribers.values()]
+        self.indicator_needs = self.indicator_engine.needs(
+            filters for rules in all_rules for filters in rules.filters
+        )
+        # 判定用に計算したRSI系列をそのまま指標の中間値として渡す時間足
+        self.indicator_rsi_timeframes = self.indicator_engine.rsi_timeframes(self.indicator_needs)
+        
+        # 省メモリ設定（予算を設定すると日足を終値のみ・必要な本数のみに切り詰めて保持）
+        memory_config = self.config.get('memory', {})
+        self.memory_budget_mb = memory_config.get('budget_mb')
+        self.compact_dtype = np.float64 if memory_config.get('dtype') == 'float64' else np.float32
+        self.state_bars = self.required_bars() if self.memory_budget_mb else None
         
         self.access_token = self.config['notification']['line']['access_token']
         self.history_file = "C:\\rsi_alert\\signals_history.csv"
+        history_config = self.config.get('history', {})
+        self.history_db = history_config.get('db_path', "C:\\rsi_alert\\signals_history.sqlite")
+        # 保持期間を過ぎた履歴は月別アーカイブへ移す（0 で無効）
+        self.history_retention_days = history_config.get('retention_days', DEFAULT_RETENTION_DAYS)
+    
+    def init_metrics(self):
+        """処理段階ごとの計測（無効時は計測処理を行わない）"""
+        metrics_config = self.config.get('metrics', {})
+        self.metrics = Metrics.from_config(metrics_config)
+        self.metrics_textfile = metrics_config.get('textfile')
+        self.metrics_summary_file = metrics_config.get('summary_file')
+        self.metrics_server = None
+        if self.metrics.enabled and metrics_config.get('http_port'):
+            try:
+                self.metrics_server = MetricsServer(
+                    self.metrics, metrics_config['http_port'], metrics_config.get('http_host', '127.0.0.1')
+                )
+            except OSError as e:
+                logger.error(f"メトリクスエンドポイント開始エラー: {e}")
+    
+    def required_bars(self):
+        """日足を切り詰めても最新のRSI・指標フィルターの値が変わらない本数"""
+        rsi_bars = rsi_lookback(self.rsi_period, self.rsi_smoothing)
+        daily_bars = [rsi_bars]
+        weekly_bars = [rsi_bars]
+        for timeframe, name in self.indicator_needs:
+            (daily_bars if timeframe == 'daily' else weekly_bars).append(self.indicator_engine.lookback(name))
+        return max(max(daily_bars), daily_bars_for_weekly(max(weekly_bars)))
+    
+    def init_fetch_pipeline(self):
+        """データ取得設定（一括取得のチャンク単位で並列取得）"""
+        fetch_config = self.config.get('data_fetch', {})
+        self.fetch_chunk_size = fetch_config.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        if self.memory_budget_mb:
+            # 取得中の未圧縮の日足が予算に収まるようチャンクを小さくする
+            self.fetch_chunk_size = chunk_size_for_budget(
+                self.memory_budget_mb, self.fetch_chunk_size, fetch_config.get('max_workers', 4)
+            )
+            logger.info(f"メモリ予算 {self.memory_budget_mb}MB: チャンク{self.fetch_chunk_size}銘柄, "
+                        f"日足は終値のみ直近{self.state_bars}本を保持")
+        self.fetch_timeout = fetch_config.get('timeout', 30)
+        requests_per_second = fetch_config.get('requests_per_second', 2.0)
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self.fetch_pipeline = FetchPipeline(
+            self._fetch_chunk,
+            max_workers=fetch_config.get('max_workers', 4),
+            max_retries=fetch_config.get('max_retries', 3),
+            base_delay=fetch_config.get('retry_base_delay', 1.0),
+            max_delay=fetch_config.get('retry_max_delay', 30.0),
+            task_timeout=fetch_config.get('task_timeout', 120),
+            request_timeout=self.fetch_timeout
+        )
+    
+    def init_bar_cache(self):
+        """ローカル価格キャッシュ（差分取得）"""
+        cache_config = self.config.get('cache', {})
+        self.bar_cache = None
+        if cache_config.get('enabled', True):
+            self.bar_cache = BarCache(
+                cache_config.get('dir', "C:\\rsi_alert\\cache"),
+                max_age_days=cache_config.get('max_age_days', 30),
+                overlap_days=cache_config.get('overlap_days', 7),
+                adjustment_tolerance=cache_config.get('adjustment_tolerance', 0.0005)
+            )
+    
+    def init_notifier(self):
+        """LINE通知（永続アウトボックス経由でバックグラウンド送信、複数件を1リクエストにまとめる）"""
+        line_config = self.config['notification']['line']
+        dispatch_config = self.config['notification'].get('dispatch', {})
+        self.notify_flush_timeout = dispatch_config.get('flush_timeout', 120)
+        self.sent_retention_days = dispatch_config.get('sent_retention_days', 30)
+        outbox_path = dispatch_config.get('outbox_path', "C:\\rsi_alert\\notification_outbox.sqlite")
+        endpoint = line_config.get('endpoint', LINE_BROADCAST_URL)
+        self.notifier = self.build_notifier(self.access_token, outbox_path, endpoint)
         
-        # 履歴ファイル初期化
-        self.init_history_file()
+        # 独自の通知先を持つ購読者は購読者ごとのアウトボックスから送信（無い場合は既定の通知先）
+        self.subscriber_notifiers = {}
+        root, ext = os.path.splitext(outbox_path)
+        for subscriber in self.subscriptions.subscribers.values():
+            if subscriber.access_token:
+                self.subscriber_notifiers[subscriber.subscriber_id] = self.build_notifier(
+                    subscriber.access_token, f"{root}.{subscriber.subscriber_id}{ext}", subscriber.endpoint or endpoint
+                )
+    
+    def build_notifier(self, access_token, outbox_path, endpoint):
+        """通知先1つ分の LineNotifier を作成（送信間隔・再送設定は共通）"""
+        dispatch_config = self.config['notification'].get('dispatch', {})
+        broadcasts_per_hour = dispatch_config.get('broadcasts_per_hour', 60)
+        return LineNotifier(
+            access_token,
+            Outbox(outbox_path),
+            endpoint=endpoint,
+            timeout=dispatch_config.get('timeout', 10),
+            rate_limiter=TokenBucket(broadcasts_per_hour / 3600, dispatch_config.get('burst', 10)) if broadcasts_per_hour else None,
+            max_attempts=dispatch_config.get('max_attempts', 5),
+            base_delay=dispatch_config.get('retry_base_delay', 5.0),
+            max_delay=dispatch_config.get('retry_max_delay', 600.0),
+            metrics=self.metrics
+        )
+    
+    def all_notifiers(self):
+        return [self.notifier] + list(self.subscriber_notifiers.values())
+    
+    def start_notifiers(self):
+        """全通知先のバックグラウンド送信を開始（前回実行の未送信分もここで再送）"""
+        for notifier in self.all_notifiers():
+            # 保持期間を過ぎた送信済みの通知を削除（アウトボックスの肥大化を防ぐ）
+            notifier.outbox.purge_sent(self.sent_retention_days)
+            notifier.start()
+    
+    def flush_notifiers(self):
+        """全通知先の送信待ちを送り切る（再送待ちの分は次回実行時に送信）"""
+        for notifier in self.all_notifiers():
+            notifier.flush(self.notify_flush_timeout)
+    
+    def stop_notifiers(self):
+        for notifier in self.all_notifiers():
+            notifier.stop()
+    
+    def init_backtest_cache(self):
+        """バックテスト結果（設定ハッシュ別にキャッシュ、python backtest.py で更新）"""
+        backtest_config = self.config.get('backtest', {})
+        self.backtest_years = backtest_config.get('years', DEFAULT_YEARS)
+        self.backtest_cache = BacktestCache(
+            backtest_config.get('cache_file', "C:\\rsi_alert\\backtest_cache.json")
+        )
+    
+    def init_calendar(self):
+        """取引所カレンダー（新しい日足が無い実行では取得を省略）"""
+        self.calendar = TradingCalendar.from_config(self.config.get('calendar', {}))
+    
+    def config_changed(self):
+        """設定ファイルが読み込み後に更新されたか"""
+        try:
+            return os.path.getmtime(self.config_path) != self.config_mtime
+        except OSError:
+            return False
+    
+    def reload_config(self):
+        """設定ファイルを再読み込みし、変更があったセクションのみ再初期化（キャッシュ・接続は維持）"""
+        mtime = os.path.getmtime(self.config_path)
+        config = self.load_config()
+        self.config_mtime = mtime
         
-        logger.info("Enhanced RSI Alert System initialized")
-        logger.info(f"Enhanced Mode: {self.enhanced_mode}")
+        changed = {key for key in set(config) | set(self.config) if config.get(key) != self.config.get(key)}
+        if not changed:
+            return changed
+        self.config = config
+        self.apply_settings()
+        
+        if 'metrics' in changed:
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            self.init_metrics()
+            for notifier in self.all_notifiers():
+                notifier.metrics = self.metrics
+        if 'data_fetch' in changed or 'memory' in changed:
+            self.init_fetch_pipeline()
+        if 'cache' in changed:
+            self.init_bar_cache()
+        if 'notification' in changed or 'subscribers' in changed:
+            self.flush_notifiers()
+            self.stop_notifiers()
+            for notifier in self.all_notifiers():
+                notifier.outbox.close()
+            self.init_notifier()
+            if self.resident:
+                self.start_notifiers()
+        if 'backtest' in changed:
+            self.init_backtest_cache()
+        if 'calendar' in changed:
+            self.init_calendar()
+        if 'history' in changed:
+            self.history_store.close()
+            self.init_history_file()
+        
+        logger.info(f"設定を再読み込みしました（変更: {', '.join(sorted(changed))}）")
+        return changed
     
     def init_history_file(self):
-        """Enhanced対応履歴ファイルを初期化"""
-        if not os.path.exists(self.history_file):
-            with open(self.history_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                # Enhanced版のヘッダー
-                writer.writerow([
-                    'date', 'symbol', 'price', 'daily_rsi', 'weekly_rsi', 
-                    'signal_type', 'strategy', 'reason', 'prev_daily_rsi'
-                ])
-            logger.info("Enhanced履歴ファイルを初期化しました")
+        """Enhanced対応履歴ストアを初期化（旧CSV履歴は初回のみ移行）"""
+        self.history_store = HistoryStore(self.history_db)
+        self.history_archive = HistoryArchive.from_config(self.config.get('history', {}))
+        migrated = self.history_store.migrate_from_csv(self.history_file)
+        if migrated:
+            logger.info(f"Enhanced履歴をCSVから移行しました ({migrated}行)")
     
+    @instrumented('calculate_rsi')
     def calculate_rsi(self, prices, period=14):
         """RSI計算"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
+        return calculate_rsi_series(prices, period, self.rsi_smoothing)
+    
+    def update_rsi_state(self, symbol, timeframe, prices):
+        """保存済みRSI状態を最新バーまで進めて最新RSIを取得（状態が無い・不整合なら再構築）"""
+        saved = self.history_store.get_rsi_state(symbol, timeframe)
+        state = StreamingRSI.from_dict(saved) if saved else None
+        rsi, state = advance_rsi_state(state, prices, self.rsi_period, self.rsi_smoothing)
+        self.history_store.put_rsi_state(symbol, timeframe, state.to_dict())
         return rsi
     
-    def get_stock_data(self, symbol):
-        """株価データ取得（日足・週足対応）"""
+    def _fetch_chunk(self, symbols, timeout=None):
+        """1チャンク分の日足データを取得（並列取得パイプラインのワーカーから呼ばれる、timeout は通信タイムアウト）"""
+        options = {
+            'chunk_size': len(symbols),
+            'rate_limiter': self.rate_limiter,
+            'timeout': self.fetch_timeout if timeout is None else timeout,
+            'threads': False,
+            'provider': self.data_provider
+        }
+        started = time.perf_counter()
         try:
-            ticker = yf.Ticker(symbol)
+            if self.bar_cache is not None:
+                frames = fetch_daily_bars_cached(symbols, self.bar_cache, period=DEFAULT_DAILY_PERIOD, **options)
+            else:
+                frames = fetch_daily_bars(symbols, period=DEFAULT_DAILY_PERIOD, **options)
+        except Exception:
+            self.metrics.inc('stage_failures_total', stage='fetch')
+            raise
+        self.record_fetch_metrics(symbols, frames, time.perf_counter() - started)
+        if self.state_bars:
+            # 取得直後に終値のみのバッファへ変換し、元の DataFrame は破棄する
+            frames = {symbol: compact_frame(frame, self.state_bars, self.compact_dtype)
+                      for symbol, frame in frames.items()}
+        return frames
+    
+    def record_fetch_metrics(self, symbols, frames, elapsed):
+        """日足取得の所要時間・取得できた銘柄数を記録（銘柄ごとの時間は一括取得したチャンクの時間）"""
+        metrics = self.metrics
+        if not metrics.enabled:
+            return
+        metrics.observe('fetch_chunk_seconds', elapsed)
+        fetched = sum(1 for symbol in symbols if symbol in frames)
+        metrics.inc('fetch_symbols_total', fetched, result='ok')
+        metrics.inc('fetch_symbols_total', len(symbols) - fetched, result='missing')
+        if metrics.per_symbol:
+            for symbol in frames:
+                metrics.observe('fetch_seconds', elapsed, symbol=symbol)
+    
+    def iter_daily_data(self, symbols=None):
+        """日足データを並列取得し、取得完了したチャンクから順に (chunk, {symbol: DataFrame}) を返す"""
+        symbols = self.symbols if symbols is None else symbols
+        return self.fetch_pipeline.iter_results(symbols, self.fetch_chunk_size)
+    
+    def prefetch_daily_data(self, symbols=None):
+        """監視銘柄の日足データを一括取得（{symbol: DataFrame}）"""
+        daily_data = {}
+        try:
+            for _, frames in self.iter_daily_data(symbols):
+                daily_data.update(frames)
+        except Exception as e:
+            logger.error(f"日足一括取得エラー: {e}")
+        return daily_data
+    
+    def rsi_matrix(self, closes, timeframe):
+        """価格行列の各銘柄の最新RSI（Series）と、指標と共有するRSI系列（DataFrame、共有しない時間足は None）"""
+        if timeframe not in self.indicator_rsi_timeframes:
+            return latest_rsi_matrix(closes, self.rsi_period, self.rsi_smoothing, self.rsi_dtype), None
+        rsi = calculate_rsi_matrix(closes, self.rsi_period, self.rsi_smoothing, self.rsi_dtype)
+        # 各銘柄の最後の有効な終値時点のRSI（latest_rsi_matrix() と同じ値）
+        valid = closes.notna().to_numpy()
+        last = len(valid) - 1 - np.argmax(valid[::-1], axis=0)
+        latest = rsi.to_numpy()[last, np.arange(valid.shape[1])] if len(valid) else np.full(valid.shape[1], np.nan)
+        return pd.Series(latest, index=closes.columns), rsi
+    
+    @instrumented('compute_universe_rsi')
+    def compute_universe_rsi(self, daily_data):
+        """全銘柄の日足・週足RSIを価格行列で一括計算（{symbol: (daily_rsi, weekly_rsi, rsi_series)}）
+        
+        rsi_series は指標フィルターがRSIを参照する時間足のRSI系列 {時間足: Series}。
+        指標エンジンに中間値として渡し、同じRSIを銘柄ごとに再計算しない。
+        """
+        if not daily_data:
+            return {}
+        try:
+            daily_closes = pd.DataFrame({symbol: frame['Close'] for symbol, frame in daily_data.items()})
+            weekly_frames = {symbol: resample_bars(frame, 'weekly') for symbol, frame in daily_data.items()}
+            weekly_closes = pd.DataFrame({
+                symbol: frame['Close'] for symbol, frame in weekly_frames.items() if not frame.empty
+            })
+            
+            daily_rsi, daily_series = self.rsi_matrix(daily_closes, 'daily')
+            weekly_rsi, weekly_series = (
+                self.rsi_matrix(weekly_closes, 'weekly')
+                if not weekly_closes.empty else (pd.Series(dtype=self.rsi_dtype), None)
+            )
             
-            # 日足データ取得（過去2ヶ月分、RSI計算に十分）
-            daily_hist = ticker.history(period="2mo")
+            # 週足が作れなかった銘柄は従来通り None
+            result = {}
+            for symbol in daily_data:
+                has_weekly = symbol in weekly_rsi.index
+                rsi_series = {}
+                if daily_series is not None:
+                    rsi_series['daily'] = daily_series[symbol]
+                if weekly_series is not None and has_weekly:
+                    rsi_series['weekly'] = weekly_series[symbol]
+                result[symbol] = (daily_rsi[symbol], weekly_rsi[symbol] if has_weekly else None, rsi_series)
+            return result
+        except Exception as e:
+            logger.error(f"RSI一括計算エラー: {e}")
+            return {}
+    
+    def calculate_symbol_rsi(self, symbol, daily_hist):
+        """1銘柄の日足・週足RSIを計算（日足RSI, 週足RSI, 指標と共有するRSI系列 {時間足: Series}）"""
+        rsi_series = {}
+        # 週足データは同じ日足スナップショットから生成（追加の通信なし）
+        weekly_hist = resample_bars(daily_hist, 'weekly')
+        if weekly_hist.empty:
+            logger.warning(f"{symbol}: 週足データ取得失敗")
+            weekly_rsi = None
+        elif self.incremental_rsi:
+            weekly_rsi = self.update_rsi_state(symbol, 'weekly', weekly_hist['Close'])
+        else:
+            weekly_rsi_values = self.calculate_rsi(weekly_hist['Close'], self.rsi_period)
+            weekly_rsi = weekly_rsi_values.iloc[-1] if not weekly_rsi_values.empty else None
+            rsi_series['weekly'] = weekly_rsi_values
+        
+        # 日足RSI計算
+        if self.incremental_rsi:
+            daily_rsi = self.update_rsi_state(symbol, 'daily', daily_hist['Close'])
+        else:
+            daily_rsi_values = self.calculate_rsi(daily_hist['Close'], self.rsi_period)
+            daily_rsi = daily_rsi_values.iloc[-1]
+            rsi_series['daily'] = daily_rsi_values
+        
+        return daily_rsi, weekly_rsi, rsi_series
+    
+    @instrumented('get_stock_data', failed=lambda result: result is None, symbol_arg=True)
+    def get_stock_data(self, symbol, daily_hist=None, rsi_values=None):
+        """株価データ取得（日足・週足対応）
+        
+        daily_hist に一括取得済みの日足データを渡した場合は日足の再取得を行わない。
+        rsi_values に一括計算済みの (日足RSI, 週足RSI, RSI系列) を渡した場合はRSIを再計算しない。
+        指標フィルター用の指標はRSI系列を中間値として共有して計算する。
+        """
+        try:
+            # 日足データ取得（過去6ヶ月分、週足RSIの算出にも使用）
+            if daily_hist is None:
+                if self.bar_cache is not None:
+                    daily_hist = self.prefetch_daily_data([symbol]).get(symbol)
+                if daily_hist is None:
+                    daily_hist = self.data_provider.history(symbol, period=DEFAULT_DAILY_PERIOD)
             if daily_hist.empty:
                 logger.error(f"{symbol}: 日足データ取得失敗")
                 return None
             
-            # 週足データ取得（過去6ヶ月分）
-            weekly_hist = ticker.history(period="6mo", interval="1wk")
-            if weekly_hist.empty:
-                logger.warning(f"{symbol}: 週足データ取得失敗")
-                weekly_rsi = None
-            else:
-                weekly_rsi_values = self.calculate_rsi(weekly_hist['Close'], self.rsi_period)
-                weekly_rsi = weekly_rsi_values.iloc[-1] if not weekly_rsi_values.empty else None
-            
-            # 日足RSI計算
             current_price = daily_hist['Close'].iloc[-1]
-            daily_rsi_values = self.calculate_rsi(daily_hist['Close'], self.rsi_period)
-            daily_rsi = daily_rsi_values.iloc[-1]
+            if rsi_values is not None:
+                daily_rsi, weekly_rsi, rsi_series = rsi_values
+            else:
+                daily_rsi, weekly_rsi, rsi_series = self.calculate_symbol_rsi(symbol, daily_hist)
             
             weekly_rsi_str = f"{weekly_rsi:.1f}" if weekly_rsi is not None else "N/A"
             logger.info(f"{symbol}: Price=${current_price:.2f}, Daily RSI={daily_rsi:.1f}, Weekly RSI={weekly_rsi_str}")
             
-            return {
-                'symbol': symbol,
-                'price': current_price,
-                'daily_rsi': daily_rsi,
-                'weekly_rsi': weekly_rsi,
-                'date': datetime.now().strftime('%Y-%m-%d')
-            }
+            return SymbolSnapshot(
+                symbol,
+                current_price,
+                daily_rsi,
+                weekly_rsi,
+                datetime.now().strftime('%Y-%m-%d'),
+                daily_hist.index[-1].strftime('%Y-%m-%d'),
+                self.indicator_engine.evaluate(daily_hist, self.indicator_needs, rsi_series)
+                if self.indicator_needs else None
+            )
             
         except Exception as e:
             logger.error(f"{symbol}のデータ取得エラー: {e}")
             return None
     
-    def get_previous_data(self, symbol):
-        """前回のRSIデータを取得（日足・週足対応）"""
+    def store_snapshot(self, data):
+        """取得・計算済みの銘柄データを実行単位のスナップショットに保存"""
+        self.snapshot_cache[(data['symbol'], data['date'])] = data
+    
+    def get_snapshot(self, symbol, as_of):
+        """スナップショットから銘柄データを取得（無い場合は None）"""
+        return self.snapshot_cache.get((symbol, as_of))
+    
+    def get_previous_data(self, symbol, before=None):
+        """前回のRSIデータを取得（日足・週足対応、before 指定時はそれより前のバー）"""
         try:
-            if not os.path.exists(self.history_file):
-                return None
-            
-            with open(self.history_file, 'r') as f:
-                reader = csv.DictReader(f)
-                rows = list(reader)
-                
-                # 指定銘柄の最新データを探す
-                for row in reversed(rows):
-                    if row['symbol'] == symbol:
-                        return {
-                            'daily_rsi': float(row['daily_rsi']),
-                            'weekly_rsi': float(row['weekly_rsi']) if row['weekly_rsi'] != 'None' else None
-                        }
-                        
+            latest = self.history_store.get_latest(symbol, before)
+            if latest is None:
                 return None
+            return {
+                'daily_rsi': latest['daily_rsi'],
+                'weekly_rsi': latest['weekly_rsi']
+            }
         except Exception as e:
             logger.error(f"前回データ取得エラー: {e}")
             return None
     
+    @instrumented('check_enhanced_signal')
     def check_enhanced_signal(self, current_data):
         """Enhanced RSIシグナル判定（銘柄別戦略対応）"""
         symbol = current_data['symbol']
@@ -135,7 +512,11 @@ class EnhancedRSIAlertSystem:
         
         current_daily_rsi = current_data['daily_rsi']
         current_weekly_rsi = current_data['weekly_rsi']
-        prev_data = self.get_previous_data(symbol)
+        if 'prev_daily_rsi' in current_data:
+            # ストリーミング評価では前日確定バーのRSIを直接渡す
+            prev_data = {'daily_rsi': current_data['prev_daily_rsi']}
+        else:
+            prev_data = self.get_previous_data(symbol, current_data.get('bar_date'))
         
         if prev_data is None:
             logger.info(f"{symbol}: 初回実行、シグナル判定スキップ")
@@ -184,52 +565,118 @@ class EnhancedRSIAlertSystem:
                 logger.info(f"{symbol}: Standard売りシグナル発生 (Daily: {current_daily_rsi:.1f})")
         
         if signal:
-            return {
-                'symbol': symbol,
-                'signal_type': signal,
-                'current_daily_rsi': current_daily_rsi,
-                'current_weekly_rsi': current_weekly_rsi,
-                'prev_daily_rsi': prev_daily_rsi,
-                'price': current_data['price'],
-                'strategy': strategy_name,
-                'reason': reason,
-                'use_weekly_filter': use_weekly_filter
-            }
+            filters = compile_filters(settings)
+            if filters:
+                passed, detail = check_indicator_filters(filters, current_data, signal)
+                if not passed:
+                    logger.info(f"{symbol}: {'買い' if signal == 'BUY' else '売り'}シグナル候補だが{detail}")
+                    return None
+                if detail:
+                    reason = f"{reason}, {detail}"
+            
+            return SignalRecord(
+                symbol=symbol,
+                signal_type=signal,
+                current_daily_rsi=current_daily_rsi,
+                current_weekly_rsi=current_weekly_rsi,
+                prev_daily_rsi=prev_daily_rsi,
+                price=current_data['price'],
+                strategy=strategy_name,
+                reason=reason,
+                use_weekly_filter=use_weekly_filter
+            )
         
         return None
     
+    def get_previous_daily_rsi(self, rows):
+        """複数銘柄の前回日足RSIをまとめて取得（{symbol: RSI}、履歴の無い銘柄は含まない）"""
+        prev_daily = {}
+        by_bar_date = {}
+        for row in rows:
+            if 'prev_daily_rsi' in row:
+                prev_daily[row['symbol']] = row['prev_daily_rsi']
+            else:
+                by_bar_date.setdefault(row.get('bar_date'), []).append(row['symbol'])
+        for bar_date, symbols in by_bar_date.items():
+            try:
+                if bar_date is None:
+                    latest = {symbol: self.history_store.get_latest(symbol) for symbol in symbols}
+                else:
+                    latest = self.history_store.get_latest_many(symbols, bar_date)
+            except Exception as e:
+                logger.error(f"前回データ取得エラー: {e}")
+                continue
+            prev_daily.update((symbol, data['daily_rsi']) for symbol, data in latest.items() if data is not None)
+        return prev_daily
+    
+    @instrumented('check_enhanced_signals')
+    def check_enhanced_signals(self, rows, prev_daily=None):
+        """複数銘柄のシグナルをまとめて判定（check_enhanced_signal() と同じ結果を rows と同じ順で返す）"""
+        if prev_daily is None:
+            prev_daily = self.get_previous_daily_rsi(rows)
+        return self.signal_rules.evaluate(rows, prev_daily)
+    
+    def notify_subscribers(self, rows, prev_daily):
+        """共有の銘柄データに購読者別のルールを適用し、購読者の通知先へ送る（送信数を返す）"""
+        sent = 0
+        for subscriber, current_data, signal in self.subscriptions.evaluate(rows, prev_daily):
+            subscriber_id = subscriber.subscriber_id
+            symbol = current_data['symbol']
+            bar_date = current_data['bar_date']
+            if self.history_store.get_subscriber_signal(subscriber_id, symbol, bar_date) == signal['signal_type']:
+                logger.info(f"[{subscriber_id}] {symbol}: {bar_date}の{signal['signal_type']}シグナルは通知済み")
+                continue
+            message = self.create_enhanced_alert_message(signal, subscriber.symbol_settings.get(symbol, {}))
+            if self.queue_subscriber_message(subscriber_id, message):
+                self.history_store.put_subscriber_signal(subscriber_id, symbol, bar_date, signal['signal_type'])
+                self.metrics.inc('alerts_total', signal_type=signal['signal_type'])
+                sent += 1
+        return sent
+    
+    def get_backtest_stats(self, symbol, settings=None):
+        """現在の設定に対するバックテスト結果を取得（未算出・設定変更後は None）"""
+        if settings is None:
+            settings = self.symbol_settings.get(symbol, {})
+        key = settings_hash(settings, self.rsi_period, self.rsi_smoothing, self.backtest_years,
+                            self.config.get('indicators'))
+        return self.backtest_cache.get(symbol, key)
+    
+    @instrumented('send_line_message', failed=lambda ok: not ok)
     def send_line_message(self, message):
-        """LINE メッセージ送信"""
-        url = "https://api.line.me/v2/bot/message/broadcast"
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "messages": [
-                {
-                    "type": "text",
-                    "text": message
-                }
-            ]
-        }
-        
+        """LINE メッセージ送信（同期、エラー通知用）"""
         try:
-            response = requests.post(url, headers=headers, json=data)
-            if response.status_code == 200:
-                logger.info("LINE通知送信成功")
-                return True
-            else:
-                logger.error(f"LINE通知送信失敗: {response.status_code} - {response.text}")
-                return False
+            return self.notifier.send_now(message)
         except Exception as e:
             logger.error(f"LINE通知送信エラー: {e}")
             return False
     
-    def create_enhanced_alert_message(self, signal_data):
-        """Enhanced アラートメッセージ作成"""
+    @instrumented('queue_line_message', failed=lambda ok: not ok)
+    def queue_line_message(self, message):
+        """LINE メッセージを送信キューに追加（送信はバックグラウンドで行う）"""
+        try:
+            self.notifier.enqueue(message)
+            return True
+        except Exception as e:
+            logger.error(f"LINE通知キュー追加エラー: {e}")
+            return False
+    
+    def queue_subscriber_message(self, subscriber_id, message):
+        """購読者の通知先の送信キューに追加（独自の通知先が無い購読者は既定の通知先）"""
+        notifier = self.subscriber_notifiers.get(subscriber_id)
+        if notifier is None:
+            return self.queue_line_message(message)
+        try:
+            notifier.enqueue(message)
+            return True
+        except Exception as e:
+            logger.error(f"[{subscriber_id}] LINE通知キュー追加エラー: {e}")
+            return False
+    
+    def create_enhanced_alert_message(self, signal_data, settings=None):
+        """Enhanced アラートメッセージ作成（settings: 購読者別の銘柄設定、省略時は既定の設定）"""
         symbol = signal_data['symbol']
+        if settings is None:
+            settings = self.symbol_settings.get(symbol, {})
         signal_type = signal_data['signal_type']
         current_daily_rsi = signal_data['current_daily_rsi']
         current_weekly_rsi = signal_data['current_weekly_rsi']
@@ -257,7 +704,6 @@ class EnhancedRSIAlertSystem:
         if current_weekly_rsi is not None:
             weekly_info = f"📊 週足RSI: {current_weekly_rsi:.1f}"
             if use_weekly_filter:
-                settings = self.symbol_settings.get(symbol, {})
                 if signal_type == 'BUY':
                     threshold = settings.get('weekly_buy_threshold', 50)
                     weekly_info += f" ({threshold}以下: ✅)"
@@ -266,16 +712,10 @@ class EnhancedRSIAlertSystem:
                     weekly_info += f" ({threshold}以上: ✅)"
             weekly_info += "\n"
         
-        # 期待パフォーマンス情報
-        if symbol == 'TECL' and use_weekly_filter:
-            performance_info = "過去勝率: 100%\n期待年率: 49.4%"
-        elif symbol == 'SOXL':
-            performance_info = "過去勝率: 81.8%\n期待年率: 34.3%"
-        else:
-            performance_info = "過去勝率: 78.6%\n期待年率: 46.1%"
+        # 期待パフォーマンス情報（現在の設定でのバックテスト結果）
+        performance_info = format_performance_info(self.get_backtest_stats(symbol, settings))
         
         # 設定値取得
-        settings = self.symbol_settings.get(symbol, {})
         daily_threshold = settings.get(f'daily_{signal_type.lower()}_threshold', 
                                      33 if signal_type == 'BUY' else 67)
         
@@ -301,16 +741,40 @@ class EnhancedRSIAlertSystem:
         if today.weekday() != 4:  # 金曜日=4
             return None
         
-        # 今週の全データを取得
-        report_data = []
-        for symbol in self.symbols:
-            data = self.get_stock_data(symbol)
-            if data:
-                report_data.append(data)
-        
+        report_data, weekly_summary = self.collect_weekly_report_data(today)
         if not report_data:
             return None
+        return self.format_weekly_report(today, report_data, weekly_summary)
+    
+    def collect_weekly_report_data(self, today):
+        """週次レポート用の銘柄データと今週の履歴集計を取得（銘柄データのリスト, {symbol: 集計}）"""
+        # 今週の全データを取得（run()のスナップショットを優先し、無い銘柄のみ取得）
+        as_of = today.strftime('%Y-%m-%d')
+        missing = [symbol for symbol in self.symbols if self.get_snapshot(symbol, as_of) is None]
+        if missing:
+            daily_data = self.prefetch_daily_data(missing)
+            rsi_values = {} if self.incremental_rsi else self.compute_universe_rsi(daily_data)
+            for symbol in missing:
+                data = self.get_stock_data(symbol, daily_data.get(symbol), rsi_values.get(symbol))
+                if data:
+                    self.store_snapshot(data)
         
+        report_data = [self.get_snapshot(symbol, as_of) for symbol in self.symbols]
+        report_data = [data for data in report_data if data]
+        if not report_data:
+            return [], {}
+        
+        # 今週（月曜日以降）の履歴集計
+        week_start = (today - timedelta(days=today.weekday())).strftime('%Y-%m-%d')
+        try:
+            weekly_summary = self.history_store.summarize_period(week_start, as_of)
+        except Exception as e:
+            logger.error(f"週次集計エラー: {e}")
+            weekly_summary = {}
+        return report_data, weekly_summary
+    
+    def format_weekly_report(self, today, report_data, weekly_summary):
+        """週次レポートのメッセージを作成"""
         message = f"""📊 Enhanced週次RSIレポート
 
 システム稼働: ✅正常 (Enhanced Mode)
@@ -343,90 +807,225 @@ class EnhancedRSIAlertSystem:
             strategy_display = " (Enhanced)" if use_weekly_filter else ""
             
             message += f"\n• {symbol}{strategy_display}: 日足 {daily_rsi:.1f} ({status}){weekly_display} ${price:.2f}"
+            
+            summary = weekly_summary.get(symbol)
+            if summary and summary['min_daily_rsi'] is not None:
+                signal_count = summary['buy_signals'] + summary['sell_signals']
+                message += (
+                    f"\n  今週: 日足RSI {summary['min_daily_rsi']:.1f}〜{summary['max_daily_rsi']:.1f}"
+                    f", シグナル {signal_count}件"
+                )
         
         message += f"\n\n📈 期待パフォーマンス:"
-        message += f"\n• TECL Enhanced: 年率49.4%, 勝率100%"
-        message += f"\n• SOXL Standard: 年率34.3%, 勝率81.8%"
+        for data in report_data:
+            symbol = data['symbol']
+            stats = self.get_backtest_stats(symbol)
+            mode = "Enhanced" if self.symbol_settings.get(symbol, {}).get('use_weekly_filter', False) else "Standard"
+            if stats is None or stats.get('win_rate') is None:
+                message += f"\n• {symbol} {mode}: 未算出"
+            else:
+                message += f"\n• {symbol} {mode}: 年率{stats['cagr']:.1f}%, 勝率{stats['win_rate']:.1f}%"
         message += f"\n\n次回レポート: 来週金曜日"
         return message
     
+    @instrumented('save_enhanced_history', failed=lambda ok: not ok)
     def save_enhanced_history(self, data, signal_data=None):
-        """Enhanced履歴保存"""
+        """Enhanced履歴保存（保存できたかを返す）"""
         try:
-            with open(self.history_file, 'a', newline='') as f:
-                writer = csv.writer(f)
-                
-                # 前回データ取得
-                prev_data = self.get_previous_data(data['symbol'])
-                prev_daily_rsi = prev_data['daily_rsi'] if prev_data else None
-                
-                # Enhanced履歴形式で保存
-                writer.writerow([
-                    data['date'],                                    # date
-                    data['symbol'],                                  # symbol
-                    f"{data['price']:.2f}",                         # price
-                    f"{data['daily_rsi']:.1f}",                     # daily_rsi
-                    f"{data['weekly_rsi']:.1f}" if data['weekly_rsi'] else 'None', # weekly_rsi
-                    signal_data['signal_type'] if signal_data else 'NONE',         # signal_type
-                    signal_data['strategy'] if signal_data else 'N/A',             # strategy
-                    signal_data['reason'] if signal_data else 'No signal',         # reason
-                    f"{prev_daily_rsi:.1f}" if prev_daily_rsi else 'N/A'          # prev_daily_rsi
-                ])
+            # 前回データ取得
+            prev_data = self.get_previous_data(data['symbol'], data.get('bar_date'))
+            prev_daily_rsi = prev_data['daily_rsi'] if prev_data else None
+            
+            # Enhanced履歴形式で保存（CSV版と同じ丸め桁数、日付はバーの日付で同一バーは上書き）
+            self.history_store.append({
+                'date': data.get('bar_date', data['date']),
+                'symbol': data['symbol'],
+                'price': round(data['price'], 2),
+                'daily_rsi': round(data['daily_rsi'], 1),
+                'weekly_rsi': round(data['weekly_rsi'], 1) if data['weekly_rsi'] else None,
+                'signal_type': signal_data['signal_type'] if signal_data else 'NONE',
+                'strategy': signal_data['strategy'] if signal_data else 'N/A',
+                'reason': signal_data['reason'] if signal_data else 'No signal',
+                'prev_daily_rsi': round(prev_daily_rsi, 1) if prev_daily_rsi else None
+            })
+            return True
                 
         except Exception as e:
             logger.error(f"Enhanced履歴保存エラー: {e}")
+            return False
+    
+    def compact_history(self):
+        """保持期間を過ぎた履歴をアーカイブへ移す（1日1回）"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        if not self.history_retention_days or self.history_store.get_meta('history_compacted_date') == today:
+            return 0
+        try:
+            moved = compact_history(self.history_store, self.history_archive, self.history_retention_days)
+        except Exception as e:
+            logger.error(f"履歴アーカイブエラー: {e}")
+            return 0
+        self.history_store.set_meta('history_compacted_date', today)
+        return moved
     
-    def run(self):
-        """Enhanced メイン実行"""
+    def has_new_bar(self):
+        """前回評価した日足以降に新しい日足が存在し得るか（休場日・同一バーの再実行は False）"""
+        last_bar_date = self.history_store.get_meta('last_bar_date')
+        last_bar_final = self.history_store.get_meta('last_bar_final') == '1'
+        return self.calendar.has_new_bar(last_bar_date, last_bar_final)
+    
+    def record_evaluated_bar(self, bar_dates):
+        """評価した最新の日足と、それが確定済みだったかを記録"""
+        if not bar_dates:
+            return
+        bar_date = max(bar_dates)
+        latest_date, final = self.calendar.latest_bar()
+        # データ提供側の遅延で最新バーが未反映の場合は次回実行で再取得される
+        final = final or bar_date < latest_date.isoformat()
+        self.history_store.set_meta('last_bar_date', bar_date)
+        self.history_store.set_meta('last_bar_final', '1' if final else '0')
+        # 次回起動時の事前判定用（startup.py はこの時刻より前ならライブラリを読み込まずに終了）
+        next_bar_at = self.calendar.next_bar_time(bar_date, final)
+        self.history_store.set_meta('next_bar_at', next_bar_at.isoformat() if next_bar_at else '')
+    
+    def export_metrics(self, result):
+        """実行結果をメトリクスに反映し、textfile・実行サマリーを書き出す"""
+        metrics = self.metrics
+        if not metrics.enabled:
+            return
+        # メトリクスの失敗でアラート実行を止めない
+        try:
+            metrics.inc('runs_total', result=result)
+            metrics.set_gauge('run_seconds', round(time.time() - metrics.run_started, 6))
+            metrics.set_gauge('last_run_timestamp_seconds', int(time.time()))
+            metrics.set_gauge('outbox_pending', sum(notifier.outbox.pending_count() for notifier in self.all_notifiers()))
+            metrics.set_gauge('history_db_bytes', os.path.getsize(self.history_db))
+            if self.metrics_textfile:
+                metrics.write_textfile(self.metrics_textfile)
+            if self.metrics_summary_file:
+                metrics.write_summary(self.metrics_summary_file)
+        except Exception as e:
+            logger.error(f"メトリクス書き出しエラー: {e}")
+    
+    def run(self, force=False):
+        """Enhanced メイン実行（force=True で取引所カレンダーによる省略を無効化）"""
         logger.info("=== Enhanced RSIアラートシステム実行開始 ===")
+        self.metrics.begin_run()
+        
+        if not force and not self.has_new_bar():
+            logger.info(
+                f"新しい日足がありません（評価済み: {self.history_store.get_meta('last_bar_date')}）、"
+                "データ取得をスキップします"
+            )
+            # 新しい日足が無くても、前回実行の未送信・再送待ちの通知は送る
+            if any(notifier.outbox.pending_count() for notifier in self.all_notifiers()):
+                self.start_notifiers()
+                self.flush_notifiers()
+                if not self.resident:
+                    self.stop_notifiers()
+            self.export_metrics('skipped')
+            return
         
         signals_sent = 0
+        bar_dates = []
+        self.snapshot_cache = {}
         
-        # 各銘柄をチェック
-        for symbol in self.symbols:
-            logger.info(f"{symbol} Enhanced処理開始")
-            
-            # データ取得
-            current_data = self.get_stock_data(symbol)
-            if not current_data:
-                continue
-            
-            # Enhanced シグナル判定
-            signal = self.check_enhanced_signal(current_data)
-            
-            if signal:
-                # Enhanced アラート送信
-                message = self.create_enhanced_alert_message(signal)
-                if self.send_line_message(message):
-                    signals_sent += 1
+        # 通知はバックグラウンドで送信（前回実行の未送信分もここで再送）
+        self.start_notifiers()
+        
+        # 各銘柄をチェック（履歴は実行単位で1トランザクションにまとめて保存）
+        with self.history_store.batch():
+            # 取得が完了したチャンクから順にRSI計算・シグナル判定・通知（残りのチャンクは並行して取得）
+            for chunk, daily_data in self.iter_daily_data(self.universe):
+                # チャンク内の全銘柄のRSIを価格行列で一括計算（ストリーミングRSI使用時は銘柄ごとに状態を更新）
+                rsi_values = {} if self.incremental_rsi else self.compute_universe_rsi(daily_data)
                 
-                # Enhanced履歴保存
-                self.save_enhanced_history(current_data, signal)
-            else:
-                # 通常時も履歴保存
-                self.save_enhanced_history(current_data)
+                chunk_data = []
+                for symbol in chunk:
+                    logger.info(f"{symbol} Enhanced処理開始")
+                    
+                    # データ取得
+                    if symbol not in daily_data:
+                        logger.error(f"{symbol}: 日足データ取得失敗")
+                        continue
+                    # RSI・指標を計算したら日足は不要（チャンクの処理中も保持しない）
+                    current_data = self.get_stock_data(symbol, daily_data.pop(symbol), rsi_values.get(symbol))
+                    if not current_data:
+                        continue
+                    self.store_snapshot(current_data)
+                    bar_dates.append(current_data['bar_date'])
+                    self.metrics.inc('symbols_evaluated_total')
+                    chunk_data.append(current_data)
+                
+                # Enhanced シグナル判定（チャンク内の全銘柄をまとめて評価、購読者のみが監視する銘柄は履歴のみ）
+                prev_daily = self.get_previous_daily_rsi(chunk_data)
+                owned = [current_data for current_data in chunk_data if current_data['symbol'] in self.symbol_set]
+                signals = dict(zip(
+                    (current_data['symbol'] for current_data in owned), self.check_enhanced_signals(owned, prev_daily)
+                ))
+                
+                for current_data in chunk_data:
+                    symbol = current_data['symbol']
+                    signal = signals.get(symbol)
+                    if signal:
+                        # Enhanced アラート送信（同一バーで送信済みのシグナルは再送しない）
+                        sent_signal = self.history_store.get_signal(symbol, current_data['bar_date'])
+                        if sent_signal == signal['signal_type']:
+                            logger.info(f"{symbol}: {current_data['bar_date']}の{sent_signal}シグナルは通知済み")
+                        elif self.queue_line_message(self.create_enhanced_alert_message(signal)):
+                            signals_sent += 1
+                            self.metrics.inc('alerts_total', signal_type=signal['signal_type'])
+                        
+                        # Enhanced履歴保存
+                        self.save_enhanced_history(current_data, signal)
+                    else:
+                        # 通常時も履歴保存
+                        self.save_enhanced_history(current_data)
+                
+                # 購読者別のルールは同じRSI・前回RSIで判定
+                if self.subscriptions:
+                    signals_sent += self.notify_subscribers(chunk_data, prev_daily)
+        
+        self.record_evaluated_bar(bar_dates)
         
         # Enhanced週次レポートチェック
-        weekly_message = self.create_enhanced_weekly_report()
-        if weekly_message:
-            self.send_line_message(weekly_message)
-            logger.info("Enhanced週次レポート送信")
+        # （常駐モードで1日に複数回実行しても送信は1日1回）
+        report_date = datetime.now().strftime('%Y-%m-%d')
+        if self.history_store.get_meta('weekly_report_date') != report_date:
+            weekly_message = self.create_enhanced_weekly_report()
+            if weekly_message:
+                self.queue_line_message(weekly_message)
+                self.history_store.set_meta('weekly_report_date', report_date)
+                logger.info("Enhanced週次レポート送信")
+        
+        # 送信待ちの通知を送り切ってから終了（再送待ちの分は次回実行時に送信）
+        self.flush_notifiers()
+        if not self.resident:
+            self.stop_notifiers()
         
+        self.compact_history()
+        # 監視対象から外れた銘柄など、更新されなくなった価格キャッシュを削除
+        if self.bar_cache is not None:
+            try:
+                self.bar_cache.evict_expired()
+            except OSError as e:
+                logger.error(f"価格キャッシュ削除エラー: {e}")
+        self.export_metrics('completed')
         logger.info(f"=== Enhanced処理完了: {signals_sent}件のアラート送信 ===")
 
 # 後方互換性のため旧クラス名も維持
 RSIAlertSystem = EnhancedRSIAlertSystem
 
 if __name__ == "__main__":
+    args = parse_args()
     try:
-        system = EnhancedRSIAlertSystem()
-        system.run()
+        system = EnhancedRSIAlertSystem(args.config)
+        system.run(force=args.force)
     except Exception as e:
         logger.error(f"Enhanced システムエラー: {e}")
         # エラー通知も送信
         error_message = f"⚠️ Enhanced RSIアラートシステムエラー\n\n{str(e)}\n\n管理者に連絡してください。"
         try:
-            system = EnhancedRSIAlertSystem()
+            system = EnhancedRSIAlertSystem(args.config)
             system.send_line_message(error_message)
         except:
             pass
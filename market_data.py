@@ -0,0 +1,198 @@
+"""
+Enhanced RSI Alert System - 市場データ取得
+複数銘柄の日足データを一括ダウンロードし、銘柄別のDataFrameに分解する
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# yf.download() は取得結果・エラーをモジュール共通の辞書に集めるため、
+# 複数スレッドから同時に呼ぶと他の呼び出しの結果が混ざる（呼び出しを直列化する）
+_YF_DOWNLOAD_LOCK = threading.Lock()
+
+# 1回の一括リクエストに含める最大銘柄数
+DEFAULT_CHUNK_SIZE = 100
+
+# 日足・週足RSIの両方を1本の日足系列から計算するための取得期間
+DEFAULT_DAILY_PERIOD = "6mo"
+
+# Yahooの週足は月曜日始まり・月曜日ラベル、月足は月初ラベル
+RESAMPLE_RULES = {
+    'weekly': 'W-MON',
+    'monthly': 'MS',
+}
+
+OHLCV_AGGREGATION = {
+    'Open': 'first',
+    'High': 'max',
+    'Low': 'min',
+    'Close': 'last',
+    'Volume': 'sum',
+}
+
+
+def chunk_symbols(symbols, chunk_size=DEFAULT_CHUNK_SIZE):
+    """銘柄リストを一括リクエスト単位に分割"""
+    chunk_size = max(1, int(chunk_size))
+    for i in range(0, len(symbols), chunk_size):
+        yield symbols[i:i + chunk_size]
+
+
+def split_download_frame(data, symbols):
+    """yf.download の結果を銘柄別のDataFrameに分解（取得失敗銘柄は含めない）"""
+    frames = {}
+    if data is None or data.empty:
+        return frames
+
+    multi_level = getattr(data.columns, 'nlevels', 1) > 1
+    for symbol in symbols:
+        try:
+            if multi_level:
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            elif len(symbols) == 1:
+                frame = data
+            else:
+                continue
+
+            # 他銘柄の営業日に合わせて作られた空行を除去
+            frame = frame.dropna(how='all')
+            if frame.empty or 'Close' not in frame.columns or frame['Close'].dropna().empty:
+                continue
+            frames[symbol] = frame.copy()
+        except Exception as e:
+            logger.warning(f"{symbol}: 一括データ分解エラー: {e}")
+    return frames
+
+
+def resample_bars(daily, timeframe='weekly'):
+    """日足データから週足・月足のOHLCVを生成
+
+    週足はYahooの interval="1wk" と同じく、月曜日始まりの週を月曜日の日付で
+    ラベル付けする。進行中の週（月）は最新の日足までで集計される。
+    """
+    rule = RESAMPLE_RULES[timeframe]
+    aggregation = {col: how for col, how in OHLCV_AGGREGATION.items() if col in daily.columns}
+
+    if timeframe == 'weekly':
+        bars = daily.resample(rule, label='left', closed='left').agg(aggregation)
+    else:
+        bars = daily.resample(rule).agg(aggregation)
+
+    # 祝日のみの週など、取引日が無い期間を除去
+    return bars.dropna(subset=['Close'])
+
+
+class YahooDataProvider:
+    """Yahoo Finance からの価格取得（既定のデータプロバイダー）
+
+    download() / history() を同じ引数で実装したオブジェクトに差し替えると、
+    ネットワークを使わずに合成データ等でシステム全体を動かせる（benchmark.py）。
+    """
+
+    def download(self, symbols, period=None, start=None, interval="1d", threads=True, timeout=10):
+        """複数銘柄を一括取得し {symbol: DataFrame} を返す（取得失敗銘柄は含めない）
+
+        並列取得パイプラインの複数ワーカーから呼ばれても、yf.download() は1つずつ実行する。
+        timeout は各HTTPリクエストの通信タイムアウト（秒）。
+        """
+        # yfinance は読み込みに時間がかかるため、実際に取得する時点で読み込む
+        import yfinance as yf
+        with _YF_DOWNLOAD_LOCK:
+            data = yf.download(
+                tickers=symbols,
+                period=None if start else period,
+                start=start,
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=True,
+                threads=threads,
+                progress=False,
+                timeout=timeout,
+            )
+        return split_download_frame(data, symbols)
+
+    def history(self, symbol, period=DEFAULT_DAILY_PERIOD):
+        """1銘柄の日足を取得"""
+        import yfinance as yf
+        return yf.Ticker(symbol).history(period=period)
+
+
+def fetch_daily_bars(symbols, period=DEFAULT_DAILY_PERIOD, chunk_size=DEFAULT_CHUNK_SIZE, start=None,
+                     rate_limiter=None, timeout=10, threads=True, provider=None):
+    """複数銘柄の日足データを一括取得
+
+    戻り値は {symbol: DataFrame} で、各DataFrameは ticker.history() と同じ
+    列構成（Open/High/Low/Close/Volume）。取得できなかった銘柄は含まれない。
+    rate_limiter（TokenBucket）を渡すと一括リクエストごとにトークンを消費する。
+    provider を省略した場合は Yahoo Finance から取得する。
+    """
+    symbols = list(dict.fromkeys(symbols))
+    provider = provider or YahooDataProvider()
+    results = {}
+
+    for chunk in chunk_symbols(symbols, chunk_size):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            frames = provider.download(chunk, period=period, start=start, threads=threads, timeout=timeout)
+        except Exception as e:
+            logger.error(f"一括データ取得エラー ({len(chunk)}銘柄): {e}")
+            continue
+
+        results.update(frames)
+
+        missing = [s for s in chunk if s not in frames]
+        if missing:
+            logger.warning(f"一括取得で取得できなかった銘柄: {', '.join(missing)}")
+
+    logger.info(f"日足一括取得完了: {len(results)}/{len(symbols)}銘柄")
+    return results
+
+
+def fetch_daily_bars_cached(symbols, cache, period=DEFAULT_DAILY_PERIOD, chunk_size=DEFAULT_CHUNK_SIZE,
+                            **fetch_options):
+    """ローカルキャッシュを利用した日足一括取得
+
+    キャッシュ済み銘柄は最終バー以降の差分のみを取得し、キャッシュが無い銘柄、
+    period 分の履歴を持たない銘柄、価格調整を検出した銘柄は period 分を全取得して
+    キャッシュを作り直す。バックテスト等で長期間を取得済みのキャッシュからも、
+    返すのは period 分のみ（日次判定のRSIが長期間の履歴で変わらないようにする）。
+    """
+    from bar_cache import trim_to_period
+
+    symbols = list(dict.fromkeys(symbols))
+    results = {}
+    full_fetch = []
+
+    # 差分取得の開始日ごとにまとめて一括取得
+    groups = {}
+    cached_frames = {}
+    for symbol in symbols:
+        cached = cache.load(symbol)
+        if cached is None or not cache.covers(symbol, cached, period):
+            full_fetch.append(symbol)
+            continue
+        cached_frames[symbol] = cached
+        groups.setdefault(cache.fetch_start(cached), []).append(symbol)
+
+    for start, group in groups.items():
+        fresh_frames = fetch_daily_bars(group, chunk_size=chunk_size, start=start, **fetch_options)
+        for symbol in group:
+            merged = cache.merge(symbol, cached_frames[symbol], fresh_frames.get(symbol))
+            if merged is None:
+                full_fetch.append(symbol)
+            else:
+                results[symbol] = trim_to_period(merged, period)
+
+    if full_fetch:
+        fresh_frames = fetch_daily_bars(full_fetch, period=period, chunk_size=chunk_size, **fetch_options)
+        for symbol, frame in fresh_frames.items():
+            cache.store(symbol, frame, replace=True, period=period)
+            results[symbol] = frame
+
+    logger.info(f"キャッシュ利用取得: 差分{len(symbols) - len(full_fetch)}銘柄, 全取得{len(full_fetch)}銘柄")
+    return results
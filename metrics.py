@@ -0,0 +1,274 @@
+"""
+Enhanced RSI Alert System - 計測（メトリクス・トレース）
+処理段階ごとのタイマー・カウンター・ヒストグラムを集計し、Prometheus テキスト形式
+（node_exporter の textfile collector 用ファイル、またはローカルHTTPエンドポイント）と
+実行ごとのJSONサマリーとして出力する。無効時は計測処理を一切行わない。
+"""
+
+import bisect
+import functools
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'rsi_alert_'
+
+# 秒単位のヒストグラム境界
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    'stage_seconds': "処理段階ごとの所要時間",
+    'stage_failures_total': "処理段階ごとの失敗回数",
+    'fetch_chunk_seconds': "日足一括取得（1チャンク）の所要時間",
+    'fetch_seconds': "銘柄ごとの日足取得時間（一括取得したチャンクの所要時間）",
+    'fetch_symbols_total': "日足取得の銘柄数（result=ok/missing）",
+    'line_request_seconds': "LINE API 呼び出しの所要時間",
+    'line_requests_total': "LINE API 呼び出し回数（status=HTTPステータス/error）",
+    'line_messages_total': "LINE通知件数（result=sent/retry/failed）",
+    'alerts_total': "送信キューに追加したアラート件数",
+    'symbols_evaluated_total': "シグナル判定した銘柄数",
+    'runs_total': "実行回数（result=completed/skipped）",
+    'run_seconds': "直近の実行の所要時間",
+    'last_run_timestamp_seconds': "直近の実行終了時刻（UNIX時間）",
+    'history_db_bytes': "履歴データベースのファイルサイズ",
+    'outbox_pending': "未送信のLINE通知件数",
+}
+
+
+def label_key(labels):
+    """ラベルのキー（値は文字列に揃え、int・str が混在しても並べ替えられるようにする）"""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def format_labels(key):
+    if not key:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in key
+    )
+    return '{' + pairs + '}'
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class Metrics:
+    def __init__(self, enabled=False, per_symbol=True, buckets=DEFAULT_BUCKETS):
+        """メトリクス集計
+
+        per_symbol: 銘柄ラベル付きの系列も記録するか（銘柄数が多い場合は無効化を推奨）
+        """
+        self.enabled = enabled
+        self.per_symbol = per_symbol
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.begin_run()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(enabled=config.get('enabled', False), per_symbol=config.get('per_symbol', True))
+
+    def begin_run(self):
+        """実行ごとのサマリー集計をリセット（Prometheus 向けの累積値はそのまま）"""
+        self.run_started = time.time()
+        self.run_counters = {}
+        self.run_stages = {}
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.run_counters[key] = self.run_counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[(name, label_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        """ヒストグラムに観測値を追加（銘柄ラベル付きの系列は実行サマリーに含めない）"""
+        if not self.enabled:
+            return
+        key = (name, label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.counts[bisect.bisect_left(self.buckets, value)] += 1
+            histogram.count += 1
+            histogram.sum += value
+
+            if 'symbol' in labels:
+                return
+            stats = self.run_stages.get(key)
+            if stats is None:
+                self.run_stages[key] = [1, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = max(stats[2], value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self):
+        """Prometheus テキスト形式で出力"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(
+                (key, (list(h.counts), h.count, h.sum)) for key, h in self.histograms.items()
+            )
+
+        lines = []
+        declared = set()
+
+        def declare(name, kind):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, key), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{PREFIX}{name}{format_labels(key)} {value}")
+        for (name, key), value in gauges:
+            declare(name, 'gauge')
+            lines.append(f"{PREFIX}{name}{format_labels(key)} {value}")
+        for (name, key), (counts, count, total) in histograms:
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{PREFIX}{name}_bucket{format_labels(key + (('le', bound),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_bucket{format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{PREFIX}{name}_sum{format_labels(key)} {total}")
+            lines.append(f"{PREFIX}{name}_count{format_labels(key)} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """textfile collector 用ファイルを書き出す（読み取り途中のファイルを見せないよう置き換え）"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def run_summary(self):
+        """実行ごとのJSONサマリー（段階別の回数・合計・平均・最大、カウンター、ゲージ）"""
+        with self.lock:
+            stages = {}
+            for (name, key), (count, total, longest) in sorted(self.run_stages.items()):
+                label = ','.join(f"{k}={v}" for k, v in key)
+                stages[f"{name}{{{label}}}" if label else name] = {
+                    'count': count,
+                    'total': round(total, 6),
+                    'mean': round(total / count, 6),
+                    'max': round(longest, 6)
+                }
+            counters = {
+                f"{name}{format_labels(key)}": value for (name, key), value in sorted(self.run_counters.items())
+                if not any(k == 'symbol' for k, _ in key)
+            }
+            gauges = {
+                f"{name}{format_labels(key)}": value for (name, key), value in sorted(self.gauges.items())
+            }
+        return {
+            'started': datetime.fromtimestamp(self.run_started).strftime('%Y-%m-%d %H:%M:%S'),
+            'duration': round(time.time() - self.run_started, 3),
+            'stages': stages,
+            'counters': counters,
+            'gauges': gauges
+        }
+
+    def write_summary(self, path):
+        """実行サマリーをJSON Lines形式で追記"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.run_summary(), ensure_ascii=False) + '\n')
+
+
+def instrumented(stage, failed=None, symbol_arg=False):
+    """メソッドの所要時間と失敗回数を self.metrics に記録するデコレーター
+
+    failed: 戻り値から失敗を判定する関数（例外は常に失敗として記録して再送出）
+    symbol_arg: 第1引数を銘柄として銘柄ラベル付きの系列にも記録する
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            metrics = self.metrics
+            if not metrics.enabled:
+                return func(self, *args, **kwargs)
+            started = time.perf_counter()
+            try:
+                result = func(self, *args, **kwargs)
+            except Exception:
+                metrics.inc('stage_failures_total', stage=stage)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                metrics.observe('stage_seconds', elapsed, stage=stage)
+                if symbol_arg and metrics.per_symbol and args:
+                    metrics.observe('stage_seconds', elapsed, stage=stage, symbol=args[0])
+            if failed is not None and failed(result):
+                metrics.inc('stage_failures_total', stage=stage)
+            return result
+        return wrapper
+    return decorator
+
+
+class MetricsServer:
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        """/metrics を返すローカルHTTPエンドポイント（常駐モードでのスクレイプ用）"""
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics-http', daemon=True)
+        self.thread.start()
+        logger.info(f"メトリクスエンドポイント開始: http://{host}:{self.port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
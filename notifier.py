@@ -0,0 +1,275 @@
+"""
+Enhanced RSI Alert System - 通知ディスパッチャー
+LINE通知を永続アウトボックス（SQLite）に積み、バックグラウンドスレッドから
+接続プール付きセッションで送信する。複数のアラートは1回のブロードキャストに
+まとめ（最大 MAX_MESSAGES_PER_REQUEST 件）、レート制限・指数バックオフ付きで再送する。
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from fetch_pipeline import backoff_delay
+from metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+LINE_BROADCAST_URL = "https://api.line.me/v2/bot/message/broadcast"
+
+# LINE Messaging API の1リクエストあたりのメッセージ数・文字数上限
+MAX_MESSAGES_PER_REQUEST = 5
+MAX_TEXT_LENGTH = 5000
+
+
+class Outbox:
+    def __init__(self, db_path):
+        """未送信通知の永続キュー（送信成功まで保持し、次回実行時にも再送）"""
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    text TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+            """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (status, next_attempt)"
+            )
+
+    def enqueue(self, text):
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO outbox (text, created_at) VALUES (?, ?)",
+                (text, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+        return cursor.lastrowid
+
+    def due(self, limit, now=None):
+        """送信可能な未送信通知を古い順に取得 [(id, text, attempts)]"""
+        now = time.time() if now is None else now
+        with self.lock:
+            return self.conn.execute(
+                "SELECT id, text, attempts FROM outbox WHERE status = 'pending' AND next_attempt <= ? "
+                "ORDER BY id LIMIT ?",
+                (now, limit)
+            ).fetchall()
+
+    def pending_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+    def next_due_time(self):
+        """次に送信可能になる時刻（未送信が無ければ None）"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'"
+            ).fetchone()
+        return row[0]
+
+    def mark_sent(self, ids):
+        with self.lock, self.conn:
+            self.conn.executemany("UPDATE outbox SET status = 'sent' WHERE id = ?", [(i,) for i in ids])
+
+    def mark_retry(self, ids, next_attempt, error):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ? WHERE id = ?",
+                [(next_attempt, error, i) for i in ids]
+            )
+
+    def mark_failed(self, ids, error):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(error, i) for i in ids]
+            )
+
+    def purge_sent(self, keep_days=30):
+        """送信済みの古い通知を削除"""
+        cutoff = (datetime.now() - timedelta(days=keep_days)).strftime('%Y-%m-%d %H:%M:%S')
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM outbox WHERE status = 'sent' AND created_at < ?", (cutoff,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class LineNotifier:
+    def __init__(self, access_token, outbox, endpoint=LINE_BROADCAST_URL, timeout=10,
+                 rate_limiter=None, max_attempts=5, base_delay=5.0, max_delay=600.0, metrics=None):
+        """LINE通知ディスパッチャー初期化
+
+        rate_limiter: ブロードキャスト呼び出し単位で適用する TokenBucket
+        max_attempts: この回数失敗した通知は failed として再送を打ち切る
+        metrics: API呼び出しの所要時間・結果を記録する Metrics
+        """
+        self.endpoint = endpoint
+        self.outbox = outbox
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = metrics or Metrics()
+
+        self.access_token = access_token
+        self._session = None
+
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.worker = None
+
+    @property
+    def session(self):
+        """送信時に作成する HTTP セッション（接続を使い回し、通知ごとのTLSハンドシェイクを避ける）"""
+        if self._session is None:
+            # requests は送信する場合のみ読み込む（送信の無い実行の起動時間を短縮）
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            session.headers.update({
+                "Authorization": f"Bearer {self.access_token}",
+                "Content-Type": "application/json"
+            })
+            self._session = session
+        return self._session
+
+    def post(self, texts):
+        """1回のブロードキャストで最大 MAX_MESSAGES_PER_REQUEST 件を送信
+
+        戻り値は (成功, 再送可能, 待機秒数の指定 or None, エラー内容)。
+        """
+        data = {
+            "messages": [{"type": "text", "text": text[:MAX_TEXT_LENGTH]} for text in texts]
+        }
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        with self.metrics.timer('line_request_seconds'):
+            import requests
+            try:
+                response = self.session.post(self.endpoint, json=data, timeout=self.timeout)
+            except requests.RequestException as e:
+                self.metrics.inc('line_requests_total', status='error')
+                return False, True, None, str(e)
+        self.metrics.inc('line_requests_total', status=str(response.status_code))
+
+        if response.status_code == 200:
+            return True, False, None, None
+        error = f"{response.status_code} - {response.text}"
+        retry_after = response.headers.get('Retry-After')
+        retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+        # レート制限・サーバーエラーは再送、それ以外（認証エラー等）は再送しても失敗する
+        retryable = response.status_code == 429 or response.status_code >= 500
+        return False, retryable, retry_after, error
+
+    def send_now(self, message):
+        """アウトボックスを経由せず同期送信（エラー通知用）"""
+        ok, _, _, error = self.post([message])
+        if ok:
+            logger.info("LINE通知送信成功")
+        else:
+            logger.error(f"LINE通知送信失敗: {error}")
+        return ok
+
+    def enqueue(self, message):
+        """通知をアウトボックスに追加（送信はバックグラウンドで行う）"""
+        self.outbox.enqueue(message)
+        self.wakeup.set()
+
+    def flush_due(self):
+        """送信可能な通知をまとめて送信（送信したバッチ数を返す）"""
+        batches = 0
+        while not self.stopping.is_set():
+            rows = self.outbox.due(MAX_MESSAGES_PER_REQUEST)
+            if not rows:
+                break
+            result = self.post([row[1] for row in rows])
+            batches += 1
+            ok, retryable, _, error = result
+            if ok or retryable or len(rows) == 1:
+                if not self.record_result(rows, result):
+                    break
+                continue
+
+            # 1件の不正なメッセージでまとめた全件を失わないよう、1件ずつ送り直して判定
+            logger.warning(f"LINE通知の一括送信が失敗したため1件ずつ送信します ({len(rows)}件): {error}")
+            waiting = False
+            for row in rows:
+                batches += 1
+                if not self.record_result([row], self.post([row[1]])):
+                    waiting = True
+                    break
+            if waiting:
+                break
+        return batches
+
+    def record_result(self, rows, result):
+        """送信結果をアウトボックスに反映（再送待ちになった場合は False）"""
+        ok, retryable, retry_after, error = result
+        ids = [row[0] for row in rows]
+        if ok:
+            self.outbox.mark_sent(ids)
+            self.metrics.inc('line_messages_total', len(ids), result='sent')
+            logger.info(f"LINE通知送信成功 ({len(ids)}件)")
+            return True
+
+        attempts = max(row[2] for row in rows) + 1
+        if not retryable or attempts >= self.max_attempts:
+            self.outbox.mark_failed(ids, error)
+            self.metrics.inc('line_messages_total', len(ids), result='failed')
+            logger.error(f"LINE通知送信失敗（再送打ち切り, {len(ids)}件）: {error}")
+            return True
+        delay = retry_after if retry_after is not None else backoff_delay(attempts - 1, self.base_delay, self.max_delay)
+        self.outbox.mark_retry(ids, time.time() + delay, error)
+        self.metrics.inc('line_messages_total', len(ids), result='retry')
+        logger.warning(f"LINE通知送信失敗、{delay:.0f}秒後に再送 ({len(ids)}件): {error}")
+        return False
+
+    def _run(self):
+        while not self.stopping.is_set():
+            try:
+                self.flush_due()
+            except Exception as e:
+                logger.error(f"通知ディスパッチャーエラー: {e}")
+            next_due = self.outbox.next_due_time()
+            wait_time = None if next_due is None else max(0.0, next_due - time.time())
+            self.wakeup.wait(wait_time)
+            self.wakeup.clear()
+
+    def start(self):
+        """バックグラウンド送信スレッドを開始（前回実行の未送信分もここで再送される）"""
+        if self.worker is not None and self.worker.is_alive():
+            return
+        self.stopping.clear()
+        self.worker = threading.Thread(target=self._run, name='line-notifier', daemon=True)
+        self.worker.start()
+
+    def flush(self, timeout=60.0):
+        """送信可能な通知が無くなるまで待機（再送待ちの通知は次回以降に持ち越す）"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            next_due = self.outbox.next_due_time()
+            if next_due is None or next_due > time.time():
+                return True
+            self.wakeup.set()
+            time.sleep(0.1)
+        logger.warning(f"通知送信待ちタイムアウト: 未送信{self.outbox.pending_count()}件は次回再送します")
+        return False
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.worker is not None:
+            self.worker.join(timeout=self.timeout + 1)
+            self.worker = None
@@ -0,0 +1,290 @@
+"""
+Enhanced RSI Alert System - しきい値グリッドサーチ
+symbol_specific_settings のしきい値を全銘柄についてプロセスプールで並列に探索し、
+最良の設定を候補設定ファイルとして書き出す
+
+価格・RSIの配列は共有メモリに1回だけ配置し、ワーカーはタスクごとに
+pickle せずにゼロコピーで参照する。しきい値の組み合わせ等の共通の引数もワーカーの
+初期化時に1回だけ渡す。RSIは rsi_period ごとに1回だけ、実行時と同じく各日までの
+直近6ヶ月分の日足から計算する（backtest.trailing_rsi()）。
+
+使い方:
+    python optimizer.py [--config C:\\rsi_alert\\config.json] [--workers 8]
+"""
+
+import argparse
+import copy
+import itertools
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import DEFAULT_SETTINGS, signal_codes, performance_from_codes, trailing_rsi
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GRID = {
+    'rsi_period': [10, 14, 20],
+    'daily_buy_threshold': [25, 28, 30, 33, 35, 38],
+    'daily_sell_threshold': [62, 65, 67, 70, 72, 75],
+    'use_weekly_filter': [False, True],
+    'weekly_buy_threshold': [40, 45, 50, 55],
+    'weekly_sell_threshold': [45, 50, 55, 60]
+}
+
+# ワーカープロセス内の共有配列 {name: ndarray}
+_SHARED = {}
+_SHARED_HANDLES = []
+# ワーカープロセス内の全タスク共通の引数（しきい値の組み合わせ・銘柄ごとの検証期間・目的関数）
+_TASK_CONTEXT = {}
+
+
+def expand_grid(grid):
+    """パラメータグリッドを rsi_period ごとのしきい値組み合わせに展開
+
+    週足フィルター無効の組み合わせでは週足しきい値が判定に影響しないため重複を除く。
+    """
+    keys = [key for key in DEFAULT_SETTINGS if key in grid]
+    combos = []
+    seen = set()
+    for values in itertools.product(*(grid[key] for key in keys)):
+        settings = dict(DEFAULT_SETTINGS)
+        settings.update(zip(keys, values))
+        if settings['daily_buy_threshold'] >= settings['daily_sell_threshold']:
+            continue
+        if not settings['use_weekly_filter']:
+            settings['weekly_buy_threshold'] = DEFAULT_SETTINGS['weekly_buy_threshold']
+            settings['weekly_sell_threshold'] = DEFAULT_SETTINGS['weekly_sell_threshold']
+        key = tuple(sorted(settings.items()))
+        if key not in seen:
+            seen.add(key)
+            combos.append(settings)
+    return combos
+
+
+def score(stats, objective, min_trades):
+    """目的関数（取引回数が min_trades 未満の組み合わせは除外）"""
+    if stats['trades'] < min_trades:
+        return float('-inf')
+    if objective == 'win_rate':
+        # 決済済みの取引が無い場合の勝率は None
+        return stats['win_rate'] if stats['win_rate'] is not None else float('-inf')
+    if objective == 'calmar':
+        return stats['cagr'] / max(stats['max_drawdown'], 1.0)
+    return stats['cagr']
+
+
+class SharedArrays:
+    def __init__(self):
+        """親プロセス側の共有メモリ管理"""
+        self.blocks = []
+        self.specs = {}
+
+    def put(self, name, array):
+        """配列を共有メモリへコピーし、ワーカーへ渡す仕様（名前・形状・型）を記録"""
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        view[...] = array
+        self.blocks.append(block)
+        self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def _attach_shared(specs, context):
+    """ワーカー初期化: 共有メモリを読み取り専用のビューとして参照し、共通の引数を保持"""
+    _TASK_CONTEXT.update(context)
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _SHARED[name] = array
+        _SHARED_HANDLES.append(block)
+
+
+def _evaluate_task(column, rsi_period):
+    """1銘柄・1RSI期間について全しきい値組み合わせを評価し、最良の結果を返す"""
+    combos = _TASK_CONTEXT['combos']
+    years = _TASK_CONTEXT['years']
+    objective = _TASK_CONTEXT['objective']
+    min_trades = _TASK_CONTEXT['min_trades']
+    close = _SHARED['close'][:, column]
+    valid = ~np.isnan(close)
+    close = close[valid]
+    daily_rsi = _SHARED[f'daily_rsi_{rsi_period}'][valid, column]
+    weekly_rsi = _SHARED[f'weekly_rsi_{rsi_period}'][valid, column]
+
+    best = None
+    for settings in combos:
+        codes = signal_codes(daily_rsi, weekly_rsi, settings)
+        stats = performance_from_codes(close, codes, years[column])
+        value = score(stats, objective, min_trades)
+        if best is None or value > best[0]:
+            best = (value, settings, stats)
+    return column, rsi_period, best
+
+
+def build_price_matrix(daily_data, symbols):
+    """日足データを日付×銘柄の終値行列に整列"""
+    closes = pd.DataFrame({symbol: daily_data[symbol]['Close'] for symbol in symbols if symbol in daily_data})
+    return closes.sort_index()
+
+
+def optimize(daily_data, symbols, grid=None, workers=None, objective='cagr', min_trades=3, smoothing='sma',
+             closes=None):
+    """全銘柄のしきい値グリッドサーチ
+
+    closes に日付×銘柄の終値行列（価格ストア等）を渡した場合は daily_data を使わない。
+    戻り値は {symbol: {'rsi_period', 'settings', 'stats', 'score'}} と
+    rsi_period ごとの全銘柄合計スコア。
+    """
+    grid = grid or DEFAULT_GRID
+    if closes is None:
+        closes = build_price_matrix(daily_data, symbols)
+    symbols = list(closes.columns)
+    combos = expand_grid(grid)
+    periods = grid.get('rsi_period', [14])
+
+    # 銘柄ごとの検証期間（年）
+    years = []
+    for symbol in symbols:
+        index = closes[symbol].dropna().index
+        years.append((index[-1] - index[0]).days / 365.25)
+
+    shared = SharedArrays()
+    try:
+        shared.put('close', closes.to_numpy(dtype=np.float64))
+        for period in periods:
+            # RSIは rsi_period ごとに1回だけ計算して共有（各日時点で run() が算出する値）
+            daily, weekly = {}, {}
+            for symbol in symbols:
+                daily[symbol], weekly[symbol] = trailing_rsi(closes[symbol].dropna(), period, smoothing)
+            shared.put(f'daily_rsi_{period}', pd.DataFrame(daily).reindex(closes.index).to_numpy(dtype=np.float64))
+            shared.put(f'weekly_rsi_{period}', pd.DataFrame(weekly).reindex(closes.index).to_numpy(dtype=np.float64))
+
+        logger.info(
+            f"グリッドサーチ開始: {len(symbols)}銘柄 × RSI期間{len(periods)}種 × しきい値{len(combos)}通り"
+        )
+
+        results = {}
+        context = {'combos': combos, 'years': years, 'objective': objective, 'min_trades': min_trades}
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared,
+                                 initargs=(shared.specs, context)) as executor:
+            futures = [
+                executor.submit(_evaluate_task, column, period)
+                for column in range(len(symbols)) for period in periods
+            ]
+            for future in as_completed(futures):
+                column, period, (value, settings, stats) = future.result()
+                results.setdefault(symbols[column], {})[period] = {
+                    'rsi_period': period, 'settings': settings, 'stats': stats, 'score': value
+                }
+    finally:
+        shared.close()
+
+    # rsi_period は全銘柄共通の設定のため、合計スコアが最大の期間を採用
+    period_scores = {
+        period: sum(
+            results[symbol][period]['score'] for symbol in results
+            if results[symbol][period]['score'] != float('-inf')
+        )
+        for period in periods
+    }
+    best_period = max(period_scores, key=period_scores.get)
+    best = {symbol: by_period[best_period] for symbol, by_period in results.items()}
+    return best, best_period, period_scores
+
+
+def write_candidate_config(config, best, best_period, output_path):
+    """最良の設定を反映した候補設定ファイルを書き出す（元の config.json は変更しない）"""
+    candidate = copy.deepcopy(config)
+    candidate['rsi_period'] = best_period
+    symbol_settings = candidate.setdefault('symbol_specific_settings', {})
+
+    report = {}
+    for symbol, result in best.items():
+        if result['score'] == float('-inf'):
+            logger.warning(f"{symbol}: 条件を満たす組み合わせが無いため現行設定を維持")
+            continue
+        settings = symbol_settings.setdefault(symbol, {})
+        settings.update(result['settings'])
+        if not settings['use_weekly_filter']:
+            settings.pop('weekly_buy_threshold', None)
+            settings.pop('weekly_sell_threshold', None)
+        report[symbol] = result['stats']
+
+    candidate['optimizer_report'] = report
+    with open(output_path, 'w') as f:
+        json.dump(candidate, f, indent=2, ensure_ascii=False)
+    logger.info(f"候補設定を書き出しました: {output_path}")
+    return candidate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSIしきい値のグリッドサーチ")
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--years', type=int, default=None)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    from main import EnhancedRSIAlertSystem
+    from market_data import fetch_daily_bars, fetch_daily_bars_cached
+    from price_store import PriceStore
+
+    system = EnhancedRSIAlertSystem(args.config)
+    optimizer_config = system.config.get('optimizer', {})
+    years = args.years or system.backtest_years
+    period = f"{years}y"
+
+    # 指標フィルターは探索中のしきい値と組み合わせて評価しないため、設定した銘柄は対象外（現行設定を維持）
+    filtered = [symbol for symbol in system.symbols if system.symbol_settings.get(symbol, {}).get('indicator_filters')]
+    if filtered:
+        logger.warning(f"指標フィルターを設定した銘柄はグリッドサーチの対象外です: {', '.join(filtered)}")
+    symbols = [symbol for symbol in system.symbols if symbol not in filtered]
+    if not symbols:
+        return
+
+    # 価格ストアがあれば終値行列をそこから作る（取得・DataFrameの読み込みを行わない）
+    closes = None
+    daily_data = None
+    store = PriceStore.from_config(system.config.get('price_store', {}))
+    if store is not None:
+        start = pd.Timestamp.now().normalize() - pd.DateOffset(years=years)
+        closes = store.matrix('Close', symbols)
+        closes = closes[closes.index >= start].dropna(axis=1, how='all').dropna(how='all')
+    elif system.bar_cache is not None:
+        daily_data = fetch_daily_bars_cached(symbols, system.bar_cache, period=period,
+                                             chunk_size=system.fetch_chunk_size,
+                                             rate_limiter=system.rate_limiter, provider=system.data_provider)
+    else:
+        daily_data = fetch_daily_bars(symbols, period=period, chunk_size=system.fetch_chunk_size,
+                                      rate_limiter=system.rate_limiter, provider=system.data_provider)
+
+    best, best_period, period_scores = optimize(
+        daily_data,
+        symbols,
+        grid=optimizer_config.get('grid'),
+        workers=args.workers or optimizer_config.get('workers'),
+        objective=optimizer_config.get('objective', 'cagr'),
+        min_trades=optimizer_config.get('min_trades', 3),
+        smoothing=system.rsi_smoothing,
+        closes=closes
+    )
+    logger.info(f"RSI期間別スコア: {period_scores} → 採用: {best_period}")
+
+    output_path = args.output or optimizer_config.get('output', "C:\\rsi_alert\\config.candidate.json")
+    write_candidate_config(system.config, best, best_period, output_path)
+
+
+if __name__ == "__main__":
+    main()
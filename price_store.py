@@ -0,0 +1,362 @@
+"""
+Enhanced RSI Alert System - メモリマップ価格ストア
+日足OHLCVを項目ごとの固定幅float配列（銘柄×日付、銘柄ごとに連続）としてファイルに保存し、
+np.memmap で開く。銘柄の系列は配列のビュー（コピー無し）として取得でき、
+複数のワーカープロセスが同じファイルを読み取り専用で共有できる。
+開く処理はメタデータの読み込みとマップのみで、メモリ使用量は実際に参照したページ分に限られる。
+
+日付軸は全銘柄共通で、末尾への追加のみ行う（既存の日付軸より古い日付のうち軸に無いものは破棄）。
+配列の容量が足りなくなった場合は新しい世代のファイルへ複製してからメタデータを置き換えるため、
+書き込み中も読み手が開いている配列は変わらない。書き込みは1プロセスのみ（ロックファイルで排他）。
+
+使い方:
+    python price_store.py build [--years 20]    # 価格キャッシュから作成（既存のストアは作り直す）
+    python price_store.py update               # 直近の日足を取得して反映
+    python price_store.py info
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+META_FILE = 'meta.json'
+LOCK_FILE = 'write.lock'
+DTYPES = {'float32': np.float32, 'float64': np.float64}
+# 新しい世代を作るときの最小容量（日付・銘柄）
+MIN_DATE_CAPACITY = 256
+MIN_SYMBOL_CAPACITY = 64
+
+
+def to_days(index):
+    """DatetimeIndex（タイムゾーン付き可）を1970-01-01からの日数（int64）に変換"""
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return index.normalize().values.astype('datetime64[D]').astype(np.int64)
+
+
+class PriceStore:
+    def __init__(self, store_dir, writable=False):
+        """価格ストアを開く（writable=True は書き込み用、同時に1プロセスのみ）"""
+        self.store_dir = store_dir
+        self.writable = writable
+        self.lock_path = os.path.join(store_dir, LOCK_FILE)
+        self._locked = False
+        if writable:
+            os.makedirs(store_dir, exist_ok=True)
+            self._acquire_lock()
+        self._dates_index = None
+        self._load()
+
+    @classmethod
+    def from_config(cls, config, writable=False):
+        """設定の price_store セクションから開く（未作成の場合は None）"""
+        store_dir = config.get('dir', "C:\\rsi_alert\\price_store")
+        if not writable and not os.path.exists(os.path.join(store_dir, META_FILE)):
+            return None
+        store = cls(store_dir, writable=writable)
+        if writable and not store.symbols:
+            store.dtype = np.dtype(DTYPES[config.get('dtype', 'float64')])
+        return store
+
+    def _acquire_lock(self):
+        try:
+            fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            raise RuntimeError(
+                f"価格ストアは他のプロセスが書き込み中です（異常終了した場合は {self.lock_path} を削除）"
+            )
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        self._locked = True
+
+    def close(self):
+        """マップを解放し、書き込みロックを外す"""
+        self.arrays = {}
+        self._dates = None
+        if self._locked:
+            os.remove(self.lock_path)
+            self._locked = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _path(self, name, generation):
+        return os.path.join(self.store_dir, f"{name.lower()}.{generation}.bin")
+
+    def _load(self):
+        """メタデータを読み込み、現在の世代の配列をマップ（未作成なら空のストア）"""
+        meta_path = os.path.join(self.store_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        else:
+            meta = {'dtype': 'float64', 'generation': 0, 'date_capacity': 0, 'symbol_capacity': 0,
+                    'n_dates': 0, 'symbols': [], 'first': [], 'last': [], 'count': []}
+        self.meta = meta
+        self.dtype = np.dtype(meta['dtype'])
+        self.generation = meta['generation']
+        self.n_dates = meta['n_dates']
+        self.symbols = meta['symbols']
+        self.position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        # 銘柄ごとの最初・最後の有効な日付位置と、その間の有効な終値の本数
+        self.first = meta['first']
+        self.last = meta['last']
+        self.count = meta['count']
+        self._dates_index = None
+
+        mode = 'r+' if self.writable else 'r'
+        shape = (meta['symbol_capacity'], meta['date_capacity'])
+        self.arrays = {}
+        self._dates = None
+        if meta['date_capacity'] and meta['symbol_capacity']:
+            for field in FIELDS:
+                self.arrays[field] = np.memmap(self._path(field, self.generation), dtype=self.dtype,
+                                               mode=mode, shape=shape)
+            self._dates = np.memmap(self._path('dates', self.generation), dtype=np.int64, mode=mode,
+                                    shape=(meta['date_capacity'],))
+
+    @property
+    def dates(self):
+        """日付軸（DatetimeIndex、初回参照時に作成）"""
+        if self._dates_index is None:
+            days = np.asarray(self._dates[:self.n_dates]) if self._dates is not None else np.array([], np.int64)
+            self._dates_index = pd.DatetimeIndex(days.astype('datetime64[D]'), name='Date')
+        return self._dates_index
+
+    def view(self, symbol, field='Close'):
+        """銘柄の全日付分の値（コピー無しのビュー、先頭・末尾の欠損を含む）"""
+        return self.arrays[field][self.position[symbol], :self.n_dates]
+
+    def series(self, symbol, field='Close'):
+        """銘柄の有効な期間の値（Series、途中に欠損が無ければコピー無し）"""
+        i = self.position[symbol]
+        start, end = self.first[i], self.last[i] + 1
+        values = self.arrays[field][i, start:end]
+        index = self.dates[start:end]
+        if self.count[i] != end - start:
+            valid = ~np.isnan(self.arrays['Close'][i, start:end])
+            values, index = values[valid], index[valid]
+        return pd.Series(values, index=index, name=symbol, copy=False)
+
+    def frame(self, symbol):
+        """銘柄のOHLCV（DataFrame、各列はコピーされる）"""
+        return pd.DataFrame({field: self.series(symbol, field) for field in FIELDS})
+
+    def matrix(self, field='Close', symbols=None):
+        """日付×銘柄の値（DataFrame、全銘柄の場合はコピー無しの転置ビュー）"""
+        if symbols is None:
+            values = self.arrays[field][:len(self.symbols), :self.n_dates].T
+            return pd.DataFrame(values, index=self.dates, columns=list(self.symbols), copy=False)
+        rows = [self.position[symbol] for symbol in symbols if symbol in self.position]
+        values = self.arrays[field][rows, :self.n_dates].T
+        return pd.DataFrame(values, index=self.dates, columns=[self.symbols[i] for i in rows])
+
+    def update(self, frames):
+        """銘柄の値を frames（{symbol: OHLCV DataFrame}）で置き換える（書き込み用で開いた場合のみ）
+
+        既存の日付軸より新しい日付は軸の末尾に追加する。軸より古い日付で軸に無いものは
+        追加できないため破棄する（作り直す場合は build を使う）。
+        """
+        if not self.writable:
+            raise RuntimeError("価格ストアが読み取り専用で開かれています")
+        frames = {symbol: frame for symbol, frame in frames.items() if frame is not None and not frame.empty}
+        if not frames:
+            return 0
+
+        days = {symbol: to_days(frame.index) for symbol, frame in frames.items()}
+        axis = np.asarray(self._dates[:self.n_dates]) if self.n_dates else np.array([], np.int64)
+        latest = axis[-1] if len(axis) else None
+        new_days = np.unique(np.concatenate(list(days.values())))
+        if latest is not None:
+            new_days = new_days[new_days > latest]
+        new_symbols = [symbol for symbol in frames if symbol not in self.position]
+        self._reserve(self.n_dates + len(new_days), len(self.symbols) + len(new_symbols))
+
+        if len(new_days):
+            self._dates[self.n_dates:self.n_dates + len(new_days)] = new_days
+            self.n_dates += len(new_days)
+            axis = np.asarray(self._dates[:self.n_dates])
+        for symbol in new_symbols:
+            self.position[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            self.first.append(0)
+            self.last.append(-1)
+            self.count.append(0)
+
+        dropped = 0
+        for symbol, frame in frames.items():
+            i = self.position[symbol]
+            positions = np.searchsorted(axis, days[symbol])
+            known = (positions < len(axis)) & (axis[np.minimum(positions, len(axis) - 1)] == days[symbol])
+            dropped += int((~known).sum())
+            positions = positions[known]
+            for field in FIELDS:
+                row = np.full(self.n_dates, np.nan, dtype=self.dtype)
+                if field in frame.columns:
+                    row[positions] = frame[field].to_numpy(dtype=np.float64)[known]
+                self.arrays[field][i, :self.n_dates] = row
+            valid = np.flatnonzero(~np.isnan(self.arrays['Close'][i, :self.n_dates]))
+            if len(valid):
+                self.first[i], self.last[i] = int(valid[0]), int(valid[-1])
+                self.count[i] = int(len(valid))
+            else:
+                self.first[i], self.last[i], self.count[i] = 0, -1, 0
+        if dropped:
+            logger.warning(f"価格ストアの日付軸に無い過去の日足を{dropped}本破棄しました")
+
+        self._commit()
+        return len(frames)
+
+    def reset(self, days):
+        """全銘柄を消去し、日付軸を days（日数の昇順配列）で作り直す（新しい世代に作成）"""
+        if not self.writable:
+            raise RuntimeError("価格ストアが読み取り専用で開かれています")
+        self.arrays = {}
+        self._dates = None
+        self.symbols, self.position = [], {}
+        self.first, self.last, self.count = [], [], []
+        self.n_dates = 0
+        self.meta['date_capacity'] = self.meta['symbol_capacity'] = 0
+        self._reserve(len(days), MIN_SYMBOL_CAPACITY)
+        self._dates[:len(days)] = days
+        self.n_dates = len(days)
+
+    def _reserve(self, n_dates, n_symbols):
+        """容量が足りなければ倍の容量で新しい世代を作成（既存の値を複製、未使用部分は NaN）"""
+        date_capacity = self.meta['date_capacity']
+        symbol_capacity = self.meta['symbol_capacity']
+        if n_dates <= date_capacity and n_symbols <= symbol_capacity and self.arrays:
+            return
+        new_date_capacity = max(date_capacity, MIN_DATE_CAPACITY)
+        while new_date_capacity < n_dates:
+            new_date_capacity *= 2
+        new_symbol_capacity = max(symbol_capacity, MIN_SYMBOL_CAPACITY)
+        while new_symbol_capacity < n_symbols:
+            new_symbol_capacity *= 2
+
+        generation = self.generation + 1
+        shape = (new_symbol_capacity, new_date_capacity)
+        arrays = {}
+        for field in FIELDS:
+            array = np.memmap(self._path(field, generation), dtype=self.dtype, mode='w+', shape=shape)
+            array[...] = np.nan
+            if field in self.arrays:
+                array[:len(self.symbols), :self.n_dates] = self.arrays[field][:len(self.symbols), :self.n_dates]
+            arrays[field] = array
+        dates = np.memmap(self._path('dates', generation), dtype=np.int64, mode='w+', shape=(new_date_capacity,))
+        if self._dates is not None:
+            dates[:self.n_dates] = self._dates[:self.n_dates]
+
+        self.arrays = arrays
+        self._dates = dates
+        self.generation = generation
+        self.meta['date_capacity'] = new_date_capacity
+        self.meta['symbol_capacity'] = new_symbol_capacity
+        logger.info(f"価格ストアの容量を拡張しました: {new_symbol_capacity}銘柄 × {new_date_capacity}日")
+
+    def _commit(self):
+        """配列をディスクへ書き出してからメタデータを置き換え（読み手は置き換え後に新しい内容を見る）"""
+        for array in self.arrays.values():
+            array.flush()
+        self._dates.flush()
+        self.meta.update({
+            'dtype': self.dtype.name,
+            'generation': self.generation,
+            'n_dates': self.n_dates,
+            'symbols': self.symbols,
+            'first': self.first,
+            'last': self.last,
+            'count': self.count
+        })
+        meta_path = os.path.join(self.store_dir, META_FILE)
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, meta_path)
+        self._dates_index = None
+        self._remove_old_generations()
+
+    def _remove_old_generations(self):
+        """古い世代のファイルを削除（読み手が開いている場合は次回以降に削除）"""
+        for path in glob.glob(os.path.join(self.store_dir, '*.bin')):
+            generation = os.path.basename(path).split('.')[-2]
+            if generation != str(self.generation):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def build_price_store(system, years=None, rebuild=False):
+    """価格キャッシュ（差分取得）の日足を価格ストアへ反映
+
+    rebuild=True の場合は全銘柄の日付を先に集めて日付軸を作り直す。
+    """
+    from market_data import fetch_daily_bars_cached, chunk_symbols
+
+    if system.bar_cache is None:
+        raise RuntimeError("価格ストアの作成には価格キャッシュ（cache.enabled）が必要です")
+    store_config = system.config.get('price_store', {})
+    period = f"{years}y" if years else store_config.get('period', f"{system.backtest_years}y")
+    chunk_size = system.fetch_chunk_size
+
+    def fetch(chunk):
+        return fetch_daily_bars_cached(chunk, system.bar_cache, period=period, chunk_size=chunk_size,
+                                       rate_limiter=system.rate_limiter, provider=system.data_provider)
+
+    if rebuild:
+        # 1回目: 全銘柄をキャッシュへ取得し、日付軸を作る（データは保持しない）
+        all_days = set()
+        for chunk in chunk_symbols(system.symbols, chunk_size):
+            for frame in fetch(chunk).values():
+                all_days.update(to_days(frame.index).tolist())
+        store = PriceStore.from_config(store_config, writable=True)
+        store.dtype = np.dtype(DTYPES[store_config.get('dtype', 'float64')])
+        store.reset(np.array(sorted(all_days), dtype=np.int64))
+    else:
+        store = PriceStore.from_config(store_config, writable=True)
+
+    with store:
+        updated = 0
+        for chunk in chunk_symbols(system.symbols, chunk_size):
+            frames = {symbol: system.bar_cache.load(symbol) for symbol in chunk} if rebuild else fetch(chunk)
+            updated += store.update(frames)
+        logger.info(f"価格ストア更新完了: {updated}銘柄 × {store.n_dates}日 ({store.store_dir})")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="メモリマップ価格ストアの作成・更新")
+    parser.add_argument('command', choices=['build', 'update', 'info'])
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    parser.add_argument('--years', type=int, default=None)
+    args = parser.parse_args()
+
+    from main import EnhancedRSIAlertSystem
+
+    system = EnhancedRSIAlertSystem(args.config)
+    if args.command == 'info':
+        store = PriceStore.from_config(system.config.get('price_store', {}))
+        if store is None:
+            print("価格ストアは未作成です")
+            return
+        dates = store.dates
+        span = f"{dates[0].date()}〜{dates[-1].date()}" if len(dates) else "-"
+        print(f"{store.store_dir}: {len(store.symbols)}銘柄 × {store.n_dates}日 ({span}), {store.dtype}")
+        return
+    build_price_store(system, args.years, rebuild=args.command == 'build')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Enhanced RSI Alert System - 履歴の高速再生（signals_history の埋め戻し）
+キャッシュ済みの日足から、期間内の各営業日に run() を実行した場合と同じ履歴行・シグナルを
+ベクトル化して算出し、まとめて書き込む（run() を日数分呼び出さない）。
+
+日足RSI・週足RSI（進行中の週を最新バーとする値）・日足クロスの候補は全営業日分を配列で計算し、
+候補となった日のみ実行時と同じ SignalRules で週足フィルター・指標フィルター・理由を判定する。
+RSI・指標は実行時と同じく各日までの直近6ヶ月分の日足のみから計算する（Wilder平滑化でも一致する）。
+
+使い方:
+    python replay.py --start 2024-01-01 [--end 2025-12-31] [--symbols AAPL MSFT]
+    python replay.py --start 2024-01-01 --regenerate   # 期間内の既存の履歴を作り直す
+    python replay.py --start 2024-01-01 --changed      # 前回の再生から設定が変わった銘柄のみ作り直す
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from backtest import load_closes, previous_daily_rsi, signal_codes, trailing_rsi, window_starts
+from run_state import SymbolSnapshot
+
+logger = logging.getLogger(__name__)
+
+# 期間の開始前に読み込む日足（期間の初日にも実行時と同じ直近6ヶ月分の日足があるように）
+WARMUP_YEARS = 1
+
+
+def replay_settings_hash(system, symbol):
+    """履歴の内容に影響する銘柄の設定のハッシュ（--changed の判定に使用）"""
+    payload = {
+        'settings': system.symbol_settings.get(symbol, {}),
+        'rsi_period': system.rsi_period,
+        'smoothing': system.rsi_smoothing,
+        'indicators': system.config.get('indicators', {})
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+@contextmanager
+def quiet_signal_logs():
+    """再生中はシグナル1件ごとのログを抑制（件数は最後にまとめて出力）"""
+    rules_logger = logging.getLogger('signal_rules')
+    level = rules_logger.level
+    rules_logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        rules_logger.setLevel(level)
+
+
+def _rounded(values, digits):
+    """履歴に保存する値（丸め済み、NaN・0 は保存時と同じく None）のリスト"""
+    rounded = np.round(values.astype(np.float64), digits)
+    return [None if not value or math.isnan(value) else value for value in rounded.tolist()]
+
+
+def _date_strings(index):
+    """日足の日付（取引所の現地日付）を 'YYYY-MM-DD' の配列に変換（strftime より高速）"""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return np.datetime_as_string(index.to_numpy().astype('datetime64[D]'))
+
+
+def replay_frames(system, closes, start, end, prev_daily):
+    """銘柄ごとの期間内の日足RSI・週足RSI・前回日足RSI・シグナル候補を計算
+
+    prev_daily: {symbol: 期間開始前の最新の日足RSI}（履歴の無い銘柄は初日を初回実行として扱う）
+    戻り値は {symbol: {列名: 配列}}（日足RSIが算出できない日は含めない）と
+    候補の (日付, 銘柄, 位置) のリスト。
+    """
+    frames = {}
+    candidates = []
+    for symbol, close in closes.items():
+        tz = close.index.tz
+        first = close.index.searchsorted(start.tz_localize(tz) if tz else start)
+        last = close.index.searchsorted(end.tz_localize(tz) if tz else end, side='right')
+
+        # 各日の run() と同じ範囲の日足から計算（期間より前の日は計算しない）
+        daily_rsi, weekly_rsi = trailing_rsi(close, system.rsi_period, system.rsi_smoothing,
+                                             system.state_bars, since=first)
+        daily_rsi = daily_rsi.to_numpy(dtype=float)
+        weekly_rsi = weekly_rsi.to_numpy(dtype=float)
+        prev = previous_daily_rsi(daily_rsi)
+
+        in_range = np.zeros(len(close), dtype=bool)
+        in_range[first:last] = True
+        in_range &= ~np.isnan(daily_rsi)
+        positions = np.flatnonzero(in_range)
+        if positions.size == 0:
+            continue
+        # 期間の初日は前日の行ではなく既存の履歴（無ければ初回実行）を前回値とする
+        prev[positions[0]] = prev_daily.get(symbol, np.nan)
+        prev[positions[1:]] = np.round(daily_rsi[positions[:-1]], 1)
+
+        frame = {
+            'position': positions,
+            'window_start': window_starts(close.index, system.state_bars)[positions],
+            'date': _date_strings(close.index[positions]).tolist(),
+            'price': close.to_numpy(dtype=float)[positions],
+            'daily_rsi': daily_rsi[positions],
+            'weekly_rsi': weekly_rsi[positions],
+            'prev_daily_rsi': prev[positions]
+        }
+        frames[symbol] = frame
+
+        # 日足クロスのみで候補を抽出し、週足・指標フィルターは候補日のみ判定する
+        settings = dict(system.symbol_settings.get(symbol, {}), use_weekly_filter=False)
+        crossed = signal_codes(frame['daily_rsi'], frame['weekly_rsi'], settings, frame['prev_daily_rsi']) != 0
+        candidates.extend((frame['date'][i], symbol, i) for i in np.flatnonzero(crossed).tolist())
+    return frames, candidates
+
+
+def evaluate_candidates(system, closes, frames, candidates):
+    """候補日を実行時と同じ SignalRules で判定（{symbol: {位置: SignalRecord}}）"""
+    by_date = {}
+    for date_str, symbol, i in candidates:
+        by_date.setdefault(date_str, []).append((symbol, i))
+
+    signals = {}
+    with quiet_signal_logs():
+        for date_str, entries in sorted(by_date.items()):
+            rows = []
+            prev_daily = {}
+            for symbol, i in entries:
+                frame = frames[symbol]
+                indicators = None
+                if system.indicator_needs:
+                    # 実行時に取得する直近6ヶ月分の日足と同じ範囲で計算
+                    position = frame['position'][i]
+                    daily_hist = closes[symbol].iloc[frame['window_start'][i]:position + 1].to_frame('Close')
+                    indicators = system.indicator_engine.evaluate(daily_hist, system.indicator_needs)
+                rows.append(SymbolSnapshot(symbol, frame['price'][i], frame['daily_rsi'][i], frame['weekly_rsi'][i],
+                                           date_str, date_str, indicators))
+                prev_daily[symbol] = frame['prev_daily_rsi'][i]
+            for (symbol, i), signal in zip(entries, system.signal_rules.evaluate(rows, prev_daily, False)):
+                if signal is not None:
+                    signals.setdefault(symbol, {})[i] = signal
+    return signals
+
+
+def history_rows(frames, signals):
+    """save_enhanced_history() と同じ形式の履歴行（HISTORY_COLUMNS 順のタプル、銘柄・日付順）"""
+    rows = []
+    for symbol, frame in frames.items():
+        count = len(frame['date'])
+        signal_type = ['NONE'] * count
+        strategy = ['N/A'] * count
+        reason = ['No signal'] * count
+        for i, signal in signals.get(symbol, {}).items():
+            signal_type[i] = signal['signal_type']
+            strategy[i] = signal['strategy']
+            reason[i] = signal['reason']
+        rows.extend(zip(
+            frame['date'],
+            [symbol] * count,
+            np.round(frame['price'], 2).tolist(),
+            np.round(frame['daily_rsi'], 1).tolist(),
+            _rounded(frame['weekly_rsi'], 1),
+            signal_type,
+            strategy,
+            reason,
+            _rounded(frame['prev_daily_rsi'], 1)
+        ))
+    return rows
+
+
+def replay_history(system, start, end=None, symbols=None, regenerate=False, changed_only=False):
+    """期間内の各営業日の実行を再生して履歴へ書き込む（書き込んだ行数を返す）
+
+    regenerate: 期間内の既存の行を削除してから書き込む（未指定時は既存の行を残し、無い日のみ追加）
+    changed_only: 前回の再生から設定が変わった銘柄（未再生の銘柄を含む）のみ作り直す
+    """
+    started = time.perf_counter()
+    store = system.history_store
+    symbols = system.symbols if symbols is None else symbols
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp.now().normalize() if end is None else pd.Timestamp(end).normalize()
+    start_str, end_str = start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+    hashes = {symbol: replay_settings_hash(system, symbol) for symbol in symbols}
+    if changed_only:
+        symbols = [symbol for symbol in symbols if store.get_meta(f'replay_settings:{symbol}') != hashes[symbol]]
+        regenerate = True
+        if not symbols:
+            logger.info("設定が変わった銘柄はありません")
+            return 0
+
+    years = math.ceil((pd.Timestamp.now() - start).days / 365.25) + WARMUP_YEARS
+    closes = {symbol: close.dropna() for symbol, close in load_closes(system, symbols, years).items()}
+    for symbol in symbols:
+        if symbol not in closes:
+            logger.error(f"{symbol}: 再生用データ取得失敗")
+    loaded = time.perf_counter()
+
+    latest = store.get_latest_many(list(closes), start_str)
+    prev_daily = {symbol: data['daily_rsi'] for symbol, data in latest.items() if data is not None}
+    frames, candidates = replay_frames(system, closes, start, end, prev_daily)
+    signals = evaluate_candidates(system, closes, frames, candidates)
+    rows = history_rows(frames, signals)
+    computed = time.perf_counter()
+
+    # 保持期間を過ぎてアーカイブへ移した月の行も、SQLite の行と同じく扱う
+    # （アーカイブ済みの日を SQLite に追加すると、次回の圧縮でアーカイブの行が置き換わる）
+    archive = system.history_archive
+    if regenerate:
+        removed = store.delete_range(list(frames), start_str, end_str) + archive.delete_range(
+            list(frames), start_str, end_str
+        )
+    else:
+        removed = 0
+        archived = archive.keys(list(frames), start_str, end_str)
+        rows = [row for row in rows if (row[1], row[0]) not in archived]
+    inserted = store.insert_many(rows)
+    store.set_meta_many({f'replay_settings:{symbol}': hashes[symbol] for symbol in frames})
+    finished = time.perf_counter()
+
+    logger.info(
+        f"履歴を再生しました: {start_str}〜{end_str}, {len(frames)}銘柄, {len(rows)}行 "
+        f"(追加 {inserted}行, 削除 {removed}行, シグナル {sum(map(len, signals.values()))}件 / 候補 {len(candidates)}件), "
+        f"読込 {loaded - started:.2f}s, 計算 {computed - loaded:.2f}s, 書込 {finished - computed:.2f}s"
+    )
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSIシグナル履歴の再生（埋め戻し）")
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    parser.add_argument('--start', required=True, help="再生する期間の開始日 (YYYY-MM-DD)")
+    parser.add_argument('--end', default=None, help="再生する期間の終了日（未指定時は最新の日足まで）")
+    parser.add_argument('--symbols', nargs='*', default=None)
+    parser.add_argument('--regenerate', action='store_true', help="期間内の既存の履歴を削除して作り直す")
+    parser.add_argument('--changed', action='store_true', help="前回の再生から設定が変わった銘柄のみ作り直す")
+    args = parser.parse_args()
+
+    from main import EnhancedRSIAlertSystem
+
+    system = EnhancedRSIAlertSystem(args.config)
+    replay_history(system, args.start, args.end, args.symbols, args.regenerate, args.changed)
+
+
+if __name__ == "__main__":
+    main()
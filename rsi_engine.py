@@ -0,0 +1,290 @@
+"""
+Enhanced RSI Alert System - RSI計算エンジン
+系列全体のRSI計算、日付×銘柄の価格行列に対する一括RSI計算、
+平均上昇幅・下落幅を保持して1バーごとに定数時間で更新するストリーミングRSIを提供する
+"""
+
+import logging
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SMOOTHING_METHODS = ('sma', 'wilder')
+
+
+def rsi_from_averages(avg_gain, avg_loss):
+    """平均上昇幅・下落幅からRSIを算出（pandas版と同じく 0/0 は NaN）"""
+    if avg_loss == 0:
+        return 100.0 if avg_gain > 0 else float('nan')
+    rs = avg_gain / avg_loss
+    return 100 - (100 / (1 + rs))
+
+
+def wilder_average(values, period):
+    """Wilder平滑化（最初の period 本の単純平均を初期値とする指数平滑）"""
+    seeded = values.copy()
+    seeded.iloc[:period + 1] = float('nan')
+    if len(values) > period:
+        seeded.iloc[period] = values.iloc[1:period + 1].mean()
+    return seeded.ewm(alpha=1 / period, adjust=False).mean()
+
+
+def calculate_rsi_series(prices, period=14, smoothing='sma'):
+    """価格系列全体のRSIを計算"""
+    delta = prices.diff()
+    gain = delta.where(delta > 0, 0)
+    loss = -delta.where(delta < 0, 0)
+    if smoothing == 'wilder':
+        avg_gain = wilder_average(gain, period)
+        avg_loss = wilder_average(loss, period)
+    else:
+        avg_gain = gain.rolling(window=period).mean()
+        avg_loss = loss.rolling(window=period).mean()
+    rs = avg_gain / avg_loss
+    rsi = 100 - (100 / (1 + rs))
+    return rsi
+
+
+def _justify_valid(values):
+    """各列の有効値を末尾に詰めた行列と、元の行位置を返す
+
+    銘柄ごとに取引日が異なる行列でも、各列を単独の系列として計算した場合と
+    同じ結果になるよう、NaN を列の先頭に寄せてから計算する。
+    """
+    order = np.argsort(~np.isnan(values), axis=0, kind='stable')
+    return np.take_along_axis(values, order, axis=0), order
+
+
+def _rsi_matrix_justified(closes, period, smoothing):
+    """有効値が末尾に詰められた行列のRSI（列ごとにpandas版と同じ定義）"""
+    n_rows, n_cols = closes.shape
+    dtype = closes.dtype
+    valid = ~np.isnan(closes)
+    valid_count = np.cumsum(valid, axis=0)
+
+    delta = np.empty_like(closes)
+    delta[0] = np.nan
+    np.subtract(closes[1:], closes[:-1], out=delta[1:])
+    # pandas版と同じく、変化幅が無いバー（先頭バー）は上昇・下落とも0
+    gain = np.where(delta > 0, delta, 0).astype(dtype, copy=False)
+    loss = np.where(delta < 0, -delta, 0).astype(dtype, copy=False)
+
+    avg_gain = np.full((n_rows, n_cols), np.nan, dtype=dtype)
+    avg_loss = np.full((n_rows, n_cols), np.nan, dtype=dtype)
+    if n_rows < period:
+        return avg_gain
+
+    window_gain = np.lib.stride_tricks.sliding_window_view(gain, period, axis=0).sum(axis=-1)
+    window_loss = np.lib.stride_tricks.sliding_window_view(loss, period, axis=0).sum(axis=-1)
+    avg_gain[period - 1:] = window_gain / period
+    avg_loss[period - 1:] = window_loss / period
+
+    if smoothing == 'wilder':
+        # 実際の変化幅が period 本揃った行で単純平均を初期値とし、以降は指数平滑
+        real_count = valid_count - 1
+        alpha = dtype.type(1 / period)
+        smoothed_gain = np.full(n_cols, np.nan, dtype=dtype)
+        smoothed_loss = np.full(n_cols, np.nan, dtype=dtype)
+        for t in range(n_rows):
+            seed = real_count[t] == period
+            smoothed_gain = np.where(seed, avg_gain[t], smoothed_gain * (1 - alpha) + alpha * gain[t])
+            smoothed_loss = np.where(seed, avg_loss[t], smoothed_loss * (1 - alpha) + alpha * loss[t])
+            avg_gain[t] = smoothed_gain
+            avg_loss[t] = smoothed_loss
+        avg_gain[real_count < period] = np.nan
+    else:
+        avg_gain[valid_count < period] = np.nan
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def calculate_rsi_matrix(closes, period=14, smoothing='sma', dtype=np.float64):
+    """日付×銘柄の終値行列から全銘柄のRSIを一括計算
+
+    closes は DataFrame または2次元配列。各列は欠損（NaN）を除いた単独の系列として
+    扱われ、calculate_rsi_series と同じ値になる。欠損位置の結果は NaN。
+    dtype=np.float32 を指定するとメモリ使用量を半分にできる。
+    """
+    is_frame = isinstance(closes, pd.DataFrame)
+    values = np.asarray(closes, dtype=dtype)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+
+    justified, order = _justify_valid(values)
+    rsi = _rsi_matrix_justified(justified, period, smoothing)
+    rsi[np.isnan(justified)] = np.nan
+
+    result = np.empty_like(rsi)
+    np.put_along_axis(result, order, rsi, axis=0)
+
+    if is_frame:
+        return pd.DataFrame(result, index=closes.index, columns=closes.columns)
+    return result
+
+
+def latest_rsi_matrix(closes, period=14, smoothing='sma', dtype=np.float64):
+    """各銘柄の最新バー（列ごとの最後の有効値）時点のRSIを一括計算（Series）"""
+    values = np.asarray(closes, dtype=dtype)
+    justified, _ = _justify_valid(values)
+    rsi = _rsi_matrix_justified(justified, period, smoothing)
+    return pd.Series(rsi[-1] if len(rsi) else np.nan, index=closes.columns)
+
+
+class StreamingRSI:
+    """確定済みバーまでの状態を保持し、新しいバーごとに定数時間で更新するRSI"""
+
+    def __init__(self, period=14, smoothing='sma'):
+        if smoothing not in SMOOTHING_METHODS:
+            raise ValueError(f"未対応の平滑化方式: {smoothing}")
+        self.period = period
+        self.smoothing = smoothing
+        self.last_close = None
+        self.last_date = None
+        self.count = 0
+        # SMA: 直近 period 本の上昇幅・下落幅
+        self.gains = deque(maxlen=period)
+        self.losses = deque(maxlen=period)
+        # Wilder: 平滑化済みの平均値
+        self.avg_gain = None
+        self.avg_loss = None
+
+    def _averages_with(self, close):
+        """close を次のバーとした場合の平均上昇幅・下落幅（状態は変更しない）"""
+        if self.last_close is None:
+            return None
+        change = close - self.last_close
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        n = self.count + 1
+
+        if n < self.period:
+            return None
+
+        if self.smoothing == 'sma':
+            gains = list(self.gains)[-(self.period - 1):] if self.period > 1 else []
+            losses = list(self.losses)[-(self.period - 1):] if self.period > 1 else []
+            return (sum(gains) + gain) / self.period, (sum(losses) + loss) / self.period
+
+        if n == self.period:
+            return (sum(self.gains) + gain) / self.period, (sum(self.losses) + loss) / self.period
+        return (
+            (self.avg_gain * (self.period - 1) + gain) / self.period,
+            (self.avg_loss * (self.period - 1) + loss) / self.period
+        )
+
+    def update(self, close, date=None):
+        """確定バーを1本追加"""
+        if close is None or (isinstance(close, float) and math.isnan(close)):
+            return
+        if self.last_close is None and self.smoothing == 'sma':
+            # pandas版と同じく先頭バーの変化幅を0として窓に含める
+            self.gains.append(0.0)
+            self.losses.append(0.0)
+            self.count = 1
+        elif self.last_close is not None:
+            averages = self._averages_with(close)
+            change = close - self.last_close
+            self.gains.append(change if change > 0 else 0.0)
+            self.losses.append(-change if change < 0 else 0.0)
+            self.count += 1
+            if averages is not None:
+                self.avg_gain, self.avg_loss = averages
+        self.last_close = close
+        self.last_date = date
+
+    def peek(self, close):
+        """close を未確定の最新バーとした場合のRSI"""
+        averages = self._averages_with(close)
+        if averages is None:
+            return float('nan')
+        return rsi_from_averages(*averages)
+
+    @property
+    def value(self):
+        """確定済みバー時点のRSI"""
+        if self.avg_gain is None:
+            return float('nan')
+        return rsi_from_averages(self.avg_gain, self.avg_loss)
+
+    def to_dict(self):
+        return {
+            'period': self.period,
+            'smoothing': self.smoothing,
+            'last_close': self.last_close,
+            'last_date': self.last_date,
+            'count': self.count,
+            'gains': list(self.gains),
+            'losses': list(self.losses),
+            'avg_gain': self.avg_gain,
+            'avg_loss': self.avg_loss
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(data['period'], data['smoothing'])
+        state.last_close = data['last_close']
+        state.last_date = data['last_date']
+        state.count = data['count']
+        state.gains.extend(data['gains'])
+        state.losses.extend(data['losses'])
+        state.avg_gain = data['avg_gain']
+        state.avg_loss = data['avg_loss']
+        return state
+
+    @classmethod
+    def from_series(cls, closes, period=14, smoothing='sma'):
+        """価格系列から状態を再構築（状態が無い・不整合な場合の再シード）"""
+        state = cls(period, smoothing)
+        for date, close in closes.items():
+            state.update(float(close), str(date))
+        return state
+
+
+def _state_is_valid(state, closes, period, smoothing):
+    """保存済み状態が価格系列と整合しているか（期間・方式・最終バーの終値）"""
+    if state is None or state.period != period or state.smoothing != smoothing:
+        return None
+    if state.last_date is None:
+        return None
+    try:
+        loc = closes.index.get_loc(pd.Timestamp(state.last_date))
+    except (KeyError, ValueError, TypeError):
+        return None
+    if not isinstance(loc, int):
+        return None
+    cached_close = closes.iloc[loc]
+    if not math.isclose(cached_close, state.last_close, rel_tol=1e-9, abs_tol=1e-9):
+        return None
+    return loc
+
+
+def advance_rsi_state(state, closes, period=14, smoothing='sma'):
+    """状態を最新の系列まで進め、最新バー（未確定扱い）のRSIを返す
+
+    最新バー以外を確定バーとして状態に取り込み、最新バーは peek で評価する。
+    戻り値は (rsi, state)。
+    """
+    closes = closes.dropna()
+    if closes.empty:
+        return float('nan'), state
+
+    completed = closes.iloc[:-1]
+    loc = _state_is_valid(state, closes, period, smoothing)
+
+    if loc is None or loc >= len(completed):
+        if state is not None and loc is None:
+            logger.info("RSI状態が価格系列と不整合のため再構築します")
+        state = StreamingRSI.from_series(completed, period, smoothing)
+    else:
+        for date, close in completed.iloc[loc + 1:].items():
+            state.update(float(close), str(date))
+
+    if state.last_close is None:
+        return float('nan'), state
+    return state.peek(float(closes.iloc[-1])), state
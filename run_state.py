@@ -0,0 +1,122 @@
+"""
+Enhanced RSI Alert System - 銘柄ごとの実行状態（省メモリ表現）
+銘柄データ・シグナルを __slots__ のレコードで保持し（辞書と同じ添字アクセスに対応）、
+日足は終値のみ・RSI等の計算に必要な本数のみの float32 バッファに切り詰める。
+memory.budget_mb を設定すると、取得中の日足（未圧縮）が予算に収まるようチャンクを分割する。
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+# 指数平滑（Wilder・EMA）は過去全体に依存するため、期間のこの倍数の本数で打ち切る
+# （初期値の影響は (1 - 1/n)^(10n) ≈ e^-10 以下）
+WARMUP_FACTOR = 10
+
+# 未圧縮の日足1銘柄分の目安（6ヶ月分 × OHLCV・配当・分割＋日付インデックス、float64）
+RAW_FRAME_BYTES = 130 * 8 * 8
+
+
+class Record:
+    """__slots__ のレコード（辞書と同じ record['key'] / get / in / items で参照できる）
+
+    optional の項目は値が None の間は辞書に含まれないキーとして扱う。
+    """
+    __slots__ = ()
+    optional = ()
+
+    def __init__(self, **values):
+        for key in self.__slots__:
+            setattr(self, key, values.get(key))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and (key not in self.optional or getattr(self, key) is not None)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self else default
+
+    def pop(self, key, default=None):
+        value = self.get(key, default)
+        if key in self.optional:
+            setattr(self, key, None)
+        return value
+
+    def keys(self):
+        return [key for key in self.__slots__ if key in self]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class SymbolSnapshot(Record):
+    """1銘柄・1実行分の銘柄データ（get_stock_data() の結果）"""
+    __slots__ = ('symbol', 'price', 'daily_rsi', 'weekly_rsi', 'date', 'bar_date', 'indicators')
+    optional = ('indicators',)
+
+    def __init__(self, symbol, price, daily_rsi, weekly_rsi, date, bar_date, indicators=None):
+        self.symbol = symbol
+        self.price = float(price)
+        self.daily_rsi = daily_rsi
+        self.weekly_rsi = weekly_rsi
+        # 同じ実行の全銘柄で共通の日付文字列は1つのオブジェクトを共有
+        self.date = sys.intern(date)
+        self.bar_date = sys.intern(bar_date)
+        self.indicators = indicators
+
+
+class SignalRecord(Record):
+    """シグナル1件（check_enhanced_signal() の結果、current_data はストリーミング評価で付加）"""
+    __slots__ = ('symbol', 'signal_type', 'current_daily_rsi', 'current_weekly_rsi', 'prev_daily_rsi',
+                 'price', 'strategy', 'reason', 'use_weekly_filter', 'current_data')
+    optional = ('current_data',)
+
+
+def rsi_lookback(period, smoothing):
+    """最新のRSIを元の系列と同じ値で計算するのに必要な本数"""
+    if smoothing == 'wilder':
+        return WARMUP_FACTOR * period
+    # 単純移動平均は直近 period 本の変化幅（period + 1 本の終値）のみに依存
+    return period + 1
+
+
+def daily_bars_for_weekly(weekly_bars):
+    """週足 weekly_bars 本を作るのに必要な日足の本数（1週は最大5本、両端の週は途中から）"""
+    return (weekly_bars + 2) * 5
+
+
+def compact_frame(frame, bars=None, dtype=np.float32):
+    """日足を終値のみ・末尾 bars 本の DataFrame に変換（元の DataFrame は参照しない）"""
+    close = frame['Close']
+    if bars is not None:
+        close = close.iloc[-bars:]
+    return pd.DataFrame({'Close': close.to_numpy(dtype=dtype, copy=True)}, index=close.index.copy())
+
+
+def chunk_size_for_budget(budget_mb, chunk_size, max_workers):
+    """取得中の未圧縮の日足（並列数＋処理中の1チャンク）が予算に収まるチャンクの銘柄数"""
+    in_flight = max(1, int(max_workers)) + 1
+    limit = int(budget_mb * 2 ** 20 / (in_flight * RAW_FRAME_BYTES))
+    return max(1, min(chunk_size, limit))
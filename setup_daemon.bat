@@ -0,0 +1,36 @@
+@echo off
+echo RSI Alert System Daemon Setup
+echo.
+
+echo Creating Windows Task Scheduler entry...
+echo Task Name: RSI_Alert_Daemon
+echo Schedule: At logon (resident, runs on its own market-hours schedule)
+echo.
+
+schtasks /create ^
+/tn \"RSI_Alert_Daemon\" ^
+/tr \"python %~dp0daemon.py\" ^
+/sc onlogon ^
+/f
+
+if %errorlevel% equ 0 (
+    echo.
+    echo ✅ Task created successfully!
+    echo.
+    echo The RSI Alert daemon will start at logon and:
+    echo - Check RSI every 15 minutes during US market hours
+    echo - Run a final check 5 minutes after the close
+    echo - Reload config.json automatically when it changes
+    echo.
+    echo Remove the daily task to avoid duplicate alerts:
+    echo schtasks /delete /tn \"RSI_Alert_Daily\" /f
+    echo.
+    echo To delete the daemon task:
+    echo schtasks /delete /tn \"RSI_Alert_Daemon\" /f
+) else (
+    echo.
+    echo ❌ Failed to create task. Please run as Administrator.
+)
+
+echo.
+pause
@@ -0,0 +1,321 @@
+"""
+Enhanced RSI Alert System - シャード実行
+監視銘柄を銘柄名のハッシュで N 個のシャードに分け、シャードごとに別プロセス（別ホスト可）で
+取得・RSI計算・シグナル判定を行う。各シャードは専用の履歴DB・アーカイブ・アウトボックス・
+メトリクスファイルを使い、通知と週次レポート用のデータを共有スプールディレクトリへ
+1実行1ファイルで書き出す（一時ファイルから置き換えるため書きかけのファイルは読まれない）。
+コーディネーターが全シャードの結果を待って通知を1つの送信キューにまとめ、
+週次レポートを1通にまとめて送信する。
+
+使い方:
+    python sharding.py shard --index 3 [--count 16]    # 1シャード分を実行（ホストごとに分担）
+    python sharding.py coordinate [--count 16]          # 全シャードの結果をまとめて通知
+    python sharding.py run [--count 4]                  # 全シャードをローカルの別プロセスで実行してまとめる
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+import zlib
+from datetime import datetime
+
+from main import EnhancedRSIAlertSystem
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SPOOL_DIR = "C:\\rsi_alert\\shards"
+
+
+def shard_of(symbol, count):
+    """銘柄が属するシャード番号（プロセス・ホストをまたいで不変な CRC32 で決める）"""
+    return zlib.crc32(symbol.encode('utf-8')) % count
+
+
+class Shard:
+    def __init__(self, index, count):
+        if not 0 <= index < count:
+            raise ValueError(f"シャード番号が範囲外です: {index} (シャード数 {count})")
+        self.index = index
+        self.count = count
+
+    @property
+    def name(self):
+        return f"shard{self.index:03d}-of-{self.count:03d}"
+
+    def select(self, symbols):
+        """担当する銘柄のみを元の順序で返す"""
+        return [symbol for symbol in symbols if shard_of(symbol, self.count) == self.index]
+
+    def path(self, path):
+        """シャード専用のファイル・ディレクトリ名（拡張子の前にシャード名を付ける）"""
+        if not path:
+            return path
+        root, ext = os.path.splitext(path)
+        return f"{root}.{self.name}{ext}"
+
+    def localize(self, config):
+        """共有ファイルをシャード専用のパスに書き換えた設定を返す"""
+        config = dict(config)
+        history = dict(config.get('history', {}))
+        history['db_path'] = self.path(history.get('db_path', "C:\\rsi_alert\\signals_history.sqlite"))
+        history['archive_dir'] = self.path(history.get('archive_dir', "C:\\rsi_alert\\history_archive"))
+        config['history'] = history
+
+        notification = dict(config['notification'])
+        dispatch = dict(notification.get('dispatch', {}))
+        dispatch['outbox_path'] = self.path(dispatch.get('outbox_path', "C:\\rsi_alert\\notification_outbox.sqlite"))
+        notification['dispatch'] = dispatch
+        config['notification'] = notification
+
+        metrics = dict(config.get('metrics', {}))
+        metrics['textfile'] = self.path(metrics.get('textfile'))
+        metrics['summary_file'] = self.path(metrics.get('summary_file'))
+        # 同じポートを複数プロセスで開けないため、シャードはエンドポイントを持たない
+        metrics['http_port'] = None
+        config['metrics'] = metrics
+        return config
+
+
+class ShardSystem(EnhancedRSIAlertSystem):
+    """1シャード分の EnhancedRSIAlertSystem（通知・週次レポートは送信せず結果として集める）"""
+
+    def __init__(self, config_path, shard):
+        self.shard = shard
+        self.alerts = []
+        self.subscriber_alerts = []
+        self.weekly_data = None
+        super().__init__(config_path)
+
+    def load_config(self):
+        return self.shard.localize(super().load_config())
+
+    def apply_settings(self):
+        super().apply_settings()
+        self.symbols = self.shard.select(self.symbols)
+        self.symbol_set = set(self.symbols)
+        self.universe = self.shard.select(self.universe)
+
+    def queue_line_message(self, message):
+        """通知はコーディネーターがまとめて送信する"""
+        self.alerts.append(message)
+        return True
+
+    def queue_subscriber_message(self, subscriber_id, message):
+        self.subscriber_alerts.append([subscriber_id, message])
+        return True
+
+    def create_enhanced_weekly_report(self):
+        """週次レポートの元データのみ集める（金曜日以外は None のまま）"""
+        today = datetime.now()
+        if today.weekday() == 4:
+            self.weekly_data = self.collect_weekly_report_data(today)
+        return None
+
+    def execute(self, force=False):
+        """1回分を実行し、スプールへ書き出す結果を返す"""
+        self.alerts = []
+        self.subscriber_alerts = []
+        self.weekly_data = None
+        result = {
+            'shard': self.shard.index,
+            'count': self.shard.count,
+            'host': socket.gethostname(),
+            'started_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'symbols': len(self.symbols),
+            'error': None
+        }
+        try:
+            self.run(force=force)
+        except Exception as e:
+            logger.error(f"{self.shard.name} 実行エラー: {e}")
+            result['error'] = str(e)
+        result['alerts'] = self.alerts
+        result['subscriber_alerts'] = self.subscriber_alerts
+        if self.weekly_data is not None:
+            report_data, weekly_summary = self.weekly_data
+            result['weekly'] = {
+                'snapshots': [snapshot_to_json(data) for data in report_data],
+                'summary': weekly_summary
+            }
+        result['finished_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return result
+
+
+def snapshot_to_json(data):
+    """銘柄データをJSONに書ける型へ変換（NumPy の数値型を float に）"""
+    return {
+        key: float(value) if key in ('price', 'daily_rsi', 'weekly_rsi') and value is not None else value
+        for key, value in data.items()
+    }
+
+
+class ShardSpool:
+    def __init__(self, spool_dir):
+        """シャードの実行結果を受け渡す共有ディレクトリ（日付ごとのサブディレクトリ）"""
+        self.spool_dir = spool_dir
+
+    def run_dir(self, run_date):
+        return os.path.join(self.spool_dir, run_date)
+
+    def write(self, run_date, shard, result):
+        """結果を一時ファイルに書いてから置き換え（読み手は書き終えたファイルのみ見る）"""
+        run_dir = self.run_dir(run_date)
+        os.makedirs(run_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%H%M%S%f')
+        path = os.path.join(run_dir, f"{shard.name}-{stamp}-{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def pending(self, run_date):
+        """書き出し済みの結果ファイル [(path, result)]（シャード名・時刻順）"""
+        results = []
+        for path in sorted(glob.glob(os.path.join(self.run_dir(run_date), 'shard*.json'))):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    results.append((path, json.load(f)))
+            except (OSError, ValueError) as e:
+                logger.warning(f"シャード結果の読み込みエラー（スキップ）: {path} ({e})")
+        return results
+
+    def remove(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"シャード結果の削除エラー: {path} ({e})")
+
+
+class ShardCoordinator:
+    def __init__(self, config_path="C:\\rsi_alert\\config.json", count=None):
+        """全シャードの結果をまとめて通知・週次レポートを送る（通知・レポート済み日付は共通の履歴DBで管理）"""
+        self.system = EnhancedRSIAlertSystem(config_path)
+        sharding_config = self.system.config.get('sharding', {})
+        self.count = count or sharding_config.get('shard_count', 1)
+        self.spool = ShardSpool(sharding_config.get('spool_dir', DEFAULT_SPOOL_DIR))
+        self.wait_timeout = sharding_config.get('wait_timeout', 600)
+        self.poll_seconds = sharding_config.get('poll_seconds', 5)
+
+    def wait_for_shards(self, run_date, timeout=None):
+        """全シャードの結果が揃うまで待機（タイムアウト時は揃った分のみ返す）"""
+        timeout = self.wait_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            results = [(path, result) for path, result in self.spool.pending(run_date)
+                       if result.get('count') == self.count]
+            missing = sorted(set(range(self.count)) - {result['shard'] for _, result in results})
+            if not missing or time.monotonic() >= deadline:
+                return results, missing
+            time.sleep(self.poll_seconds)
+
+    def merge(self, run_date, results, missing):
+        """シャードの結果を1つの送信キュー・1通の週次レポートにまとめる（送信した通知数を返す）"""
+        system = self.system
+        alerts = [message for _, result in results for message in result.get('alerts', [])]
+        errors = [f"{Shard(result['shard'], self.count).name}@{result.get('host')}: {result['error']}"
+                  for _, result in results if result.get('error')]
+        if missing:
+            errors.append(f"結果未着のシャード: {', '.join(str(index) for index in missing)}")
+
+        system.start_notifiers()
+        queued = sum(1 for message in alerts if system.queue_line_message(message))
+        queued += sum(
+            1 for _, result in results for subscriber_id, message in result.get('subscriber_alerts', [])
+            if system.queue_subscriber_message(subscriber_id, message)
+        )
+
+        # 週次レポート（シャードの銘柄データと今週の集計を結合、1日1回）
+        weekly = [result['weekly'] for _, result in results if result.get('weekly')]
+        if weekly and system.history_store.get_meta('weekly_report_date') != run_date:
+            report_data = {}
+            weekly_summary = {}
+            for part in weekly:
+                report_data.update((data['symbol'], data) for data in part['snapshots'])
+                weekly_summary.update(part['summary'])
+            ordered = [report_data[symbol] for symbol in system.symbols if symbol in report_data]
+            if ordered:
+                message = system.format_weekly_report(datetime.now(), ordered, weekly_summary)
+                if system.queue_line_message(message):
+                    system.history_store.set_meta('weekly_report_date', run_date)
+                    logger.info("Enhanced週次レポート送信（シャード統合）")
+
+        if errors:
+            error_message = "⚠️ Enhanced RSIアラートシステムエラー（シャード実行）\n\n" + "\n".join(errors)
+            system.send_line_message(error_message)
+
+        system.flush_notifiers()
+        system.stop_notifiers()
+        # 送信キューへ移した結果のみ削除（待機中に届いた分は次回まとめる）
+        self.spool.remove([path for path, _ in results])
+        logger.info(f"=== シャード統合完了: {len(results)}件の結果, {queued}件のアラート送信 ===")
+        return queued
+
+    def coordinate(self, run_date=None, timeout=None):
+        run_date = run_date or datetime.now().strftime('%Y-%m-%d')
+        results, missing = self.wait_for_shards(run_date, timeout)
+        if missing:
+            logger.warning(f"シャード結果待ちタイムアウト: 未着 {missing}")
+        return self.merge(run_date, results, missing)
+
+
+def run_shard(config_path, index, count=None, force=False):
+    """1シャード分を実行し、結果をスプールへ書き出す"""
+    with open(config_path, 'r') as f:
+        sharding_config = json.load(f).get('sharding', {})
+    shard = Shard(index, count or sharding_config.get('shard_count', 1))
+    system = ShardSystem(config_path, shard)
+    logger.info(f"{shard.name}: {len(system.symbols)}銘柄を担当")
+    result = system.execute(force=force)
+    spool = ShardSpool(sharding_config.get('spool_dir', DEFAULT_SPOOL_DIR))
+    path = spool.write(datetime.now().strftime('%Y-%m-%d'), shard, result)
+    logger.info(f"{shard.name}: 結果を書き出しました ({path})")
+    return result
+
+
+def run_local(config_path, count=None, force=False):
+    """全シャードをローカルの別プロセスで実行し、結果をまとめる"""
+    coordinator = ShardCoordinator(config_path, count)
+    command = [sys.executable, os.path.join(BASE_DIR, 'sharding.py'), 'shard', '--config', config_path,
+               '--count', str(coordinator.count)]
+    if force:
+        command.append('--force')
+    processes = [subprocess.Popen(command + ['--index', str(index)]) for index in range(coordinator.count)]
+    for index, process in enumerate(processes):
+        if process.wait() != 0:
+            logger.error(f"シャード {index} が異常終了しました (終了コード {process.returncode})")
+    # 異常終了したシャードは結果が無いため待たずにまとめる
+    return coordinator.coordinate(timeout=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RSIアラートシステム シャード実行")
+    parser.add_argument('command', choices=['shard', 'coordinate', 'run'])
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    parser.add_argument('--index', type=int, default=None, help="実行するシャード番号（shard のみ）")
+    parser.add_argument('--count', type=int, default=None, help="シャード数（未指定時は sharding.shard_count）")
+    parser.add_argument('--timeout', type=float, default=None, help="結果待ちの秒数（coordinate のみ）")
+    parser.add_argument('--force', action='store_true', help="取引所カレンダーによる省略を無効化")
+    args = parser.parse_args()
+
+    if args.command == 'shard':
+        if args.index is None:
+            parser.error("shard には --index が必要です")
+        result = run_shard(args.config, args.index, args.count, args.force)
+        sys.exit(1 if result['error'] else 0)
+    elif args.command == 'coordinate':
+        ShardCoordinator(args.config, args.count).coordinate(timeout=args.timeout)
+    else:
+        run_local(args.config, args.count, args.force)
+
+
+if __name__ == "__main__":
+    main()
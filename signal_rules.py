@@ -0,0 +1,139 @@
+"""
+Enhanced RSI Alert System - シグナル判定ルールのコンパイル
+symbol_specific_settings を設定読み込み時に銘柄順のしきい値配列へ変換し、
+check_enhanced_signal() と同じ判定（日足クロス＋週足フィルター）を
+銘柄全体のブール配列でまとめて評価する。理由の文字列とログはシグナル発生・
+フィルター除外となった銘柄のみ作成する。
+"""
+
+import logging
+
+import numpy as np
+
+from backtest import effective_settings
+from indicators import compile_filters, check_indicator_filters
+from run_state import SignalRecord
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STRATEGY_NAME = 'Standard RSI'
+
+
+class SignalRules:
+    def __init__(self, symbols, symbol_settings, name=None):
+        """銘柄別設定をしきい値配列にコンパイル（設定の無い銘柄はデフォルト値の行を使う）
+
+        name: ログの先頭に付ける名前（購読者別のルール等）
+        """
+        self.log_prefix = f"[{name}] " if name else ""
+        symbols = list(dict.fromkeys(list(symbols) + list(symbol_settings)))
+        self.position = {symbol: i for i, symbol in enumerate(symbols)}
+        self.default_position = len(symbols)
+
+        # 理由の文字列は設定値をそのまま表示するため元の値も保持（末尾はデフォルト行）
+        self.settings = [effective_settings(symbol_settings.get(symbol, {})) for symbol in symbols]
+        self.settings.append(effective_settings({}))
+        self.strategy_names = [
+            symbol_settings.get(symbol, {}).get('strategy_name', DEFAULT_STRATEGY_NAME) for symbol in symbols
+        ]
+        self.strategy_names.append(DEFAULT_STRATEGY_NAME)
+        # 指標フィルター（シグナル候補になった銘柄のみに適用）
+        self.filters = [compile_filters(symbol_settings.get(symbol, {})) for symbol in symbols]
+        self.filters.append([])
+
+        def column(key):
+            return np.array([settings[key] for settings in self.settings], dtype=np.float64)
+
+        self.daily_buy = column('daily_buy_threshold')
+        self.daily_sell = column('daily_sell_threshold')
+        self.weekly_buy = column('weekly_buy_threshold')
+        self.weekly_sell = column('weekly_sell_threshold')
+        self.use_weekly = np.array([bool(settings['use_weekly_filter']) for settings in self.settings])
+
+    def indices(self, symbols):
+        return np.array([self.position.get(symbol, self.default_position) for symbol in symbols], dtype=np.intp)
+
+    def evaluate(self, rows, prev_daily, log_first_run=True):
+        """銘柄データのリストをまとめて判定（rows と同じ順のシグナル or None のリスト）
+
+        prev_daily: {symbol: 前回日足RSI}（履歴の無い銘柄は含めない＝初回実行として判定しない）
+        RSIは元の値と同じ精度で比較する（float32 のRSIはしきい値も float32 に揃える）。
+        """
+        results = [None] * len(rows)
+        if not rows:
+            return results
+
+        symbols = [row['symbol'] for row in rows]
+        has_prev = np.array([symbol in prev_daily for symbol in symbols])
+        if log_first_run:
+            for i in np.flatnonzero(~has_prev):
+                logger.info(f"{self.log_prefix}{symbols[i]}: 初回実行、シグナル判定スキップ")
+
+        idx = self.indices(symbols)
+        current = np.array([row['daily_rsi'] for row in rows])
+        if current.dtype.kind != 'f':
+            current = current.astype(np.float64)
+        has_weekly = np.array([row['weekly_rsi'] is not None for row in rows])
+        weekly = np.array([row['weekly_rsi'] if row['weekly_rsi'] is not None else np.nan for row in rows],
+                          dtype=current.dtype)
+        prev = np.array([prev_daily.get(symbol, np.nan) for symbol in symbols], dtype=np.float64)
+
+        daily_buy = self.daily_buy[idx]
+        daily_sell = self.daily_sell[idx]
+        with np.errstate(invalid='ignore'):
+            buy = has_prev & (prev > daily_buy) & (current <= daily_buy.astype(current.dtype))
+            sell = has_prev & ~buy & (prev < daily_sell) & (current >= daily_sell.astype(current.dtype))
+            # 週足RSIが無い銘柄は週足フィルターを適用しない（従来通り日足のみで判定）
+            filtered_mode = self.use_weekly[idx] & has_weekly
+            weekly_buy_ok = weekly <= self.weekly_buy[idx].astype(current.dtype)
+            weekly_sell_ok = weekly >= self.weekly_sell[idx].astype(current.dtype)
+
+        for i in np.flatnonzero(buy | sell):
+            results[i] = self._build(rows[i], idx[i], prev_daily[symbols[i]], 'BUY' if buy[i] else 'SELL',
+                                     filtered_mode[i], weekly_buy_ok[i] if buy[i] else weekly_sell_ok[i])
+        return results
+
+    def _build(self, row, position, prev_daily_rsi, signal_type, filtered_mode, weekly_ok):
+        """シグナル候補1件の理由・ログを作成（フィルター除外は None）"""
+        symbol = row['symbol']
+        current_daily_rsi = row['daily_rsi']
+        current_weekly_rsi = row['weekly_rsi']
+        settings = self.settings[position]
+        action = '買い' if signal_type == 'BUY' else '売り'
+
+        if filtered_mode:
+            threshold = settings[f'weekly_{signal_type.lower()}_threshold']
+            if not weekly_ok:
+                op = '>' if signal_type == 'BUY' else '<'
+                reason = f"Weekly RSIフィルターで除外 (Weekly RSI: {current_weekly_rsi:.1f}{op}{threshold})"
+                logger.info(f"{self.log_prefix}{symbol}: {action}シグナル候補だが{reason}")
+                return None
+            op = '≤' if signal_type == 'BUY' else '≥'
+            reason = f"Daily+Weekly条件満たす (Weekly RSI: {current_weekly_rsi:.1f}{op}{threshold})"
+        else:
+            reason = "Daily条件満たす"
+
+        if self.filters[position]:
+            passed, detail = check_indicator_filters(self.filters[position], row, signal_type)
+            if not passed:
+                logger.info(f"{self.log_prefix}{symbol}: {action}シグナル候補だが{detail}")
+                return None
+            if detail:
+                reason = f"{reason}, {detail}"
+
+        if filtered_mode:
+            logger.info(f"{self.log_prefix}{symbol}: Enhanced{action}シグナル発生 (Daily: {current_daily_rsi:.1f}, Weekly: {current_weekly_rsi:.1f})")
+        else:
+            logger.info(f"{self.log_prefix}{symbol}: Standard{action}シグナル発生 (Daily: {current_daily_rsi:.1f})")
+
+        return SignalRecord(
+            symbol=symbol,
+            signal_type=signal_type,
+            current_daily_rsi=current_daily_rsi,
+            current_weekly_rsi=current_weekly_rsi,
+            prev_daily_rsi=prev_daily_rsi,
+            price=row['price'],
+            strategy=self.strategy_names[position],
+            reason=reason,
+            use_weekly_filter=settings['use_weekly_filter']
+        )
@@ -0,0 +1,122 @@
+"""
+Enhanced RSI Alert System - 起動時の事前判定
+スケジュール実行の大半は、前回評価した日足が確定済みで次の日足がまだ存在しない回である。
+前回実行時に履歴DBへ保存した「次の日足が存在し得る時刻」（meta の next_bar_at）と現在時刻のみで
+判定し、pandas・yfinance・requests を読み込む前に終了する（標準ライブラリのみ使用）。
+ただし通知のアウトボックスに未送信・再送待ちの通知がある場合は、再送のため通常の実行へ進む。
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+
+DEFAULT_CONFIG_PATH = "C:\\rsi_alert\\config.json"
+DEFAULT_HISTORY_DB = "C:\\rsi_alert\\signals_history.sqlite"
+DEFAULT_OUTBOX_PATH = "C:\\rsi_alert\\notification_outbox.sqlite"
+LOG_FILE = 'C:\\rsi_alert\\system.log'
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging():
+    """ログ設定（ファイルと標準出力）"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Enhanced RSIアラートシステム")
+    parser.add_argument('--config', default=DEFAULT_CONFIG_PATH)
+    parser.add_argument('--force', action='store_true', help="事前判定・取引所カレンダーによる省略を無効化")
+    return parser.parse_args(argv)
+
+
+def load_config(config_path):
+    """設定ファイルを読み込む（読み込めない場合は None）"""
+    try:
+        with open(config_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_next_bar_at(config):
+    """前回実行時に保存した次の日足の時刻（未保存・読み込めない場合は None）"""
+    db_path = config.get('history', {}).get('db_path', DEFAULT_HISTORY_DB)
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = sqlite3.connect(db_path, timeout=1)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'next_bar_at'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    if not row or not row[0]:
+        return None
+    try:
+        return datetime.fromisoformat(row[0])
+    except ValueError:
+        return None
+
+
+def outbox_paths(config):
+    """全通知先のアウトボックスのパス（main.py の init_notifier() と同じ規則）"""
+    path = config.get('notification', {}).get('dispatch', {}).get('outbox_path', DEFAULT_OUTBOX_PATH)
+    root, ext = os.path.splitext(path)
+    return [path] + [
+        f"{root}.{subscriber['id']}{ext}" for subscriber in config.get('subscribers', [])
+        if subscriber.get('access_token')
+    ]
+
+
+def count_pending_notifications(config):
+    """未送信・再送待ちの通知の件数（読み込めないアウトボックスは送信待ちありとみなす）"""
+    pending = 0
+    for path in outbox_paths(config):
+        if not os.path.exists(path):
+            continue
+        try:
+            conn = sqlite3.connect(path, timeout=1)
+            try:
+                pending += conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            return None
+    return pending
+
+
+def exit_if_up_to_date(args, now=None):
+    """次の日足がまだ存在せず送信待ちの通知も無い場合はログを残して終了（判定できない場合は通常の実行へ進む）"""
+    if args.force:
+        return
+    started = time.perf_counter()
+    config = load_config(args.config)
+    if config is None:
+        return
+    next_bar_at = read_next_bar_at(config)
+    now = now or datetime.now(timezone.utc)
+    if next_bar_at is None or now >= next_bar_at:
+        return
+    # 前回実行で送り切れなかった通知は main.py の実行で再送する
+    if count_pending_notifications(config) != 0:
+        return
+    configure_logging()
+    logger.info(
+        f"新しい日足がありません（次の日足: {next_bar_at.isoformat()}）、"
+        f"{(time.perf_counter() - started) * 1000:.1f}msで判定して終了します"
+    )
+    sys.exit(0)
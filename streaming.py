@@ -0,0 +1,284 @@
+"""
+Enhanced RSI Alert System - 日中ストリーミング評価
+分足を（ポーリングまたは記録ファイルの再生で）ジェネレーターパイプラインに流し、
+足ごとに進行中の日足RSI・週足RSIを差分更新して check_enhanced_signal() の
+クロス判定を行う。銘柄ごとの状態はRSI期間分の固定長バッファのみで、
+銘柄数×時間に対してメモリは増えない。
+
+使い方:
+    python streaming.py                          # 1分ごとにポーリング
+    python streaming.py --record bars.csv        # ポーリングした分足を記録
+    python streaming.py --replay day1.csv day2.csv  # 記録ファイルを再生（オフライン検証用）
+"""
+
+import argparse
+import csv
+import heapq
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from market_data import chunk_symbols, resample_bars, YahooDataProvider, DEFAULT_CHUNK_SIZE
+from rsi_engine import StreamingRSI
+from trading_calendar import EXCHANGE_TZ
+
+logger = logging.getLogger(__name__)
+
+Bar = namedtuple('Bar', ['timestamp', 'symbol', 'close', 'volume'])
+
+BAR_FIELDS = ['timestamp', 'symbol', 'close', 'volume']
+
+
+def read_bar_file(path):
+    """記録ファイル（timestamp,symbol,close,volume の時刻順CSV）を1行ずつ読むジェネレーター"""
+    with open(path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            yield Bar(
+                datetime.fromisoformat(row['timestamp']).astimezone(EXCHANGE_TZ),
+                row['symbol'],
+                float(row['close']),
+                float(row['volume']) if row.get('volume') else 0.0
+            )
+
+
+def replay_bars(paths):
+    """複数の記録ファイルを時刻順にマージして再生（各ファイルは1行ずつしか保持しない）"""
+    return heapq.merge(*(read_bar_file(path) for path in paths), key=lambda bar: bar.timestamp)
+
+
+def record_bars(bars, path):
+    """分足を記録ファイルへ書き出しながらそのまま流すジェネレーター"""
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if f.tell() == 0:
+            writer.writerow(BAR_FIELDS)
+        for bar in bars:
+            writer.writerow([bar.timestamp.isoformat(), bar.symbol, bar.close, bar.volume])
+            f.flush()
+            yield bar
+
+
+def poll_bars(symbols, interval='1m', poll_seconds=60, chunk_size=DEFAULT_CHUNK_SIZE,
+              rate_limiter=None, stop_event=None, timeout=10, provider=None):
+    """当日の分足をポーリングし、新しい足（と更新された最新足）を順に返すジェネレーター
+
+    provider を省略した場合は Yahoo Finance から取得する（日足と同じデータプロバイダーを渡せる）。
+    """
+    provider = provider or YahooDataProvider()
+    stop_event = stop_event or threading.Event()
+    last_seen = {}
+    while not stop_event.is_set():
+        started = time.monotonic()
+        for chunk in chunk_symbols(list(symbols), chunk_size):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                frames = provider.download(chunk, period="1d", interval=interval, timeout=timeout)
+            except Exception as e:
+                logger.error(f"分足取得エラー ({len(chunk)}銘柄): {e}")
+                continue
+
+            for symbol, frame in frames.items():
+                closes = frame['Close'].dropna()
+                volumes = frame['Volume'] if 'Volume' in frame.columns else None
+                # 前回の最新足は未確定だったため同じ時刻から再送する
+                since = last_seen.get(symbol)
+                if since is not None:
+                    closes = closes[closes.index >= since]
+                for ts, close in closes.items():
+                    volume = float(volumes.get(ts, 0.0)) if volumes is not None else 0.0
+                    yield Bar(ts.to_pydatetime().astimezone(EXCHANGE_TZ), symbol, float(close), volume)
+                if not closes.empty:
+                    last_seen[symbol] = closes.index[-1]
+
+        stop_event.wait(max(0.0, poll_seconds - (time.monotonic() - started)))
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+class SymbolState:
+    """1銘柄分のストリーミング状態（固定長）"""
+
+    __slots__ = ('daily', 'weekly', 'session', 'last_close', 'last_timestamp',
+                 'pending_signal', 'pending_count', 'fired')
+
+    def __init__(self, daily, weekly, session):
+        self.daily = daily
+        self.weekly = weekly
+        self.session = session
+        self.last_close = None
+        self.last_timestamp = None
+        self.pending_signal = None
+        self.pending_count = 0
+        self.fired = set()
+
+
+class StreamingEvaluator:
+    def __init__(self, system, daily_data, confirm_bars=1):
+        """ストリーミング評価器
+
+        daily_data: {symbol: 日足DataFrame}（初回の足で状態をシードするために使用）
+        confirm_bars: シグナル条件が連続してこの本数成立したら通知（足ごとのデバウンス）
+        """
+        self.system = system
+        self.daily_data = daily_data
+        self.confirm_bars = max(1, int(confirm_bars))
+        self.states = {}
+
+    def seed(self, symbol, session):
+        """session より前の確定済み日足・週足でRSI状態を構築"""
+        daily = self.daily_data.get(symbol)
+        if daily is None or daily.empty:
+            logger.error(f"{symbol}: シード用の日足データがありません")
+            return None
+
+        daily = daily[daily.index.date < session]
+        period, smoothing = self.system.rsi_period, self.system.rsi_smoothing
+        daily_rsi = StreamingRSI.from_series(daily['Close'].dropna(), period, smoothing)
+
+        # 当週より前の確定済み週足のみ（当週は最新の足を進行中の週足終値とする）
+        completed_weeks = daily[daily.index.date < week_start(session)]
+        weekly_rsi = StreamingRSI(period, smoothing)
+        if not completed_weeks.empty:
+            weekly_rsi = StreamingRSI.from_series(resample_bars(completed_weeks, 'weekly')['Close'], period, smoothing)
+
+        return SymbolState(daily_rsi, weekly_rsi, session)
+
+    def _roll_session(self, state, session):
+        """日付が変わったら前日の終値で日足（週が変わったら週足も）を確定"""
+        if state.last_close is not None and state.session is not None:
+            state.daily.update(state.last_close, state.session.isoformat())
+            if week_start(session) != week_start(state.session):
+                state.weekly.update(state.last_close, week_start(state.session).isoformat())
+        state.session = session
+        state.pending_signal = None
+        state.pending_count = 0
+        state.fired.clear()
+
+    def on_bar(self, bar):
+        """分足1本を処理し、通知すべきシグナルがあれば返す"""
+        session = bar.timestamp.date()
+        state = self.states.get(bar.symbol)
+        if state is None:
+            state = self.seed(bar.symbol, session)
+            if state is None:
+                return None
+            self.states[bar.symbol] = state
+        elif session > state.session:
+            self._roll_session(state, session)
+        elif state.last_timestamp is not None and bar.timestamp < state.last_timestamp:
+            # 遅れて届いた古い足は無視
+            return None
+
+        new_bar = state.last_timestamp is None or bar.timestamp > state.last_timestamp
+        state.last_timestamp = bar.timestamp
+        state.last_close = bar.close
+
+        prev_daily_rsi = state.daily.value
+        current_data = {
+            'symbol': bar.symbol,
+            'price': bar.close,
+            'daily_rsi': state.daily.peek(bar.close),
+            'weekly_rsi': state.weekly.peek(bar.close),
+            # 履歴と同じく前日RSIは小数第1位に丸めた値で比較
+            'prev_daily_rsi': round(prev_daily_rsi, 1) if not math.isnan(prev_daily_rsi) else prev_daily_rsi,
+            'date': bar.timestamp.strftime('%Y-%m-%d'),
+            'bar_date': session.isoformat()
+        }
+        signal = self.system.check_enhanced_signal(current_data)
+        return self._debounce(state, signal, new_bar, current_data)
+
+    def _debounce(self, state, signal, new_bar, current_data):
+        """条件が confirm_bars 本連続で成立したら1日1回だけ通知"""
+        if signal is None:
+            state.pending_signal = None
+            state.pending_count = 0
+            return None
+
+        signal_type = signal['signal_type']
+        if signal_type in state.fired:
+            return None
+        if state.pending_signal != signal_type:
+            state.pending_signal = signal_type
+            state.pending_count = 0
+        if new_bar:
+            state.pending_count += 1
+        if state.pending_count < self.confirm_bars:
+            return None
+
+        state.fired.add(signal_type)
+        signal['current_data'] = current_data
+        return signal
+
+    def process(self, bars):
+        """分足のストリームを評価し、通知すべきシグナルを順に返すジェネレーター"""
+        for bar in bars:
+            signal = self.on_bar(bar)
+            if signal is not None:
+                yield signal
+
+
+def run_stream(system, bars, daily_data, confirm_bars=1):
+    """ストリーミング評価を実行し、シグナルを通知・履歴保存（バー単位で重複通知しない）"""
+    evaluator = StreamingEvaluator(system, daily_data, confirm_bars)
+    system.notifier.start()
+    signals_sent = 0
+    try:
+        for signal in evaluator.process(bars):
+            current_data = signal.pop('current_data')
+            symbol, bar_date = signal['symbol'], current_data['bar_date']
+            if system.history_store.get_signal(symbol, bar_date) == signal['signal_type']:
+                logger.info(f"{symbol}: {bar_date}の{signal['signal_type']}シグナルは通知済み")
+                continue
+            if system.queue_line_message(system.create_enhanced_alert_message(signal)):
+                signals_sent += 1
+            system.save_enhanced_history(current_data, signal)
+    finally:
+        system.notifier.flush(system.notify_flush_timeout)
+        if not system.resident:
+            system.notifier.stop()
+    logger.info(f"=== ストリーミング評価終了: {signals_sent}件のアラート送信 ===")
+    return signals_sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日中ストリーミング評価")
+    parser.add_argument('--config', default="C:\\rsi_alert\\config.json")
+    parser.add_argument('--replay', nargs='*', default=None)
+    parser.add_argument('--record', default=None)
+    args = parser.parse_args()
+
+    from main import EnhancedRSIAlertSystem
+
+    system = EnhancedRSIAlertSystem(args.config)
+    streaming_config = system.config.get('streaming', {})
+    daily_data = system.prefetch_daily_data()
+
+    if args.replay:
+        bars = replay_bars(args.replay)
+    else:
+        bars = poll_bars(
+            system.symbols,
+            interval=streaming_config.get('interval', '1m'),
+            poll_seconds=streaming_config.get('poll_seconds', 60),
+            chunk_size=system.fetch_chunk_size,
+            rate_limiter=system.rate_limiter,
+            timeout=system.fetch_timeout,
+            provider=system.data_provider
+        )
+    if args.record:
+        bars = record_bars(bars, args.record)
+
+    try:
+        run_stream(system, bars, daily_data, streaming_config.get('confirm_bars', 1))
+    except KeyboardInterrupt:
+        logger.info("ストリーミング評価を停止しました")
+
+
+if __name__ == "__main__":
+    main()
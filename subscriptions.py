@@ -0,0 +1,89 @@
+"""
+Enhanced RSI Alert System - 購読者別ウォッチリスト
+複数の購読者（チーム）がそれぞれの銘柄・しきい値と通知先を登録する。
+日足取得とRSI計算は全購読者の銘柄の和集合について1回だけ行い、
+銘柄→購読者の逆引きインデックスで各購読者のルールを共有の計算結果に適用する。
+
+設定例（config.json）:
+    "subscribers": [
+      {"id": "semis", "access_token": "...", "symbols": ["SOXL", "SMH"],
+       "symbol_specific_settings": {"SOXL": {"daily_buy_threshold": 30}}}
+    ]
+"""
+
+import logging
+import re
+
+from signal_rules import SignalRules
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class Subscriber:
+    __slots__ = ('subscriber_id', 'symbols', 'symbol_settings', 'access_token', 'endpoint', 'rules')
+
+    def __init__(self, subscriber_id, symbols, symbol_settings=None, access_token=None, endpoint=None):
+        """購読者（access_token が無い場合は既定の通知先へ送る）"""
+        if not SUBSCRIBER_ID_PATTERN.match(subscriber_id):
+            raise ValueError(f"購読者IDに使えない文字が含まれています: {subscriber_id}")
+        self.subscriber_id = subscriber_id
+        self.symbols = list(dict.fromkeys(symbols))
+        self.symbol_settings = symbol_settings or {}
+        self.access_token = access_token
+        self.endpoint = endpoint
+        self.rules = SignalRules(self.symbols, self.symbol_settings, name=subscriber_id)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['id'],
+            config.get('symbols', []),
+            symbol_settings=config.get('symbol_specific_settings', {}),
+            access_token=config.get('access_token'),
+            endpoint=config.get('endpoint')
+        )
+
+
+class SubscriptionIndex:
+    def __init__(self, subscribers):
+        """購読者の一覧と銘柄→購読者IDの逆引きインデックス"""
+        self.subscribers = {}
+        self.by_symbol = {}
+        for subscriber in subscribers:
+            if subscriber.subscriber_id in self.subscribers:
+                raise ValueError(f"購読者IDが重複しています: {subscriber.subscriber_id}")
+            self.subscribers[subscriber.subscriber_id] = subscriber
+            for symbol in subscriber.symbols:
+                self.by_symbol.setdefault(symbol, []).append(subscriber.subscriber_id)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls([Subscriber.from_config(entry) for entry in config])
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def get(self, subscriber_id):
+        return self.subscribers.get(subscriber_id)
+
+    def symbols(self):
+        """全購読者の銘柄（重複なし、登録順）"""
+        return list(self.by_symbol)
+
+    def evaluate(self, rows, prev_daily):
+        """共有の銘柄データに各購読者のルールを適用（[(購読者, 銘柄データ, シグナル)]）"""
+        rows_by_subscriber = {}
+        for row in rows:
+            for subscriber_id in self.by_symbol.get(row['symbol'], ()):
+                rows_by_subscriber.setdefault(subscriber_id, []).append(row)
+
+        fired = []
+        for subscriber_id, subscriber_rows in rows_by_subscriber.items():
+            subscriber = self.subscribers[subscriber_id]
+            signals = subscriber.rules.evaluate(subscriber_rows, prev_daily, log_first_run=False)
+            fired.extend(
+                (subscriber, row, signal) for row, signal in zip(subscriber_rows, signals) if signal
+            )
+        return fired
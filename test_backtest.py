@@ -0,0 +1,110 @@
+"""
+Enhanced RSI Alert System - バックテストのテスト
+合成データで、実行時と同じRSI（各日までの直近6ヶ月分の日足から計算）・指標フィルターで売買していることを確認
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from backtest import (BacktestCache, backtest_close, evaluate_codes, evaluate_performance, replay_signals,
+                      run_backtests, settings_hash, signal_codes, trailing_rsi, window_starts)
+from benchmark import SyntheticDataProvider, make_config
+from indicators import check_indicator_filters, compile_filters
+from main import EnhancedRSIAlertSystem
+
+SETTINGS = {'daily_buy_threshold': 40, 'daily_sell_threshold': 60, 'use_weekly_filter': True,
+            'weekly_buy_threshold': 50, 'weekly_sell_threshold': 50}
+INDICATORS = {
+    'bb_percent_b': {'type': 'bollinger_percent_b', 'period': 20, 'num_std': 2},
+    'stoch_rsi': {'type': 'stoch_rsi', 'period': 14, 'k': 3},
+}
+FILTERED = dict(SETTINGS, indicator_filters=[
+    {'indicator': 'bb_percent_b', 'timeframe': 'daily', 'signal': 'BUY', 'op': '<=', 'value': 0.0},
+    {'indicator': 'stoch_rsi', 'timeframe': 'daily', 'signal': 'SELL', 'op': '>=', 'value': 0.5},
+])
+
+
+@pytest.fixture
+def system(tmp_path):
+    config_path = make_config(str(tmp_path), ['AAA'], 'http://127.0.0.1:9/')
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    config['rsi']['smoothing'] = 'wilder'
+    config['indicators'] = INDICATORS
+    config['symbol_specific_settings'] = {'AAA': FILTERED}
+    # 既定と異なるしきい値で AAA を購読し、購読者のみの銘柄 BBB も持つ購読者
+    config['subscribers'] = [{'id': 'sub1', 'symbols': ['AAA', 'BBB'],
+                              'symbol_specific_settings': {'AAA': SETTINGS, 'BBB': SETTINGS}}]
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    system = EnhancedRSIAlertSystem(config_path)
+    yield system
+    system.history_store.close()
+
+
+def test_backtest_trades_on_live_rsi(system):
+    """Wilder平滑化でも、各日に get_stock_data() が算出するRSIで判定した成績と一致する"""
+    close = SyntheticDataProvider(years=2).download(['AAA'], period='2y')['AAA']['Close']
+    first = window_starts(close.index)
+    daily, weekly = [], []
+    for position in range(len(close)):
+        daily_hist = close.iloc[first[position]:position + 1].to_frame('Close')
+        daily_rsi, weekly_rsi, _ = system.calculate_symbol_rsi('AAA', daily_hist)
+        daily.append(daily_rsi)
+        weekly.append(weekly_rsi)
+    live = replay_signals(pd.Series(daily, index=close.index, dtype=float),
+                          pd.Series(weekly, index=close.index, dtype=float), SETTINGS)
+
+    expected = evaluate_performance(close, live)
+    assert expected['trades'] > 0
+    assert backtest_close(close, SETTINGS, system.rsi_period, 'wilder') == expected
+
+
+def test_settings_hash_covers_indicator_filters():
+    base = settings_hash(FILTERED, 14, 'sma', 10, INDICATORS)
+    assert base != settings_hash(SETTINGS, 14, 'sma', 10, INDICATORS)
+    changed_filter = dict(FILTERED, indicator_filters=[dict(FILTERED['indicator_filters'][0], value=0.2)])
+    assert base != settings_hash(changed_filter, 14, 'sma', 10, INDICATORS)
+    # 参照している指標の定義の変更は反映し、参照していない指標の定義は影響しない
+    redefined = dict(INDICATORS, bb_percent_b={'type': 'bollinger_percent_b', 'period': 30, 'num_std': 2})
+    assert base != settings_hash(FILTERED, 14, 'sma', 10, redefined)
+    assert base == settings_hash(FILTERED, 14, 'sma', 10, dict(INDICATORS, macd_hist={'type': 'macd'}))
+
+
+def test_backtest_applies_indicator_filters(system):
+    """指標フィルターで除外される候補日は売買しない（指標は get_stock_data() と同じ値で判定）"""
+    close = SyntheticDataProvider(years=2).download(['AAA'], period='2y')['AAA']['Close']
+    daily_rsi, weekly_rsi = trailing_rsi(close, system.rsi_period, 'wilder')
+    codes = signal_codes(daily_rsi.to_numpy(), weekly_rsi.to_numpy(), SETTINGS)
+
+    first = window_starts(close.index)
+    filters = compile_filters(FILTERED)
+    expected = codes.copy()
+    for position in codes.nonzero()[0]:
+        data = system.get_stock_data('AAA', close.iloc[first[position]:position + 1].to_frame('Close'))
+        passed, _ = check_indicator_filters(filters, data, 'BUY' if codes[position] == 1 else 'SELL')
+        expected[position] = codes[position] if passed else 0
+    assert (expected != codes).any()
+
+    stats = backtest_close(close, FILTERED, system.rsi_period, 'wilder', engine=system.indicator_engine)
+    assert stats == evaluate_codes(close, expected)
+    assert stats != backtest_close(close, SETTINGS, system.rsi_period, 'wilder')
+
+
+def test_backtests_cover_subscriber_settings(system):
+    """購読者のしきい値・購読者のみの銘柄も設定ごとに算出し、既定設定の結果を上書きしない"""
+    system.data_provider = SyntheticDataProvider(years=2)
+    results = run_backtests(system)
+    assert len(results) == 3
+
+    default = system.get_backtest_stats('AAA')
+    custom = system.get_backtest_stats('AAA', SETTINGS)
+    assert default is not None and custom is not None and default != custom
+    assert system.get_backtest_stats('BBB', SETTINGS) is not None
+    assert system.get_backtest_stats('BBB') is None
+
+    reloaded = BacktestCache(system.backtest_cache.path)
+    key = settings_hash(SETTINGS, system.rsi_period, system.rsi_smoothing, system.backtest_years, INDICATORS)
+    assert reloaded.get('AAA', key) == custom
@@ -0,0 +1,58 @@
+"""
+Enhanced RSI Alert System - 価格キャッシュのテスト
+合成データ（benchmark.SyntheticDataProvider）でネットワークを使わずに確認
+"""
+
+import os
+import time
+
+import pandas as pd
+
+from bar_cache import BarCache, period_to_days
+from benchmark import SyntheticDataProvider
+from market_data import fetch_daily_bars_cached
+
+
+def test_long_history_does_not_leak_into_daily_period(tmp_path):
+    """バックテスト用に長期間を取得した後も、日次判定には period 分のみを返す"""
+    cache = BarCache(str(tmp_path))
+    provider = SyntheticDataProvider(years=3)
+
+    long_frames = fetch_daily_bars_cached(['AAA'], cache, period='2y', provider=provider)
+    daily_frames = fetch_daily_bars_cached(['AAA'], cache, period='6mo', provider=provider)
+
+    frame = daily_frames['AAA']
+    assert len(frame) < len(long_frames['AAA'])
+    assert frame.index[-1] - frame.index[0] < pd.Timedelta(days=period_to_days('6mo'))
+    assert frame.index[-1] == long_frames['AAA'].index[-1]
+
+
+def test_incremental_updates_keep_only_the_cached_period(tmp_path):
+    """差分取得を重ねても、キャッシュには全取得時の期間分のバーのみが残る"""
+    cache = BarCache(str(tmp_path))
+    provider = SyntheticDataProvider(years=1)
+    end_date = provider.end_date
+    provider.end_date = end_date - pd.Timedelta(days=120)
+    fetch_daily_bars_cached(['AAA'], cache, period='6mo', provider=provider)
+
+    for days in (90, 60, 30, 0):
+        provider.end_date = end_date - pd.Timedelta(days=days)
+        frame = fetch_daily_bars_cached(['AAA'], cache, period='6mo', provider=provider)['AAA']
+
+    cache.memory.clear()
+    stored = cache.load('AAA')
+    assert stored.index[-1] == frame.index[-1]
+    assert stored.index[-1] - stored.index[0] < pd.Timedelta(days=period_to_days('6mo'))
+
+
+def test_evict_expired_removes_stale_files(tmp_path):
+    """max_age_days を過ぎたキャッシュファイルのみ削除する"""
+    cache = BarCache(str(tmp_path), max_age_days=30)
+    provider = SyntheticDataProvider(years=1)
+    fetch_daily_bars_cached(['AAA', 'BBB'], cache, period='6mo', provider=provider)
+    stale = time.time() - 31 * 86400
+    os.utime(cache._path('AAA', '1d'), (stale, stale))
+
+    assert cache.evict_expired() == 1
+    assert not os.path.exists(cache._path('AAA', '1d'))
+    assert os.path.exists(cache._path('BBB', '1d'))
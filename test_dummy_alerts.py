@@ -10,6 +10,8 @@ import logging
 from datetime import datetime
 import requests
 
+from backtest import BacktestCache, settings_hash, format_performance_info, DEFAULT_YEARS
+
 # ログ設定
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -23,6 +25,9 @@ class DummyAlertTester:
         self.access_token = self.config['notification']['line']['access_token']
         self.symbol_settings = self.config.get('symbol_specific_settings', {})
         self.history_file = "C:\\rsi_alert\\signals_history.csv"
+        self.backtest_cache = BacktestCache(
+            self.config.get('backtest', {}).get('cache_file', "C:\\rsi_alert\\backtest_cache.json")
+        )
         
         logger.info("ダミーアラートテスター初期化完了")
     
@@ -124,13 +129,12 @@ class DummyAlertTester:
                     weekly_info += f" ({threshold}以上: ✅)"
             weekly_info += "\n"
         
-        # 期待パフォーマンス情報
-        if symbol == 'TECL' and use_weekly_filter:
-            performance_info = "過去勝率: 100%\n期待年率: 49.4%"
-        elif symbol == 'SOXL':
-            performance_info = "過去勝率: 81.8%\n期待年率: 34.3%"
-        else:
-            performance_info = "過去勝率: 78.6%\n期待年率: 46.1%"
+        # 期待パフォーマンス情報（現在の設定でのバックテスト結果）
+        key = settings_hash(self.symbol_settings.get(symbol, {}), self.config['rsi_period'],
+                            self.config.get('rsi', {}).get('smoothing', 'sma'),
+                            self.config.get('backtest', {}).get('years', DEFAULT_YEARS),
+                            self.config.get('indicators'))
+        performance_info = format_performance_info(self.backtest_cache.get(symbol, key))
         
         # 設定値取得
         settings = self.symbol_settings.get(symbol, {})
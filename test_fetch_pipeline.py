@@ -0,0 +1,44 @@
+"""
+Enhanced RSI Alert System - 並列データ取得パイプラインのテスト
+タスクのタイムアウトが、待機の打ち切りだけでなく実行中の取得（通信タイムアウト・リトライ）にも適用されることを確認
+"""
+
+import time
+
+from fetch_pipeline import FetchPipeline
+
+
+def test_timeout_is_passed_to_fetch_and_stops_retries():
+    calls = []
+
+    def fetch(symbols, timeout):
+        calls.append(timeout)
+        time.sleep(0.2)
+        return {}
+
+    pipeline = FetchPipeline(fetch, max_workers=1, max_retries=50, base_delay=0.3, max_delay=0.3,
+                             task_timeout=1.0, request_timeout=30.0)
+    started = time.monotonic()
+    frames, failed = pipeline._fetch_with_retry(['AAA', 'BBB'])
+
+    assert frames == {} and failed == ['AAA', 'BBB']
+    # タスクのタイムアウト後はリトライしない
+    assert time.monotonic() - started < 1.5
+    assert 1 <= len(calls) < 5
+    # 通信タイムアウトはタスクの残り時間以下
+    assert all(timeout <= 1.0 for timeout in calls)
+    assert calls == sorted(calls, reverse=True)
+
+
+def test_request_timeout_without_task_timeout():
+    calls = []
+
+    def fetch(symbols, timeout):
+        calls.append(timeout)
+        return {symbol: symbol for symbol in symbols}
+
+    pipeline = FetchPipeline(fetch, task_timeout=None, request_timeout=30.0)
+    chunks = list(pipeline.iter_results(['AAA', 'BBB', 'CCC'], chunk_size=2))
+
+    assert sorted(symbol for _, frames in chunks for symbol in frames) == ['AAA', 'BBB', 'CCC']
+    assert calls == [30.0, 30.0]
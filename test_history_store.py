@@ -0,0 +1,80 @@
+"""
+Enhanced RSI Alert System - 履歴ストアのテスト
+同一バーの再保存（上書き・シグナルの保持）と旧形式CSVの移行を確認
+"""
+
+import csv
+
+import pytest
+
+from benchmark import make_config
+from history_store import HISTORY_COLUMNS, HistoryStore
+from main import EnhancedRSIAlertSystem
+from run_state import SignalRecord, SymbolSnapshot
+
+
+@pytest.fixture
+def system(tmp_path):
+    system = EnhancedRSIAlertSystem(make_config(str(tmp_path), ['TECL'], 'http://127.0.0.1:9/'))
+    yield system
+    system.history_store.close()
+
+
+def snapshot(bar_date, price, daily_rsi, weekly_rsi=48.0):
+    return SymbolSnapshot('TECL', price, daily_rsi, weekly_rsi, '2025-08-04', bar_date)
+
+
+def history(store):
+    columns, rows = store.query()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def test_same_bar_saved_twice_is_one_row(system):
+    """同じバーを再評価しても1行のまま、前回RSIは前のバーの値、送信済みのシグナルは残る"""
+    store = system.history_store
+    assert system.save_enhanced_history(snapshot('2025-08-01', 40.0, 36.04))
+
+    signal = SignalRecord(symbol='TECL', signal_type='BUY', current_daily_rsi=31.2, current_weekly_rsi=48.0,
+                          prev_daily_rsi=36.0, price=42.15, strategy='Enhanced RSI', reason='Daily条件満たす',
+                          use_weekly_filter=True)
+    assert system.save_enhanced_history(snapshot('2025-08-04', 42.15, 31.2), signal)
+    # 同じバーの再実行（シグナルなし、価格・RSIは更新）
+    assert system.save_enhanced_history(snapshot('2025-08-04', 42.5, 32.04))
+
+    rows = history(store)
+    assert len(rows) == 2
+    latest = rows[-1]
+    assert (latest['date'], latest['price'], latest['daily_rsi']) == ('2025-08-04', 42.5, 32.0)
+    assert (latest['signal_type'], latest['strategy'], latest['reason']) == ('BUY', 'Enhanced RSI', 'Daily条件満たす')
+    assert latest['prev_daily_rsi'] == 36.0
+    assert store.get_latest('TECL')['daily_rsi'] == 32.0
+    assert store.get_signal('TECL', '2025-08-04') == 'BUY'
+
+
+def test_csv_migration_runs_once(tmp_path):
+    csv_path = tmp_path / 'signals_history.csv'
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=HISTORY_COLUMNS)
+        writer.writeheader()
+        writer.writerow({'date': '2025-08-01', 'symbol': 'SOXL', 'price': '28.4', 'daily_rsi': '30.8',
+                         'weekly_rsi': 'None', 'signal_type': 'BUY', 'strategy': 'Standard RSI',
+                         'reason': 'Daily条件満たす', 'prev_daily_rsi': '36.4'})
+        writer.writerow({'date': '2025-08-04', 'symbol': 'SOXL', 'price': '29.1', 'daily_rsi': 'nan',
+                         'weekly_rsi': '', 'signal_type': 'NONE', 'strategy': 'N/A',
+                         'reason': 'No signal', 'prev_daily_rsi': 'N/A'})
+        writer.writerow({'date': '2025-08-05', 'symbol': 'SOXL', 'price': 'bad', 'daily_rsi': '31',
+                         'weekly_rsi': '', 'signal_type': 'NONE', 'strategy': 'N/A',
+                         'reason': 'No signal', 'prev_daily_rsi': ''})
+
+    store = HistoryStore(str(tmp_path / 'history.sqlite'))
+    try:
+        assert store.migrate_from_csv(str(csv_path)) == 2
+        assert store.migrate_from_csv(str(csv_path)) == 0
+
+        rows = history(store)
+        assert [row['date'] for row in rows] == ['2025-08-01', '2025-08-04']
+        assert rows[0]['weekly_rsi'] is None and rows[0]['signal_type'] == 'BUY'
+        assert rows[1]['daily_rsi'] is None and rows[1]['prev_daily_rsi'] is None
+        assert store.get_latest('SOXL')['date'] == '2025-08-04'
+    finally:
+        store.close()
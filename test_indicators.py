@@ -0,0 +1,83 @@
+"""
+Enhanced RSI Alert System - 指標エンジンのテスト
+判定用に計算したRSI系列を中間値として共有しても、指標エンジン単独で計算した値と一致することを確認
+"""
+
+import json
+import math
+
+import pytest
+
+import indicators
+from benchmark import SyntheticDataProvider, make_config
+from main import EnhancedRSIAlertSystem
+
+INDICATORS = {
+    'stoch_rsi': {'type': 'stoch_rsi', 'period': 14, 'k': 3},
+    'rsi_divergence': {'type': 'rsi_divergence', 'lookback': 5},
+    'macd_hist': {'type': 'macd', 'fast': 12, 'slow': 26, 'signal': 9, 'output': 'hist'},
+}
+FILTERS = [
+    {'indicator': 'stoch_rsi', 'timeframe': 'daily', 'signal': 'BUY', 'op': '<=', 'value': 0.2},
+    {'indicator': 'rsi_divergence', 'timeframe': 'weekly', 'signal': 'SELL', 'op': '<=', 'value': 0},
+    {'indicator': 'macd_hist', 'timeframe': 'daily', 'signal': 'SELL', 'op': '<', 'value': 0},
+]
+SYMBOLS = ['AAA', 'BBB', 'CCC']
+
+
+@pytest.fixture(params=['sma', 'wilder'])
+def system(tmp_path, request):
+    config_path = make_config(str(tmp_path), SYMBOLS, 'http://127.0.0.1:9/')
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    config['rsi']['smoothing'] = request.param
+    config['indicators'] = INDICATORS
+    config['symbol_specific_settings'] = {'AAA': {'indicator_filters': FILTERS}}
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    system = EnhancedRSIAlertSystem(config_path)
+    yield system
+    system.history_store.close()
+
+
+def daily_frames():
+    """取引日が銘柄ごとに異なる日足（価格行列に欠損を含める）"""
+    frames = SyntheticDataProvider(years=1).download(SYMBOLS, period='1y')
+    frames['BBB'] = frames['BBB'].iloc[::2]
+    frames['CCC'] = frames['CCC'].iloc[40:-3]
+    return frames
+
+
+def assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for timeframe, values in expected.items():
+        for name, value in values.items():
+            assert math.isclose(actual[timeframe][name], value, rel_tol=1e-9, abs_tol=1e-9) or (
+                math.isnan(value) and math.isnan(actual[timeframe][name])
+            ), (timeframe, name)
+
+
+def test_rsi_timeframes(system):
+    assert system.indicator_rsi_timeframes == {'daily', 'weekly'}
+    engine = system.indicator_engine
+    assert engine.rsi_timeframes({('weekly', 'macd_hist')}) == set()
+
+
+def test_shared_rsi_series_gives_same_indicators(system, monkeypatch):
+    """一括計算したRSI系列を共有した指標値が単独計算と一致し、価格差分は再計算しない"""
+    frames = daily_frames()
+    expected = {symbol: system.indicator_engine.evaluate(frame, system.indicator_needs)
+                for symbol, frame in frames.items()}
+
+    def fail(ctx):
+        raise AssertionError("価格差分を再計算しています")
+
+    monkeypatch.setitem(indicators.INTERMEDIATES, 'delta', fail)
+    rsi_values = system.compute_universe_rsi(frames)
+    for symbol, frame in frames.items():
+        data = system.get_stock_data(symbol, frame, rsi_values[symbol])
+        assert_same(data['indicators'], expected[symbol])
+        # 最新RSIは従来の latest_rsi_matrix() と同じ値
+        daily_rsi, weekly_rsi, _ = system.calculate_symbol_rsi(symbol, frame)
+        assert math.isclose(data['daily_rsi'], daily_rsi, rel_tol=1e-9)
+        assert math.isclose(data['weekly_rsi'], weekly_rsi, rel_tol=1e-9)
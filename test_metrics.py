@@ -0,0 +1,23 @@
+"""
+Enhanced RSI Alert System - メトリクスのテスト
+ラベル値の型が混在しても出力できることを確認
+"""
+
+from metrics import Metrics
+
+
+def test_render_with_mixed_label_types():
+    """HTTPステータス（int）と 'error'（str）のラベルが混在しても出力できる"""
+    metrics = Metrics(enabled=True)
+    metrics.begin_run()
+    metrics.inc('line_requests_total', status=200)
+    metrics.inc('line_requests_total', status='error')
+    metrics.inc('line_requests_total', status='200')
+
+    text = metrics.render()
+    assert 'rsi_alert_line_requests_total{status="200"} 2' in text
+    assert 'rsi_alert_line_requests_total{status="error"} 1' in text
+
+    summary = metrics.run_summary()
+    assert summary['counters']['line_requests_total{status="200"}'] == 2
+    assert summary['counters']['line_requests_total{status="error"}'] == 1
@@ -0,0 +1,86 @@
+"""
+Enhanced RSI Alert System - 通知ディスパッチャーのテスト
+LINE API 呼び出し（post）を差し替えてアウトボックスの状態を確認
+"""
+
+from datetime import datetime, timedelta
+
+from benchmark import LineStub, make_config
+from main import EnhancedRSIAlertSystem
+from notifier import LineNotifier, Outbox
+
+
+class ScriptedNotifier(LineNotifier):
+    """'BAD' を含むメッセージがあると400を返す送信（受け取ったバッチを記録）"""
+
+    def __init__(self, outbox):
+        super().__init__('token', outbox)
+        self.batches = []
+
+    def post(self, texts):
+        self.batches.append(list(texts))
+        if any('BAD' in text for text in texts):
+            return False, False, None, '400 - invalid message'
+        return True, False, None, None
+
+
+def statuses(outbox):
+    return dict(outbox.conn.execute("SELECT text, status FROM outbox").fetchall())
+
+
+def test_non_retryable_batch_failure_resends_one_by_one(tmp_path):
+    """不正なメッセージ1件でまとめた他の通知が失敗扱いにならない"""
+    outbox = Outbox(str(tmp_path / 'outbox.sqlite'))
+    for text in ['alert-1', 'BAD', 'alert-2', 'alert-3']:
+        outbox.enqueue(text)
+    notifier = ScriptedNotifier(outbox)
+
+    notifier.flush_due()
+
+    assert statuses(outbox) == {'alert-1': 'sent', 'BAD': 'failed', 'alert-2': 'sent', 'alert-3': 'sent'}
+    assert notifier.batches[0] == ['alert-1', 'BAD', 'alert-2', 'alert-3']
+    assert notifier.batches[1:] == [['alert-1'], ['BAD'], ['alert-2'], ['alert-3']]
+
+
+def test_single_message_failure_is_not_resent(tmp_path):
+    """1件のみのバッチは送り直さずに失敗とする"""
+    outbox = Outbox(str(tmp_path / 'outbox.sqlite'))
+    outbox.enqueue('BAD')
+    notifier = ScriptedNotifier(outbox)
+
+    notifier.flush_due()
+
+    assert statuses(outbox) == {'BAD': 'failed'}
+    assert notifier.batches == [['BAD']]
+
+
+def test_purge_sent_keeps_recent_and_unsent(tmp_path):
+    """保持期間を過ぎた送信済みの通知のみ削除する"""
+    outbox = Outbox(str(tmp_path / 'outbox.sqlite'))
+    old_sent, recent_sent, old_pending = (outbox.enqueue(text) for text in ['old', 'recent', 'pending'])
+    outbox.mark_sent([old_sent, recent_sent])
+    old = (datetime.now() - timedelta(days=31)).strftime('%Y-%m-%d %H:%M:%S')
+    with outbox.conn:
+        outbox.conn.execute("UPDATE outbox SET created_at = ? WHERE id IN (?, ?)", (old, old_sent, old_pending))
+
+    outbox.purge_sent(30)
+
+    assert statuses(outbox) == {'recent': 'sent', 'pending': 'pending'}
+
+
+def test_skipped_run_sends_pending_outbox(tmp_path, monkeypatch):
+    """新しい日足が無く実行を省略する場合も、前回実行の未送信分は送る"""
+    with LineStub() as stub:
+        system = EnhancedRSIAlertSystem(make_config(str(tmp_path), ['AAA'], stub.url))
+        try:
+            system.notifier.outbox.enqueue('alert-1')
+            monkeypatch.setattr(system, 'has_new_bar', lambda: False)
+
+            system.run()
+
+            assert stub.messages == 1
+            assert statuses(system.notifier.outbox) == {'alert-1': 'sent'}
+        finally:
+            system.stop_notifiers()
+            system.notifier.outbox.close()
+            system.history_store.close()
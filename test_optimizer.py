@@ -0,0 +1,39 @@
+"""
+Enhanced RSI Alert System - しきい値グリッドサーチのテスト
+ワーカーで評価した成績がバックテスト（実行時と同じRSI）と一致し、取引の無い組み合わせを勝率で選ばないことを確認
+"""
+
+import math
+
+from backtest import backtest_close
+from benchmark import SyntheticDataProvider
+from optimizer import optimize, score
+
+GRID = {
+    'rsi_period': [10, 14],
+    'daily_buy_threshold': [35, 40],
+    'daily_sell_threshold': [60, 65],
+    'use_weekly_filter': [False, True],
+    'weekly_buy_threshold': [50],
+    'weekly_sell_threshold': [50],
+}
+
+
+def test_optimizer_matches_backtest():
+    daily_data = SyntheticDataProvider(years=2).download(['AAA', 'BBB'], period='2y')
+    best, best_period, period_scores = optimize(daily_data, ['AAA', 'BBB'], grid=GRID, workers=2,
+                                                min_trades=1, smoothing='wilder')
+
+    assert best_period in GRID['rsi_period'] and set(period_scores) == set(GRID['rsi_period'])
+    for symbol, result in best.items():
+        assert result['rsi_period'] == best_period
+        expected = backtest_close(daily_data[symbol]['Close'], result['settings'], best_period, 'wilder')
+        for key, value in result['stats'].items():
+            assert math.isclose(value, expected[key], rel_tol=1e-9) if value is not None \
+                else expected[key] is None, (symbol, key)
+
+
+def test_win_rate_without_closed_trades_is_not_selected():
+    stats = {'trades': 5, 'win_rate': None, 'cagr': 0.0, 'max_drawdown': 0.0}
+    assert score(stats, 'win_rate', 3) == float('-inf')
+    assert score(dict(stats, win_rate=0.0), 'win_rate', 3) > score(stats, 'win_rate', 3)
@@ -0,0 +1,110 @@
+"""
+Enhanced RSI Alert System - 履歴の再生のテスト
+合成データで各営業日に run() を実行した履歴と、replay_history() で埋め戻した履歴が一致することを確認
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+from benchmark import LineStub, SyntheticDataProvider, make_config
+from history_archive import compact_history, load_history
+from main import EnhancedRSIAlertSystem
+from replay import replay_history
+
+SYMBOLS = ['AAA', 'BBB', 'CCC', 'DDD', 'EEE']
+# シグナル・週足フィルター除外が期間内に発生するよう広めのしきい値
+SYMBOL_SETTINGS = {
+    symbol: {'daily_buy_threshold': 45, 'daily_sell_threshold': 55, 'use_weekly_filter': symbol != 'EEE',
+             'weekly_buy_threshold': 50, 'weekly_sell_threshold': 50, 'strategy_name': 'Enhanced RSI'}
+    for symbol in SYMBOLS
+}
+DAYS = 25
+
+
+def build_system(work_dir, line_url, smoothing, provider):
+    work_dir.mkdir()
+    config_path = make_config(str(work_dir), SYMBOLS, line_url)
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    config['rsi']['smoothing'] = smoothing
+    config['cache']['enabled'] = False
+    # 期間の行がアーカイブへ移されないよう保持期間の整理は無効
+    config['history']['retention_days'] = 0
+    config['symbol_specific_settings'] = SYMBOL_SETTINGS
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    system = EnhancedRSIAlertSystem(config_path)
+    system.data_provider = provider
+    return system
+
+
+def history(system):
+    columns, rows = system.history_store.query()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+@pytest.mark.parametrize('smoothing', ['sma', 'wilder'])
+def test_replay_matches_daily_runs(tmp_path, smoothing):
+    provider = SyntheticDataProvider(years=2, end_date='2025-06-30')
+    # 合成系列は最初に参照した時点の end_date までしか作られないため、最終日で作成しておく
+    provider.download(SYMBOLS)
+    days = provider.frames['AAA'].index
+    days = days[days <= pd.Timestamp('2025-06-30', tz=provider.tz)][-DAYS:]
+
+    with LineStub() as stub:
+        live = build_system(tmp_path / 'live', stub.url, smoothing, provider)
+        replayed = build_system(tmp_path / 'replay', stub.url, smoothing, provider)
+        try:
+            for day in days:
+                provider.end_date = day.tz_localize(None)
+                live.run(force=True)
+            replay_history(replayed, days[0].tz_localize(None), days[-1].tz_localize(None))
+
+            expected = history(live)
+            actual = history(replayed)
+            assert len(expected) == len(SYMBOLS) * DAYS
+            assert actual == expected
+            assert any(row['signal_type'] != 'NONE' for row in expected)
+        finally:
+            for system in (live, replayed):
+                system.stop_notifiers()
+                for notifier in system.all_notifiers():
+                    notifier.outbox.close()
+                system.history_store.close()
+
+
+def archived_history(system):
+    frame = load_history(system.history_store, system.history_archive)
+    return frame.sort_values(['symbol', 'date']).reset_index(drop=True)
+
+
+def test_replay_into_archived_months(tmp_path):
+    """アーカイブ済みの日は再生で上書きせず（regenerate 時のみ作り直し）、圧縮してもアーカイブの行は残る"""
+    provider = SyntheticDataProvider(years=2, end_date='2025-06-30')
+    with LineStub() as stub:
+        system = build_system(tmp_path / 'archive', stub.url, 'wilder', provider)
+        try:
+            store, archive = system.history_store, system.history_archive
+            replay_history(system, '2025-05-01', '2025-06-30')
+            expected = archived_history(system)
+            assert compact_history(store, archive, retention_days=0, today=pd.Timestamp('2025-07-01').date()) > 0
+            assert history(system) == []
+
+            # アーカイブ済みの行を目印付きにしておく
+            marked = expected.assign(reason='archived')
+            for month, rows in marked.groupby(marked['date'].str[:7]):
+                archive.write_partition(month, rows)
+
+            assert replay_history(system, '2025-05-01', '2025-06-30') == 0
+            compact_history(store, archive, retention_days=0, today=pd.Timestamp('2025-07-01').date())
+            assert archived_history(system).equals(marked)
+
+            assert replay_history(system, '2025-05-01', '2025-06-30', regenerate=True) == len(expected)
+            compact_history(store, archive, retention_days=0, today=pd.Timestamp('2025-07-01').date())
+            assert archived_history(system).equals(expected)
+        finally:
+            for notifier in system.all_notifiers():
+                notifier.outbox.close()
+            system.history_store.close()
@@ -0,0 +1,84 @@
+"""
+Enhanced RSI Alert System - シグナル判定ルールのテスト
+SignalRules の一括判定が check_enhanced_signal() と同じ結果になることを乱数の入力で確認
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from benchmark import make_config
+from main import EnhancedRSIAlertSystem
+
+SYMBOL_SETTINGS = {
+    'STD': {'daily_buy_threshold': 33, 'daily_sell_threshold': 67, 'strategy_name': 'Standard RSI'},
+    'WKLY': {
+        'daily_buy_threshold': 35, 'daily_sell_threshold': 65, 'use_weekly_filter': True,
+        'weekly_buy_threshold': 50, 'weekly_sell_threshold': 55, 'strategy_name': 'Enhanced RSI'
+    },
+    'IND': {
+        'daily_buy_threshold': 40, 'daily_sell_threshold': 60, 'use_weekly_filter': True,
+        'indicator_filters': [
+            {'indicator': 'bb_percent_b', 'timeframe': 'daily', 'signal': 'BUY', 'op': '<=', 'value': 0.2},
+            {'indicator': 'macd_hist', 'timeframe': 'weekly', 'signal': 'SELL', 'op': '<', 'value': 0}
+        ]
+    },
+}
+# 設定の無い銘柄（デフォルト値で判定）
+SYMBOLS = list(SYMBOL_SETTINGS) + ['PLAIN']
+
+
+@pytest.fixture(scope='module')
+def system(tmp_path_factory):
+    work_dir = str(tmp_path_factory.mktemp('signal_rules'))
+    config_path = make_config(work_dir, SYMBOLS, 'http://127.0.0.1:9/')
+    with open(config_path, 'r') as f:
+        config = json.load(f)
+    config['symbol_specific_settings'] = SYMBOL_SETTINGS
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    system = EnhancedRSIAlertSystem(config_path)
+    yield system
+    system.history_store.close()
+
+
+def random_row(rng, symbol):
+    """しきい値ちょうどの値・週足RSIなし・指標の欠損を含む銘柄データ"""
+    def rsi():
+        # 小数第1位に丸めてしきい値と一致する値も発生させる
+        return round(float(rng.uniform(20, 80)), 1) if rng.random() < 0.7 else float(rng.choice([33, 35, 40, 60, 65, 67]))
+
+    indicators = {
+        'daily': {'bb_percent_b': float(rng.uniform(-0.2, 1.2))},
+        'weekly': {'macd_hist': float(rng.normal()) if rng.random() < 0.8 else float('nan')}
+    }
+    return {
+        'symbol': symbol,
+        'price': round(float(rng.uniform(10, 100)), 2),
+        'daily_rsi': rsi(),
+        'weekly_rsi': rsi() if rng.random() < 0.8 else None,
+        'prev_daily_rsi': rsi(),
+        'indicators': indicators if rng.random() < 0.9 else None,
+    }
+
+
+def test_evaluate_matches_check_enhanced_signal(system):
+    rng = np.random.default_rng(20250101)
+    signals = 0
+    for _ in range(2000):
+        rows = [random_row(rng, symbol) for symbol in SYMBOLS]
+        prev_daily = {row['symbol']: row['prev_daily_rsi'] for row in rows}
+        batched = system.signal_rules.evaluate(rows, prev_daily, log_first_run=False)
+        for row, signal in zip(rows, batched):
+            expected = system.check_enhanced_signal(row)
+            assert signal == expected, row
+            signals += signal is not None
+    # 判定が一致するだけでなく、シグナル発生側の分岐も十分に通っていること
+    assert signals > 500
+
+
+def test_first_run_has_no_signal(system):
+    """前回RSIの無い銘柄は判定しない（初回実行）"""
+    row = {'symbol': 'STD', 'price': 10.0, 'daily_rsi': 20.0, 'weekly_rsi': 30.0}
+    assert system.signal_rules.evaluate([row], {}, log_first_run=False) == [None]
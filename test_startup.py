@@ -0,0 +1,48 @@
+"""
+Enhanced RSI Alert System - 起動時の事前判定のテスト
+次の日足より前の起動でも、送信待ちの通知があればライブラリ読み込み前に終了しないことを確認
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from notifier import Outbox
+from startup import exit_if_up_to_date, parse_args
+
+NOW = datetime(2025, 6, 30, 12, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    history_db = tmp_path / 'signals_history.sqlite'
+    conn = sqlite3.connect(str(history_db))
+    conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("INSERT INTO meta VALUES ('next_bar_at', ?)", ((NOW + timedelta(hours=2)).isoformat(),))
+    conn.commit()
+    conn.close()
+
+    config = {
+        'history': {'db_path': str(history_db)},
+        'notification': {'dispatch': {'outbox_path': str(tmp_path / 'outbox.sqlite')}},
+        'subscribers': [{'id': 'sub1', 'symbols': ['AAA'], 'access_token': 'token'}],
+    }
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def test_exits_before_next_bar(config_path, tmp_path):
+    Outbox(str(tmp_path / 'outbox.sqlite')).close()
+    with pytest.raises(SystemExit):
+        exit_if_up_to_date(parse_args(['--config', config_path]), now=NOW)
+
+
+@pytest.mark.parametrize('outbox_name', ['outbox.sqlite', 'outbox.sub1.sqlite'])
+def test_pending_notifications_continue_to_run(config_path, tmp_path, outbox_name):
+    outbox = Outbox(str(tmp_path / outbox_name))
+    outbox.enqueue('alert-1')
+    outbox.close()
+    exit_if_up_to_date(parse_args(['--config', config_path]), now=NOW)
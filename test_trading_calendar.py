@@ -0,0 +1,62 @@
+"""
+Enhanced RSI Alert System - 取引所カレンダーのテスト
+NYSEが公表している2025年・2026年の休場日・短縮取引日と照合
+"""
+
+from datetime import date, datetime
+
+from trading_calendar import EXCHANGE_TZ, TradingCalendar, nyse_early_closes, nyse_holidays
+
+NYSE_HOLIDAYS = {
+    2025: {
+        date(2025, 1, 1), date(2025, 1, 9), date(2025, 1, 20), date(2025, 2, 17), date(2025, 4, 18),
+        date(2025, 5, 26), date(2025, 6, 19), date(2025, 7, 4), date(2025, 9, 1), date(2025, 11, 27),
+        date(2025, 12, 25),
+    },
+    2026: {
+        date(2026, 1, 1), date(2026, 1, 19), date(2026, 2, 16), date(2026, 4, 3), date(2026, 5, 25),
+        date(2026, 6, 19), date(2026, 7, 3), date(2026, 9, 7), date(2026, 11, 26), date(2026, 12, 25),
+    },
+}
+
+NYSE_EARLY_CLOSES = {
+    2025: {date(2025, 7, 3), date(2025, 11, 28), date(2025, 12, 24)},
+    2026: {date(2026, 11, 27), date(2026, 12, 24)},
+}
+
+
+def at(year, month, day, hour, minute=0):
+    return datetime(year, month, day, hour, minute, tzinfo=EXCHANGE_TZ)
+
+
+def test_holidays_and_early_closes():
+    for year, holidays in NYSE_HOLIDAYS.items():
+        assert nyse_holidays(year) == holidays
+        assert nyse_early_closes(year, holidays) == NYSE_EARLY_CLOSES[year]
+
+
+def test_sessions_skip_holidays_and_weekends():
+    calendar = TradingCalendar(2024, 2027)
+    assert not calendar.is_session(date(2025, 4, 18))  # 聖金曜日
+    assert not calendar.is_session(date(2026, 7, 3))   # 独立記念日の振替
+    assert calendar.is_session(date(2025, 11, 28))     # 短縮取引日も立会日
+    assert calendar.previous_session(date(2025, 4, 21)) == date(2025, 4, 17)
+    assert calendar.next_session(date(2026, 7, 2)) == date(2026, 7, 6)
+
+
+def test_early_close_bar_is_final_after_1pm():
+    calendar = TradingCalendar(2024, 2027, settle_minutes=5)
+    assert calendar.session_close(date(2025, 11, 28)) == at(2025, 11, 28, 13)
+    assert calendar.latest_bar(at(2025, 11, 28, 12)) == (date(2025, 11, 28), False)
+    assert calendar.latest_bar(at(2025, 11, 28, 13, 10)) == (date(2025, 11, 28), True)
+    assert calendar.latest_bar(at(2025, 11, 26, 15, 30)) == (date(2025, 11, 26), False)
+
+
+def test_no_new_bar_over_a_holiday_weekend():
+    calendar = TradingCalendar(2024, 2027)
+    # 聖金曜日〜日曜は木曜の確定バーが最新
+    assert calendar.latest_bar(at(2025, 4, 18, 12)) == (date(2025, 4, 17), True)
+    assert not calendar.has_new_bar('2025-04-17', True, now=at(2025, 4, 20, 12))
+    assert calendar.has_new_bar('2025-04-17', True, now=at(2025, 4, 21, 9, 31))
+    assert calendar.next_bar_time('2025-04-17', True) == at(2025, 4, 21, 9, 30)
+    assert calendar.next_bar_time('2025-04-17', False) is None
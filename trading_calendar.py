@@ -0,0 +1,192 @@
+"""
+Enhanced RSI Alert System - 取引所カレンダー
+NYSEの休場日・短縮取引日・立会日を事前計算し、新しい日足が存在し得るかを
+ネットワークアクセス無しで判定する（標準ライブラリのみ使用）
+"""
+
+import bisect
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+EXCHANGE_TZ = ZoneInfo('America/New_York')
+SESSION_OPEN = time(9, 30)
+SESSION_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+# 臨時休場（国葬など）
+SPECIAL_CLOSURES = {
+    date(2012, 10, 29), date(2012, 10, 30),  # ハリケーン・サンディ
+    date(2018, 12, 5),                       # ブッシュ元大統領国葬
+    date(2025, 1, 9),                        # カーター元大統領国葬
+}
+
+
+def easter_sunday(year):
+    """復活祭の日付（グレゴリオ暦、Anonymous Gregorian algorithm）"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year, month, weekday, n):
+    """指定月の第n週の曜日（n=-1 は最終週）"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def observed(day):
+    """土曜の祝日は前日、日曜の祝日は翌日に振替"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year):
+    """NYSEの休場日"""
+    holidays = set()
+    # 元日が土曜の場合、前年12/31は振替休場にならない
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.add(observed(new_year))
+    if year >= 1998:
+        holidays.add(nth_weekday(year, 1, 0, 3))   # キング牧師記念日
+    holidays.add(nth_weekday(year, 2, 0, 3))       # 大統領の日
+    holidays.add(easter_sunday(year) - timedelta(days=2))  # 聖金曜日
+    holidays.add(nth_weekday(year, 5, 0, -1))      # 戦没将兵追悼記念日
+    if year >= 2022:
+        holidays.add(observed(date(year, 6, 19)))  # ジューンティーンス
+    holidays.add(observed(date(year, 7, 4)))       # 独立記念日
+    holidays.add(nth_weekday(year, 9, 0, 1))       # レイバーデー
+    holidays.add(nth_weekday(year, 11, 3, 4))      # 感謝祭
+    holidays.add(observed(date(year, 12, 25)))     # クリスマス
+    holidays.update(day for day in SPECIAL_CLOSURES if day.year == year)
+    return holidays
+
+
+def nyse_early_closes(year, holidays):
+    """NYSEの短縮取引日（13:00終了）"""
+    candidates = []
+    independence_day = date(year, 7, 4)
+    if independence_day.weekday() in (1, 2, 3, 4):
+        candidates.append(independence_day - timedelta(days=1))
+    candidates.append(nth_weekday(year, 11, 3, 4) + timedelta(days=1))  # 感謝祭翌日
+    candidates.append(date(year, 12, 24))
+    return {day for day in candidates if day.weekday() < 5 and day not in holidays}
+
+
+class TradingCalendar:
+    def __init__(self, start_year=None, end_year=None, extra_holidays=(), extra_early_closes=None,
+                 settle_minutes=5):
+        """取引所カレンダー初期化
+
+        extra_holidays: 追加の休場日（'YYYY-MM-DD'）
+        extra_early_closes: 追加の短縮取引日 {'YYYY-MM-DD': 'HH:MM'}
+        settle_minutes: 引け後、日足が確定したとみなすまでの分数
+        """
+        today = datetime.now(EXCHANGE_TZ).date()
+        self.start_year = start_year or today.year - 1
+        self.end_year = end_year or today.year + 1
+        self.extra_holidays = {date.fromisoformat(day) for day in extra_holidays}
+        self.extra_early_closes = {
+            date.fromisoformat(day): time.fromisoformat(close)
+            for day, close in (extra_early_closes or {}).items()
+        }
+        self.settle = timedelta(minutes=settle_minutes)
+        self._build(self.start_year, self.end_year)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            extra_holidays=config.get('extra_holidays', []),
+            extra_early_closes=config.get('extra_early_closes', {}),
+            settle_minutes=config.get('settle_minutes', 5)
+        )
+
+    def _build(self, start_year, end_year):
+        """立会日・休場日・短縮取引日を事前計算"""
+        self.holidays = set(self.extra_holidays)
+        self.early_closes = {}
+        for year in range(start_year, end_year + 1):
+            holidays = nyse_holidays(year)
+            self.holidays.update(holidays)
+            for day in nyse_early_closes(year, holidays):
+                self.early_closes[day] = EARLY_CLOSE
+        self.early_closes.update(self.extra_early_closes)
+
+        day = date(start_year, 1, 1)
+        end = date(end_year, 12, 31)
+        self.sessions = []
+        while day <= end:
+            if day.weekday() < 5 and day not in self.holidays:
+                self.sessions.append(day)
+            day += timedelta(days=1)
+        self.start_year, self.end_year = start_year, end_year
+
+    def _ensure(self, day):
+        """事前計算の範囲外の日付が指定されたら範囲を広げて再計算"""
+        if day.year < self.start_year + 1 or day.year > self.end_year - 1:
+            self._build(min(self.start_year, day.year - 1), max(self.end_year, day.year + 1))
+
+    def is_session(self, day):
+        self._ensure(day)
+        index = bisect.bisect_left(self.sessions, day)
+        return index < len(self.sessions) and self.sessions[index] == day
+
+    def previous_session(self, day):
+        """指定日より前の直近の立会日"""
+        self._ensure(day)
+        return self.sessions[bisect.bisect_left(self.sessions, day) - 1]
+
+    def next_session(self, day):
+        """指定日より後の直近の立会日"""
+        self._ensure(day)
+        return self.sessions[bisect.bisect_right(self.sessions, day)]
+
+    def session_open(self, day):
+        return datetime.combine(day, SESSION_OPEN, tzinfo=EXCHANGE_TZ)
+
+    def session_close(self, day):
+        """指定日の大引け時刻（短縮取引日は13:00）"""
+        return datetime.combine(day, self.early_closes.get(day, SESSION_CLOSE), tzinfo=EXCHANGE_TZ)
+
+    def latest_bar(self, now=None):
+        """now 時点で存在し得る最新の日足 (立会日, 確定済みか)
+
+        立会時間中は当日の未確定バー、寄付前・休場日は直近立会日の確定バーを返す。
+        """
+        now = (now or datetime.now(EXCHANGE_TZ)).astimezone(EXCHANGE_TZ)
+        today = now.date()
+        if self.is_session(today) and now >= self.session_open(today):
+            return today, now >= self.session_close(today) + self.settle
+        return self.previous_session(today), True
+
+    def next_bar_time(self, last_bar_date, last_bar_final):
+        """評価済みのバーより新しい日足が存在し得る最初の時刻（未確定バーは常に更新され得るため None）"""
+        if last_bar_date is None or not last_bar_final:
+            return None
+        return self.session_open(self.next_session(date.fromisoformat(last_bar_date)))
+
+    def has_new_bar(self, last_bar_date, last_bar_final, now=None):
+        """前回評価したバー以降に新しいデータが存在し得るか
+
+        同じバーを確定後に評価済みの場合のみ False（未確定バーは毎回更新され得る）。
+        """
+        if last_bar_date is None:
+            return True
+        bar_date, final = self.latest_bar(now)
+        if bar_date.isoformat() != last_bar_date:
+            return True
+        return not last_bar_final